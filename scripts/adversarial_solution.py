@@ -1,34 +1,37 @@
 # shared-workflows/scripts/adversarial_review.py
 
 import os
-import re
 import sys
 import subprocess
-import openai  # Corrected import
+from code_edits import patch_mode_enabled, render_files, request_edits
+from file_utils import read_text
+from git_utils import commit_paths, diff_stat, push
+from java_compiler import compile_sources, javac_path, references
+from java_lexer import split_types
+from llm_client import get_client, generate_with_retries
+from structured_output import generate_files, structured_output_enabled
+from tracing import init_tracing, traced
 
 def main(api_key, task_file, solution_dir):
     if not api_key:
         print("Error: OpenAI API key is missing.", file=sys.stderr)
         sys.exit(1)
 
-    # Set the OpenAI API key
-    openai.api_key = api_key
+    client = get_client(api_key)
 
     # Read the task description
     try:
-        with open(task_file, "r") as file:
-            task_description = file.read()
+        task_description = read_text(task_file)
     except FileNotFoundError:
         print("Error: Task description file not found.", file=sys.stderr)
         sys.exit(1)
 
     # Read the existing solution files in the solution directory
-    solution_files = []
+    solution_files = {}
     try:
-        for filename in os.listdir(solution_dir):
+        for filename in sorted(os.listdir(solution_dir)):
             if filename.endswith(".java"):
-                with open(os.path.join(solution_dir, filename), "r") as file:
-                    solution_files.append(file.read())
+                solution_files[filename] = read_text(os.path.join(solution_dir, filename))
     except FileNotFoundError:
         print(f"Error: Solution directory '{solution_dir}' not found.", file=sys.stderr)
         sys.exit(1)
@@ -37,82 +40,178 @@ def main(api_key, task_file, solution_dir):
         print(f"Error: No Java solution files found in '{solution_dir}'.", file=sys.stderr)
         sys.exit(1)
 
-    solution_content = "\n\n".join(solution_files)
+    # Review the solution, calling the model only for classes that do not compile
+    reviewed_files = review_solution(client, task_description, solution_files, structured_output_enabled())
+    if reviewed_files is None:
+        print("Error: Failed to generate improved solution after multiple retries.", file=sys.stderr)
+        sys.exit(1)
+
+    changed_files = [
+        (file_name, content) for file_name, content in sorted(reviewed_files.items())
+        if solution_files.get(file_name) != content
+    ]
+    if not changed_files:
+        if javac_path() is None:
+            print("Compile check skipped (javac not found); the model made no changes.")
+        else:
+            print("The solution compiles; nothing to review.")
+        return
+
+    # Write the changed classes to the solution files
+    write_solution_files(solution_dir, changed_files)
+
+    # Summarise the changes from the contents before and after the review
+    changes = [
+        (os.path.join(solution_dir, file_name), solution_files.get(file_name), content)
+        for file_name, content in changed_files
+    ]
+
+    # Commit and push changes with the diff summary in commit message
+    commit_and_push_changes([path for path, _, _ in changes], diff_stat(changes))
+
+def review_rounds():
+    return int(os.getenv("COMPILE_REVIEW_ROUNDS", "2"))
+
+def review_solution(client, task_description, files, structured=False):
+    """
+    Compile-gated review of {file_name: content}; returns the reviewed files, or None if the model fails.
+
+    A solution that compiles is returned unchanged without calling the model.
+    Otherwise only the classes javac rejects are sent back, with their compiler
+    errors and the classes they use as context, for at most COMPILE_REVIEW_ROUNDS
+    rounds. Without javac the whole solution is reviewed by the model as before.
+    """
+    files = dict(files)
+    diagnostics = compile_sources(files)
+    if diagnostics is None:
+        print("javac not found; reviewing the whole solution with the model.")
+        if patch_mode_enabled():
+            prompt = build_improve_prompt(task_description, render_files(files), patch=True)
+            edited_files = request_edits(client, prompt, files, stage="improved solution")
+            if edited_files is not None:
+                return edited_files
+            print("Falling back to rewriting the whole solution.")
+        solution_content = "\n\n".join(files[name] for name in sorted(files))
+        if structured:
+            improved_files = improve_solution_files(client, task_description, solution_content)
+        else:
+            improved_solution = improve_solution(client, task_description, solution_content)
+            improved_files = split_improved_solution(improved_solution) if improved_solution is not None else None
+        if improved_files is None:
+            return None
+        files.update(improved_files)
+        return files
+
+    rounds = review_rounds()
+    for round_number in range(1, rounds + 1):
+        if not diagnostics:
+            return files
+        print(f"Compile review round {round_number}/{rounds}: fixing {', '.join(sorted(diagnostics))}")
+        files = fix_compile_errors(client, task_description, files, diagnostics, structured)
+        if files is None:
+            return None
+        diagnostics = compile_sources(files)
 
+    if diagnostics:
+        print(f"Warning: {', '.join(sorted(diagnostics))} still failing to compile after {rounds} review rounds.")
+    return files
+
+def fix_compile_errors(client, task_description, files, diagnostics, structured=False):
+    """
+    One round of compile fixes: edits to the failing classes, or their complete
+    rewrite when the edits do not apply. Returns the updated files, or None if the model fails.
+    """
+    if patch_mode_enabled():
+        prompt = build_fix_prompt(task_description, files, diagnostics, patch=True)
+        edited_files = request_edits(client, prompt, files, stage="compile fixes")
+        if edited_files is not None:
+            return edited_files
+        print("Falling back to rewriting the failing classes.")
+
+    prompt = build_fix_prompt(task_description, files, diagnostics)
+    if structured:
+        fixed_files = generate_files(client, prompt, max_retries=3, stage="compile fixes")
+    else:
+        fixed_solution = generate_with_retries(client, prompt, max_retries=3, stage="compile fixes")
+        fixed_files = split_improved_solution(fixed_solution) if fixed_solution is not None else None
+    if fixed_files is None:
+        return None
+    files = dict(files)
+    files.update(fixed_files)
+    return files
+
+@traced("prompt")
+def build_fix_prompt(task_description, files, diagnostics, patch=False):
+    """
+    Build the prompt that asks to fix the classes with compiler errors, given the classes they use.
+    With `patch` the request for complete classes is left out; see code_edits.EDIT_INSTRUCTIONS.
+    """
+    used = references(files)
+    context = sorted({name for failing in diagnostics for name in used[failing]} - set(diagnostics))
+    failing_sections = "".join(
+        f"### {name}\n{files[name]}\n\nCompiler errors:\n" + "\n".join(diagnostics[name]) + "\n\n"
+        for name in sorted(diagnostics)
+    )
+    context_sections = "".join(f"### {name} (compiles, do not change)\n{files[name]}\n\n" for name in context)
+    prompt = (
+        "The following classes of a Java solution code do not compile. Fix the compiler errors "
+        "while keeping the behaviour the task description asks for.\n\n"
+        f"### Task Description\n{task_description}\n\n"
+        f"{failing_sections}"
+        f"{context_sections}"
+    )
+    if patch:
+        return prompt + f"IMPORTANT: Only change the classes with compiler errors ({', '.join(sorted(diagnostics))})."
+    return prompt + (
+        f"IMPORTANT: Return only the corrected classes ({', '.join(sorted(diagnostics))}), each complete. "
+        "The response must be in plain Java code with no markdown formatting or ```java blocks."
+    )
+
+def improve_solution(client, task_description, solution_content):
+    """Ask the model for an improved version of the solution; returns None on failure."""
+    prompt = build_improve_prompt(task_description, solution_content)
+
+    # Generate the improved solution
+    return generate_with_retries(client, prompt, max_retries=3, stage="improved solution")
+
+def improve_solution_files(client, task_description, solution_content):
+    """Structured-output version of improve_solution: (file_name, content) pairs, or None on failure."""
+    prompt = build_improve_prompt(task_description, solution_content)
+    return generate_files(client, prompt, max_retries=3, stage="improved solution")
+
+@traced("prompt")
+def build_improve_prompt(task_description, solution_content, patch=False):
+    """
+    Build the prompt that asks for an improved solution.
+    With `patch` the request for the complete solution is left out; see code_edits.EDIT_INSTRUCTIONS.
+    """
     # Prompt to improve the solution
     prompt = (
         f"Given the following task description and solution code, analyze the solution and improve it. "
         f"Correct any issues or missing requirements that might be present in the solution.\n\n"
         f"### Task Description\n{task_description}\n\n"
         f"### Current Solution\n{solution_content}\n\n"
+    )
+    if patch:
+        return prompt + (
+            "IMPORTANT: Only change what is needed to correct the solution. Check for missing imports, misplaced code, "
+            "invalid or incomplete class definitions and methods that do not do what the task asks for."
+        )
+    prompt += (
         "IMPORTANT: Provide an improved version of the solution with corrections, if necessary, and ensure that the updated code is complete and functional. "
         "Check for missing imports, misplaced code, and correct all invalid or incomplete class definitions. "
         "Ensure all methods are correctly implemented, all imports are included, and the solution can be compiled and run without errors. "
         "The response must be in plain Java code with no markdown formatting or ```java blocks."
     )
-
-    # Generate the improved solution
-    improved_solution = generate_with_retries(prompt, max_retries=3)
-    if improved_solution is None:
-        print("Error: Failed to generate improved solution after multiple retries.", file=sys.stderr)
-        sys.exit(1)
-
-    # Ensure the solution directory exists
-    os.makedirs(solution_dir, exist_ok=True)
-
-    # Save existing solution files' content for diff
-    existing_solution_content = "\n\n".join(solution_files)
-
-    # Write the improved solution to the solution files
-    write_improved_solution(solution_dir, improved_solution)
-
-    # Fetch the diff summary
-    try:
-        diff_summary = get_diff_summary()
-    except Exception as e:
-        print(f"Error obtaining diff summary: {e}", file=sys.stderr)
-        sys.exit(1)
-
-    # Commit and push changes with the diff summary in commit message
-    commit_and_push_changes(diff_summary)
-
-def generate_with_retries(client, prompt, max_retries=3):
-    for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error generating solution code: {e}")
-            if attempt < max_retries - 1:
-                print("Retrying...")
-    return None
+    return prompt
 
 def write_improved_solution(directory, improved_solution):
     """Overwrite the existing solution files with the improved solution."""
-    # Split the improved solution by class definitions
-    class_blocks = re.findall(r'(public\s+class\s+\w+\s*{[\s\S]*?})', improved_solution)
-
-    if not class_blocks:
-        # Fallback: assume single class
-        class_blocks = [improved_solution]
-
-    for block in class_blocks:
-        # Extract class name
-        class_name_match = re.search(r'public\s+class\s+(\w+)\s*{', block)
-        if class_name_match:
-            class_name = class_name_match.group(1)
-        else:
-            print(f"Skipping block due to missing class name: {block[:50]}", file=sys.stderr)
-            continue
+    write_solution_files(directory, split_improved_solution(improved_solution))
 
-        # Define the file name
-        file_name = f"{class_name}.java"
+def write_solution_files(directory, files):
+    """Overwrite solution files with (file_name, content) pairs."""
+    for file_name, block in files:
         file_path = os.path.join(directory, file_name)
 
         # Write the improved code to the file
@@ -123,53 +222,29 @@ def write_improved_solution(directory, improved_solution):
         except IOError as e:
             print(f"Error writing file {file_name}: {e}", file=sys.stderr)
 
-def get_diff_summary():
-    """Get a summary of changes using git diff --stat."""
-    try:
-        # Ensure that git is aware of the changes
-        subprocess.run(["git", "add", "."], check=True)
-        # Get the diff summary
-        result = subprocess.run(
-            ["git", "diff", "--staged", "--stat"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        diff_summary = result.stdout.strip()
-        return diff_summary
-    except subprocess.CalledProcessError as e:
-        print(f"Error getting git diff summary: {e.stderr}", file=sys.stderr)
-        raise e
+def split_improved_solution(improved_solution):
+    """Split the improved solution into (file_name, content) pairs, one per top-level type."""
+    files = [(f"{class_name}.java", block) for class_name, block in split_types(improved_solution)]
+    if not files:
+        print(f"Skipping block due to missing class name: {improved_solution[:50]}", file=sys.stderr)
+    return files
 
-def commit_and_push_changes(diff_summary):
-    """Commit and push the changes with the diff summary in the commit message."""
+def commit_and_push_changes(paths, diff_summary):
+    """Commit the written files and push them with the diff summary in the commit message."""
     try:
-        # Configure git user
-        subprocess.run(["git", "config", "--global", "user.email", "actions@github.com"], check=True)
-        subprocess.run(["git", "config", "--global", "user.name", "github-actions"], check=True)
-
         # Commit changes with diff summary
         commit_message = f"Adversarial Review: Improve solution\n\nChanges:\n{diff_summary}"
-        subprocess.run(["git", "commit", "-m", commit_message], check=True)
+        commit_paths(paths, commit_message)
 
         # Push changes
-        subprocess.run(
-            ["git", "push", "origin"],
-            check=True,
-            env={
-                **os.environ,
-                "GIT_ASKPASS": "echo",
-                "GIT_USERNAME": "x-access-token",
-                "GIT_PASSWORD": os.getenv('GITHUB_TOKEN')
-            }
-        )
+        push()
         print("Successfully committed and pushed changes.")
     except subprocess.CalledProcessError as e:
         print(f"Error committing and pushing changes: {e}", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == "__main__":
+    init_tracing()
     if len(sys.argv) != 4:
         print("Error: Missing required command line arguments 'api_key', 'task_file', and 'solution_dir'", file=sys.stderr)
         sys.exit(1)
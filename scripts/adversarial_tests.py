@@ -1,18 +1,28 @@
 # shared-workflows/scripts/adversarial_tests.py
 
 import os
-import re
 import sys
 import subprocess
-import openai  # Corrected import
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from code_edits import patch_mode_enabled, render_files, request_edits
+from file_utils import read_text
+from git_utils import commit_paths, diff_stat, push
+from java_lexer import declared_types, normalize_source
+from generate_tests import JUNIT_IMPORTS
+from llm_client import get_client, generate_with_retries
+from symbol_index import import_table
+from tracing import init_tracing
+
+# Where generate_solution.py writes the solution the tests exercise
+SOLUTION_DIR = ".hidden_tasks"
+
 
 def main(api_key, test_dir):
     if not api_key:
         print("Error: OpenAI API key is missing.", file=sys.stderr)
         sys.exit(1)
 
-    # Set the OpenAI API key
-    openai.api_key = api_key
+    client = get_client(api_key)
 
     # Read all test files in the test directory
     test_files = [f for f in os.listdir(test_dir) if f.endswith('.java')]
@@ -21,164 +31,118 @@ def main(api_key, test_dir):
         print(f"Error: No Java test files found in '{test_dir}'.", file=sys.stderr)
         sys.exit(1)
     
-    for test_file in test_files:
-        test_file_path = os.path.join(test_dir, test_file)
-        
-        with open(test_file_path, "r") as file:
-            test_content = file.read()
-
-        # Send the test content to OpenAI for adversarial review and improvement
-        improved_content = adversarial_review(test_content)
-
-        if improved_content is None:
-            print(f"Error: Failed to generate improved test code for {test_file} after multiple retries.", file=sys.stderr)
-            continue  # Skip to the next file
-
-        # Save the improved test content
-        with open(test_file_path, "w") as file:
-            file.write(improved_content)
-        
-        print(f"Adversarial review completed for: {test_file}")
-    
+    # The classes of the tests and of the solution they test are never replaced by JDK imports
+    local_types = set()
+    for directory in (test_dir, SOLUTION_DIR):
+        if os.path.isdir(directory):
+            for file_name in os.listdir(directory):
+                if file_name.endswith(".java"):
+                    local_types |= declared_types(read_text(os.path.join(directory, file_name)))
+
+    # Review the test files concurrently; each file is written as soon as its review is done
+    changes = []
+    with ThreadPoolExecutor(max_workers=review_workers(len(test_files))) as executor:
+        futures = {
+            executor.submit(review_test_file, client, os.path.join(test_dir, test_file), local_types): test_file
+            for test_file in test_files
+        }
+        for future in as_completed(futures):
+            test_file = futures[future]
+            test_file_path = os.path.join(test_dir, test_file)
+
+            try:
+                improved_content = future.result()
+            except Exception as e:
+                print(f"Error reviewing {test_file}: {e}", file=sys.stderr)
+                continue
+
+            if improved_content is None:
+                print(f"Error: Failed to generate improved test code for {test_file} after multiple retries.", file=sys.stderr)
+                continue  # Skip to the next file
+
+            # Save the improved test content
+            changes.append((test_file_path, read_text(test_file_path), improved_content))
+            with open(test_file_path, "w") as file:
+                file.write(improved_content)
+
+            print(f"Adversarial review completed for: {test_file}")
+
     # After all tests are improved, commit and push changes with a summary
-    commit_and_push_changes(test_dir)
+    commit_and_push_changes(changes)
+
+def review_workers(file_count):
+    """Threads reviewing test files at once: ADVERSARIAL_CONCURRENCY (default 8), at most one per file."""
+    return max(1, min(int(os.getenv("ADVERSARIAL_CONCURRENCY", "8")), file_count))
+
+def review_test_file(client, test_file_path, local_types=()):
+    """Read a test file and return its adversarially reviewed content (or None)."""
+    test_content = read_text(test_file_path)
+
+    # Send the test content to OpenAI for adversarial review and improvement
+    return adversarial_review(client, test_content, os.path.basename(test_file_path), local_types)
+
+REVIEW_INSTRUCTIONS = (
+    "Review the following Java test code and make necessary improvements to ensure it is well-structured, follows proper test practices, "
+    "and can be executed without issues. Make sure that there are no extraneous content like markdown blocks or incomplete class definitions. "
+    "Ensure that imports, method names, and test annotations are correct. If there are unfinished or misplaced code sections, clean them up "
+    "to make the test files function properly:\n\n"
+)
+
+def adversarial_review(client, test_content, file_name="Test.java", local_types=()):
+    """
+    Review one test file. The model is asked for search/replace edits to it
+    (see code_edits.py) and only asked for the whole file again when they do not apply.
+    local_types are the names of the tests' and the solution's own classes.
+    """
+    if patch_mode_enabled():
+        prompt = REVIEW_INSTRUCTIONS + "### Test Code:\n" + render_files({file_name: test_content})
+        edited_files = request_edits(client, prompt, {file_name: test_content}, stage="improved test code")
+        if edited_files is not None:
+            return clean_up_test_code(edited_files[file_name], local_types)
+        print(f"Falling back to rewriting {file_name}.")
 
-def adversarial_review(test_content):
     # Prepare a prompt that asks OpenAI to review the test file
     prompt = (
-        "Review the following Java test code and make necessary improvements to ensure it is well-structured, follows proper test practices, "
-        "and can be executed without issues. Make sure that there are no extraneous content like markdown blocks or incomplete class definitions. "
-        "Ensure that imports, method names, and test annotations are correct. If there are unfinished or misplaced code sections, clean them up "
-        "to make the test files function properly:\n\n"
-        f"### Test Code:\n{test_content}\n\n"
+        REVIEW_INSTRUCTIONS
+        + f"### Test Code:\n{test_content}\n\n"
         "IMPORTANT: Do not include markdown code blocks (` ``` `) in your response. Ensure that all test classes are properly structured and can be executed."
     )
 
     # Generate the improved test code
-    improved_content = generate_with_retries(prompt, max_retries=3)
+    improved_content = generate_with_retries(client, prompt, max_retries=3, stage="improved test code")
     
     if improved_content:
-        improved_content = clean_up_test_code(improved_content)
+        improved_content = clean_up_test_code(improved_content, local_types)
     
     return improved_content
 
-def generate_with_retries(prompt, max_retries=3):
-    for attempt in range(max_retries):
-        try:
-            response = openai.ChatCompletion.create(
-                model="gpt-4o-2024-08-06",  # Replace with the correct model name if needed
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error generating improved test code: {e}", file=sys.stderr)
-            if attempt < max_retries - 1:
-                print("Retrying...", file=sys.stderr)
-    return None
-
-def clean_up_test_code(test_code):
+def clean_up_test_code(test_code, local_types=()):
     """
-    Clean up the improved test code by removing markdown formatting, ensuring balanced braces,
-    and removing any extraneous content.
+    Clean up the improved test code by removing markdown formatting and misplaced
+    file declarations (e.g. "Enemy.java:"), ensuring balanced braces and tidying
+    the imports, all in a single pass over the Java tokens. Names in local_types
+    are never imported.
     """
-    # Remove any markdown-like blocks (```java, ``` etc.)
-    test_code = re.sub(r'```[\w]*', '', test_code)
-
-    # Remove any misplaced file declarations (e.g., "Enemy.java:" or "Player.java:")
-    test_code = re.sub(r'\w+\.java:', '', test_code)
-
-    # Ensure that there are no unclosed curly braces
-    open_braces = test_code.count('{')
-    close_braces = test_code.count('}')
-    if open_braces > close_braces:
-        test_code += '}' * (open_braces - close_braces)
+    return normalize_source(test_code, import_table(JUNIT_IMPORTS), local_types)
 
-    # Remove extraneous or repeated imports, if any
-    test_code = clean_up_imports(test_code)
-
-    return test_code
-
-def clean_up_imports(test_code):
+def commit_and_push_changes(changes):
     """
-    Remove duplicate imports and ensure necessary imports are present.
+    Commit and push the rewritten test files, given as (path, old content, new content),
+    with a summary of the changes computed from their contents.
     """
-    # Define required imports based on common Java testing classes
-    required_imports = {
-        "Before": "import org.junit.Before;",
-        "Test": "import org.junit.Test;",
-        "Assert": "import static org.junit.Assert.*;",
-    }
-
-    # Extract existing imports from the test code
-    existing_imports = re.findall(r'^\s*import .*;', test_code, re.MULTILINE)
-
-    # Add missing imports
-    imports_to_add = []
-    for class_name, import_statement in required_imports.items():
-        if class_name in test_code and import_statement not in existing_imports:
-            imports_to_add.append(import_statement)
-
-    # Remove duplicate imports
-    unique_imports = list(set(existing_imports))
-
-    # Prepend missing imports at the start of the test code
-    if imports_to_add:
-        unique_imports.extend(imports_to_add)
-
-    # Reconstruct the imports section
-    imports_section = "\n".join(sorted(unique_imports)) + "\n\n"
+    # Get a summary of the changes
+    diff_summary = diff_stat(changes)
+    if not diff_summary:
+        print("No changes to commit.", file=sys.stderr)
+        return
 
-    # Remove existing imports from the test code
-    test_code = re.sub(r'^\s*import .*;\n', '', test_code, flags=re.MULTILINE)
-
-    # Prepend the imports section
-    test_code = imports_section + test_code
-
-    return test_code
-
-def commit_and_push_changes(test_dir):
-    """
-    Commit and push the changes made to the test files with a summary of changes.
-    """
     try:
-        # Stage the changes in the test directory
-        subprocess.run(["git", "add", test_dir], check=True)
-
-        # Get a summary of the changes
-        diff_summary = subprocess.run(
-            ["git", "diff", "--cached", "--stat"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        ).stdout.strip()
-
-        if not diff_summary:
-            print("No changes to commit.", file=sys.stderr)
-            return
-
-        # Configure git user
-        subprocess.run(["git", "config", "--global", "user.email", "actions@github.com"], check=True)
-        subprocess.run(["git", "config", "--global", "user.name", "github-actions"], check=True)
-
         # Commit the changes with the diff summary in the commit message
         commit_message = f"Adversarial Review: Improve Tests\n\nChanges:\n{diff_summary}"
-        subprocess.run(["git", "commit", "-m", commit_message], check=True)
+        commit_paths([path for path, _, _ in changes], commit_message)
 
         # Push the changes
-        subprocess.run(
-            ["git", "push", "origin"],
-            check=True,
-            env={
-                **os.environ,
-                "GIT_ASKPASS": "echo",
-                "GIT_USERNAME": "x-access-token",
-                "GIT_PASSWORD": os.getenv('GITHUB_TOKEN')
-            }
-        )
+        push()
 
         print("Successfully committed and pushed improved tests.")
     except subprocess.CalledProcessError as e:
@@ -186,6 +150,7 @@ def commit_and_push_changes(test_dir):
         sys.exit(1)
 
 if __name__ == "__main__":
+    init_tracing()
     if len(sys.argv) != 3:
         print("Error: Missing required command line arguments 'api_key' and 'test_dir'", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,148 @@
+# shared-workflows/scripts/batch_generate.py
+
+"""
+Generate many tasks at once from a manifest.
+
+The manifest is a CSV file with a header row and the columns theme,
+difficulty and language (difficulty defaults to medium, language to English).
+Every row runs the full in-process pipeline (see pipeline.py); rows run
+concurrently, at most --max-tasks at a time, and LLM_MAX_CONCURRENCY caps the
+number of model requests in flight across all of them.
+
+Each task is written to its own directory below --output-dir. With --push,
+each task is also committed on its own task-* branch (built with git plumbing
+from HEAD, so the working tree is never touched) and all branches are pushed
+in one go. A summary of successes, failures and timings is printed and saved
+as summary.json in the output directory.
+
+Usage:
+    python batch_generate.py <api_key> <manifest.csv> [--output-dir DIR] [--max-tasks N] [--push]
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from file_utils import write_text_atomic
+from generate_task_description import new_branch_name
+from git_utils import commit_files_to_branch, push
+from llm_client import get_client
+from pipeline import PipelineError, run_pipeline, write_files
+from tracing import init_tracing
+
+
+def read_manifest(path):
+    """Read the manifest rows as dicts with theme, difficulty and language."""
+    rows = []
+    with open(path, newline="") as file:
+        for line_number, row in enumerate(csv.DictReader(file), start=2):
+            theme = (row.get("theme") or "").strip()
+            if not theme:
+                print(f"Skipping manifest line {line_number}: missing theme")
+                continue
+            rows.append({
+                "theme": theme,
+                "difficulty": (row.get("difficulty") or "medium").strip(),
+                "language": (row.get("language") or "English").strip(),
+            })
+    return rows
+
+
+def run_task(client, index, row, output_dir, branch_prefix, commit):
+    """Generate one manifest row; never raises, the outcome is reported in the returned dict."""
+    branch_name = f"{branch_prefix}-{index:03d}"
+    result = dict(row, index=index, branch=branch_name, status="ok", error=None)
+    task_dir = os.path.join(output_dir, branch_name)
+    start = time.perf_counter()
+    try:
+        files, timings = run_pipeline(client, row["theme"], row["language"], row["difficulty"], max_workers=4)
+        paths = write_files(task_dir, files)
+        # Not committed; lets task_bank.py record the theme when the task is added to the bank
+        write_text_atomic(os.path.join(task_dir, "task.json"), json.dumps(row, ensure_ascii=False))
+        if commit:
+            commit_files_to_branch(branch_name, task_dir, paths, f"Add generated task: {branch_name}")
+        result["stages"] = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+        result["files"] = len(paths)
+    except (PipelineError, OSError, subprocess.CalledProcessError) as e:
+        result.update(status="failed", error=str(e))
+    except Exception as e:
+        traceback.print_exc()
+        result.update(status="failed", error=f"{type(e).__name__}: {e}")
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["output_dir"] = task_dir
+    return result
+
+
+def print_summary(results, wall_seconds):
+    succeeded = [result for result in results if result["status"] == "ok"]
+    print(f"\n{'#':>3}  {'status':<7} {'seconds':>8}  {'branch':<26} theme")
+    for result in results:
+        print(f"{result['index']:>3}  {result['status']:<7} {result['seconds']:>8.1f}  {result['branch']:<26} {result['theme'][:60]}")
+        if result["error"]:
+            print(f"     error: {result['error']}")
+    print(f"\n{len(succeeded)}/{len(results)} tasks generated in {wall_seconds:.1f}s wall time")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Generate a batch of tasks from a CSV manifest.")
+    parser.add_argument("api_key")
+    parser.add_argument("manifest", help="CSV with the columns theme, difficulty, language")
+    parser.add_argument("--output-dir", default="batch_output")
+    parser.add_argument("--max-tasks", type=int, default=4, help="Number of tasks generated concurrently")
+    parser.add_argument("--push", action="store_true", help="Commit each task on its own task-* branch and push them")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        print("Error: OpenAI API key is missing.")
+        sys.exit(1)
+
+    try:
+        rows = read_manifest(args.manifest)
+    except (OSError, csv.Error) as e:
+        print(f"Error reading manifest: {e}")
+        sys.exit(1)
+    if not rows:
+        print("Error: The manifest contains no tasks.")
+        sys.exit(1)
+
+    client = get_client(args.api_key)
+    branch_prefix = new_branch_name()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.max_tasks)) as executor:
+        results = list(executor.map(
+            lambda item: run_task(client, item[0], item[1], args.output_dir, branch_prefix, args.push),
+            enumerate(rows, start=1)
+        ))
+    wall_seconds = time.perf_counter() - start
+
+    succeeded = [result["branch"] for result in results if result["status"] == "ok"]
+    push_error = None
+    if args.push and succeeded:
+        try:
+            push(*succeeded)
+        except subprocess.CalledProcessError as e:
+            push_error = str(e)
+
+    # The summary is written even when the push failed, so the generated tasks are not lost
+    print_summary(results, wall_seconds)
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, "summary.json"), "w") as file:
+        json.dump({"wall_seconds": round(wall_seconds, 3), "push_error": push_error, "tasks": results},
+                  file, indent=2, ensure_ascii=False)
+
+    if push_error:
+        print(f"Error pushing task branches: {push_error}")
+    if push_error or len(succeeded) < len(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    init_tracing()
+    main(sys.argv[1:])
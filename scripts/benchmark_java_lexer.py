@@ -0,0 +1,112 @@
+# shared-workflows/scripts/benchmark_java_lexer.py
+
+"""
+Check that splitting model output into class files scales linearly.
+
+Builds synthetic model responses of growing size (prose, a markdown fence,
+imports and many classes full of strings, char literals, text blocks, comments
+and generics), times java_lexer.split_types on each and prints the throughput.
+Exits with status 1 when the time per kilobyte of the largest input exceeds
+that of the smallest by more than the allowed factor.
+
+Usage:
+    python benchmark_java_lexer.py [--sizes 100,200,400,800] [--repeat 5] [--max-ratio 2.0]
+"""
+
+import argparse
+import sys
+import time
+
+from java_lexer import split_types
+
+CLASS_TEMPLATE = '''
+/**
+ * Generated class number {index}. Mentions "class Fake{index} {{" and a stray }} in prose.
+ */
+@SuppressWarnings("unchecked")
+public class Sample{index}<T extends Comparable<T>> implements Comparable<Sample{index}<T>> {{
+    private final Map<String, List<T>> items = new HashMap<>();
+    private String label = "}} class Broken{index} {{";
+    private char open = '{{';
+    private String block = """
+        {{ not code }}
+        """;
+
+    // public class Hidden{index} {{
+    public int compareTo(Sample{index}<T> other) {{
+        if (other == null) {{ return 1; }}
+        for (int i = 0; i < {index}; i++) {{
+            label += i % 2 == 0 ? "{{" : "}}";
+        }}
+        return label.compareTo(other.label);
+    }}
+
+    static class Inner{index} {{ }}
+}}
+'''
+
+PREAMBLE = """Here's the solution you asked for. Each class goes into its own file:
+
+```java
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+"""
+
+
+def build_output(size_kb):
+    """Return a synthetic model response of roughly size_kb kilobytes."""
+    parts = [PREAMBLE]
+    length = len(PREAMBLE)
+    index = 0
+    while length < size_kb * 1024:
+        block = CLASS_TEMPLATE.format(index=index)
+        parts.append(block)
+        length += len(block)
+        index += 1
+    parts.append("```\n\nLet me know if you need anything else!\n")
+    return "".join(parts), index
+
+
+def time_split(source, repeat):
+    """Best wall time of `repeat` runs, which is the least noisy estimate."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        split_types(source)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark java_lexer.split_types on growing inputs.")
+    parser.add_argument("--sizes", default="100,200,400,800", help="Comma separated input sizes in kilobytes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-ratio", type=float, default=2.0,
+                        help="Allowed growth of the time per kilobyte from the smallest to the largest input")
+    args = parser.parse_args(argv)
+
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    per_kb = []
+    print(f"{'size':>8} {'classes':>8} {'seconds':>9} {'us/KB':>8} {'MB/s':>7}")
+    for size_kb in sizes:
+        source, class_count = build_output(size_kb)
+        found = len(split_types(source))
+        if found != class_count:
+            print(f"Error: expected {class_count} classes in the {size_kb}KB input, found {found}.")
+            sys.exit(1)
+        seconds = time_split(source, args.repeat)
+        kilobytes = len(source) / 1024
+        per_kb.append(seconds / kilobytes)
+        print(f"{size_kb:>6}KB {class_count:>8} {seconds:>9.4f} {per_kb[-1] * 1e6:>8.1f} {kilobytes / 1024 / seconds:>7.2f}")
+
+    ratio = per_kb[-1] / per_kb[0]
+    print(f"Time per KB grew {ratio:.2f}x from {sizes[0]}KB to {sizes[-1]}KB (allowed: {args.max_ratio:.2f}x)")
+    if ratio > args.max_ratio:
+        print("Error: splitting does not scale linearly.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,288 @@
+# shared-workflows/scripts/benchmark_pipeline.py
+
+"""
+End-to-end benchmark of task generation and pull request grading.
+
+Every iteration builds a throwaway setup in a temporary directory:
+
+    origin.git   a bare repository standing in for the GitHub remote
+    work/        a clone of it with the files the grading scripts read
+    bin/gh       a stand-in for the GitHub CLI that only logs its arguments
+
+and runs the scripts as the workflows do, one process each, against the fake
+chat-completions server (fake_openai_server.py) and a local stub of the GitHub
+comments API:
+
+    generate         pipeline.py: generate the task, commit and push the task branch
+    grade            grade_submission.py on a student branch
+    feedback         generate_feedback_and_clues.py
+    compliment_merge generate_compliment_and_merge.py: merge into the task branch and push
+
+It reports latency percentiles over the iterations for each script, for the
+pipeline stages inside generate (from the runs.jsonl telemetry) and for the
+whole run, so a change can be measured locally instead of in GitHub Actions.
+The response cache is off unless --cache is given, and git runs with a
+private HOME, so the global git configuration is left alone.
+
+Usage:
+    python benchmark_pipeline.py [--iterations 10] [--warmup 1] [--latency fixed:0]
+                                 [--json results.json] [--keep]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_openai_server import SOLUTION_CODE, TEMPLATE_CODE, FakeServerConfig, serve_in_thread
+from telemetry import RUNS_FILE
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT_STAGES = ("generate", "grade", "feedback", "compliment_merge")
+BASE_BRANCH = "main"
+REPOSITORY = "bench/task"
+PULL_REQUEST = "1"
+API_KEY = "sk-benchmark"
+PERCENTILES = (50, 90, 95, 99)
+
+FAKE_GH = """#!/bin/sh
+printf '%s\\n' "$*" >> "$GH_LOG"
+"""
+
+
+class CommentsHandler(BaseHTTPRequestHandler):
+    """Accepts every POST like the issue comments endpoint does."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        self.server.comments += 1
+        body = json.dumps({"id": self.server.comments}).encode("utf-8")
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve_github_api():
+    """Start the comments API stub on a background thread and return (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CommentsHandler)
+    server.daemon_threads = True
+    server.comments = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def git(cwd, *args, env=None):
+    subprocess.run(["git"] + list(args), cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write(content)
+
+
+def prepare(root, env):
+    """Create origin.git, a clone with the grading inputs on BASE_BRANCH, and the fake gh."""
+    origin = os.path.join(root, "origin.git")
+    work = os.path.join(root, "work")
+    git(root, "init", "--bare", "-q", origin, env=env)
+    git(root, "clone", "-q", origin, work, env=env)
+    git(work, "checkout", "-q", "-b", BASE_BRANCH, env=env)
+    write(os.path.join(work, "src", "template_code.java"), TEMPLATE_CODE)
+    write(os.path.join(work, "src", ".hidden_tasks", "new_task_solution.java"), SOLUTION_CODE)
+    git(work, "add", "src", env=env)
+    git(work, "commit", "-q", "-m", "Initial commit", env=env)
+    git(work, "push", "-q", "-u", "origin", BASE_BRANCH, env=env)
+
+    gh = os.path.join(root, "bin", "gh")
+    write(gh, FAKE_GH)
+    os.chmod(gh, 0o755)
+    return work
+
+
+def base_environment(root, openai_url, github_url, cache):
+    env = dict(os.environ)
+    for name in ("LLM_CASSETTE", "LLM_CASSETTE_MODE", "TRACE_FILE", "GIT_DIR", "GIT_WORK_TREE"):
+        env.pop(name, None)
+    env.update({
+        "HOME": os.path.join(root, "home"),
+        "GIT_CONFIG_NOSYSTEM": "1",
+        "GIT_AUTHOR_NAME": "Benchmark", "GIT_AUTHOR_EMAIL": "benchmark@example.com",
+        "GIT_COMMITTER_NAME": "Benchmark", "GIT_COMMITTER_EMAIL": "benchmark@example.com",
+        "PATH": os.path.join(root, "bin") + os.pathsep + env.get("PATH", ""),
+        "PYTHONPATH": SCRIPTS_DIR + os.pathsep + env.get("PYTHONPATH", ""),
+        "OPENAI_BASE_URL": openai_url,
+        "GITHUB_API_URL": github_url,
+        "GITHUB_TOKEN": "benchmark-token",
+        "GITHUB_REPOSITORY": REPOSITORY,
+        "GITHUB_PR_NUMBER": PULL_REQUEST,
+        "GITHUB_OUTPUT": os.path.join(root, "github_output"),
+        "GH_LOG": os.path.join(root, "gh.log"),
+        "LLM_TELEMETRY_DIR": os.path.join(root, "telemetry"),
+    })
+    if not cache:
+        env["LLM_NO_CACHE"] = "1"
+    os.makedirs(env["HOME"], exist_ok=True)
+    return env
+
+
+def run_script(work, env, log, script, *args):
+    """Run one of the scripts in the clone; returns its wall time in seconds."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, script)] + list(args),
+                            cwd=work, env=env, stdout=log, stderr=subprocess.STDOUT)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{script} exited with status {result.returncode}; see {log.name}")
+    return elapsed
+
+
+def read_branch_name(path):
+    with open(path, "r") as file:
+        for line in file:
+            if line.startswith("branch_name="):
+                return line.strip().split("=", 1)[1]
+    raise RuntimeError("pipeline.py did not report a branch name")
+
+
+def pipeline_stage_timings(telemetry_dir):
+    """{pipeline stage: wall seconds} of the last run recorded in runs.jsonl."""
+    try:
+        with open(os.path.join(telemetry_dir, RUNS_FILE), "r") as file:
+            runs = [json.loads(line) for line in file if line.strip()]
+    except OSError:
+        return {}
+    if not runs:
+        return {}
+    return {stage: totals["wall_s"] for stage, totals in runs[-1]["stages"].items() if totals["wall_s"]}
+
+
+def run_iteration(root, openai_url, github_url, cache):
+    """Run generation and grading once in root; returns {timing name: seconds}."""
+    env = base_environment(root, openai_url, github_url, cache)
+    work = prepare(root, env)
+    timings = {}
+    start = time.perf_counter()
+    with open(os.path.join(root, "output.log"), "w") as log:
+        timings["generate"] = run_script(work, env, log, "pipeline.py", API_KEY)
+        task_branch = read_branch_name(env["GITHUB_OUTPUT"])
+        for stage, seconds in pipeline_stage_timings(env["LLM_TELEMETRY_DIR"]).items():
+            timings[f"generate/{stage}"] = seconds
+
+        # The student's pull request: a branch off the task branch with an edited template
+        student_branch = "student-submission"
+        git(work, "checkout", "-q", "-b", student_branch, env=env)
+        write(os.path.join(work, "src", "template_code.java"), SOLUTION_CODE)
+        git(work, "commit", "-q", "-am", "Solve the task", env=env)
+        git(work, "push", "-q", "-u", "origin", student_branch, env=env)
+
+        timings["grade"] = run_script(work, env, log, "grade_submission.py", API_KEY, PULL_REQUEST)
+        timings["feedback"] = run_script(work, env, log, "generate_feedback_and_clues.py",
+                                         API_KEY, student_branch, task_branch)
+        timings["compliment_merge"] = run_script(work, env, log, "generate_compliment_and_merge.py",
+                                                 API_KEY, student_branch, task_branch)
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def percentile(values, percent):
+    """Linearly interpolated percentile of a non-empty list."""
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples):
+    """{timing name: {"n", "mean", "min", "max", "p50", ...}} in seconds."""
+    summary = {}
+    for name, values in samples.items():
+        summary[name] = {"n": len(values), "mean": sum(values) / len(values), "min": min(values), "max": max(values)}
+        for percent in PERCENTILES:
+            summary[name][f"p{percent}"] = percentile(values, percent)
+    return summary
+
+
+def _order(name):
+    script = name.split("/", 1)[0]
+    return (SCRIPT_STAGES.index(script) if script in SCRIPT_STAGES else len(SCRIPT_STAGES), name)
+
+
+def print_summary(summary):
+    columns = ["mean"] + [f"p{percent}" for percent in PERCENTILES] + ["max"]
+    print(f"{'timing (s)':<28} {'n':>3} " + " ".join(f"{column:>7}" for column in columns))
+    for name in sorted(summary, key=_order):
+        stats = summary[name]
+        print(f"{name:<28} {stats['n']:>3} " + " ".join(f"{stats[column]:>7.3f}" for column in columns))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark task generation and grading against a local git remote.")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="Iterations run first and left out of the results")
+    parser.add_argument("--latency", default="fixed:0", help="Latency distribution of the fake model (see fake_openai_server.py)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the fake model's latency")
+    parser.add_argument("--cache", action="store_true", help="Keep the LLM response cache on")
+    parser.add_argument("--json", help="Write the samples and the summary to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directories for inspection")
+    args = parser.parse_args(argv)
+
+    if shutil.which("git") is None:
+        print("Error: git not found.")
+        sys.exit(1)
+    try:
+        config = FakeServerConfig(latency=args.latency, seed=args.seed)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    openai_server, openai_url = serve_in_thread(config)
+    github_server, github_url = serve_github_api()
+    samples = {}
+    try:
+        for iteration in range(args.warmup + args.iterations):
+            root = tempfile.mkdtemp(prefix="benchmark-pipeline-")
+            try:
+                timings = run_iteration(root, openai_url, github_url, args.cache)
+            except (RuntimeError, subprocess.CalledProcessError) as e:
+                print(f"Error in iteration {iteration + 1}: {e}")
+                print(f"Keeping {root} for inspection.")
+                sys.exit(1)
+            if not args.keep:
+                shutil.rmtree(root, ignore_errors=True)
+            warmup = iteration < args.warmup
+            print(f"{'warm-up' if warmup else 'iteration'} {iteration + 1}: {timings['total']:.2f}s"
+                  + (f" ({root})" if args.keep else ""))
+            if not warmup:
+                for name, seconds in timings.items():
+                    samples.setdefault(name, []).append(seconds)
+    finally:
+        openai_server.shutdown()
+        github_server.shutdown()
+
+    if not samples:
+        return
+    summary = summarize(samples)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"latency": args.latency, "samples": samples, "summary": summary}, file, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,128 @@
+# shared-workflows/scripts/benchmark_postprocess.py
+
+"""
+Micro-benchmarks (pytest-benchmark) for the post-processing of model output.
+
+Times the pure-Python steps between a model response and the files on disk:
+
+    write_code       generate_solution.write_generated_code_to_files
+    write_tests      generate_tests.write_generated_tests_to_files
+    add_imports      generate_solution.check_and_add_missing_imports
+    clean_test_code  adversarial_tests.clean_up_test_code
+    clean_imports    adversarial_tests.clean_up_test_code on test code with duplicate imports
+    template         generate_template_code.generate_template_from_solution
+
+The inputs are the canned solution and tests of fake_openai_server, i.e.
+well-formed recorded outputs, scaled up by repeating their classes under new
+names (BENCHMARK_SIZES copies, default 1,4,16,64) and wrapped in the prose,
+fences, file labels and duplicate imports real responses contain.
+BENCHMARK_CASSETTE adds the responses recorded in an llm_cassette file.
+
+Save a baseline, then fail when a case got more than 30% slower than it, so a
+regression shows up before a cohort runs into it:
+
+    python -m pytest scripts/benchmark_postprocess.py --benchmark-autosave
+    python -m pytest scripts/benchmark_postprocess.py --benchmark-compare --benchmark-compare-fail=min:30%
+
+Select cases with -k (e.g. -k "write_code or template").
+"""
+
+import os
+import re
+
+import pytest
+
+from adversarial_tests import clean_up_test_code
+from fake_openai_server import SOLUTION_CODE, TEST_CODE
+from generate_solution import check_and_add_missing_imports, write_generated_code_to_files
+from generate_template_code import generate_template_from_solution
+from generate_tests import write_generated_tests_to_files
+
+CLASS_NAMES = re.compile(r'\b(Player|Enemy|Game)(Test)?\b')
+PROSE = "Here is the complete code. Each class goes into its own file:\n\n"
+DUPLICATE_IMPORTS = "import org.junit.Test;\nimport java.util.List;\nimport org.junit.Test;\n"
+# Cassette stages whose responses go through each case
+CASSETTE_STAGES = {
+    "write_code": "solution code",
+    "add_imports": "solution code",
+    "template": "solution code",
+    "write_tests": "the tests",
+    "clean_test_code": "improved test code",
+    "clean_imports": "improved test code",
+}
+
+
+def scaled(code, copies):
+    """The code followed by copies - 1 renamed copies of its classes (Player1, PlayerTest1, ...)."""
+    parts = [code]
+    for copy in range(1, copies):
+        parts.append(CLASS_NAMES.sub(lambda match: f"{match.group(1)}{copy}{match.group(2) or ''}", code))
+    return "\n".join(parts)
+
+
+def as_response(code):
+    return f"{PROSE}```java\n{code}```\n\nLet me know if you need anything else!\n"
+
+
+def as_reviewed_tests(code):
+    """Test code as the review returns it: fenced, with file labels and repeated imports."""
+    labelled = re.sub(r'^public class (\w+)', r'\1.java:\npublic class \1', code, flags=re.MULTILINE)
+    return f"```java\n{DUPLICATE_IMPORTS}{labelled}```\n"
+
+
+# Every case is called as fn(directory, text)
+CASES = {
+    "write_code": write_generated_code_to_files,
+    "write_tests": write_generated_tests_to_files,
+    "add_imports": lambda directory, text: check_and_add_missing_imports(text),
+    "clean_test_code": lambda directory, text: clean_up_test_code(text),
+    "clean_imports": lambda directory, text: clean_up_test_code(text),
+    "template": lambda directory, text: generate_template_from_solution(text),
+}
+
+
+def build_inputs(sizes):
+    """Return {case: [(input label, text)]} for the synthetic inputs."""
+    solutions = [(f"x{copies}", scaled(SOLUTION_CODE, copies)) for copies in sizes]
+    tests = [(f"x{copies}", scaled(TEST_CODE, copies)) for copies in sizes]
+    return {
+        "write_code": [(label, as_response(code)) for label, code in solutions],
+        "write_tests": [(label, as_response(code)) for label, code in tests],
+        "add_imports": list(solutions),
+        "clean_test_code": [(label, as_reviewed_tests(code)) for label, code in tests],
+        "clean_imports": [(label, DUPLICATE_IMPORTS + code) for label, code in tests],
+        "template": list(solutions),
+    }
+
+
+def add_cassette_inputs(inputs, path):
+    """Add the recorded responses of a cassette as inputs cassette#1, cassette#2, ..."""
+    from llm_cassette import iter_responses
+
+    responses = {}
+    for case, case_inputs in inputs.items():
+        stage = CASSETTE_STAGES[case]
+        if stage not in responses:
+            responses[stage] = [response for response in iter_responses(path, stage) if response]
+        case_inputs.extend((f"cassette#{number}", text) for number, text in enumerate(responses[stage], 1))
+
+
+def benchmark_inputs():
+    """[(case, input label, text)] from BENCHMARK_SIZES and BENCHMARK_CASSETTE."""
+    sizes = sorted(int(size) for size in os.getenv("BENCHMARK_SIZES", "1,4,16,64").split(","))
+    inputs = build_inputs(sizes)
+    if os.getenv("BENCHMARK_CASSETTE"):
+        add_cassette_inputs(inputs, os.getenv("BENCHMARK_CASSETTE"))
+    return [(case, label, text) for case, case_inputs in inputs.items() for label, text in case_inputs]
+
+
+INPUTS = benchmark_inputs()
+
+
+@pytest.mark.parametrize("case,label,text", INPUTS, ids=[f"{case}-{label}" for case, label, _ in INPUTS])
+def test_postprocess(benchmark, tmp_path, case, label, text):
+    fn = CASES[case]
+    directory = str(tmp_path)
+    benchmark.group = case
+    benchmark.extra_info["kilobytes"] = round(len(text) / 1024, 1)
+    benchmark(fn, directory, text)
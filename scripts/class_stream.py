@@ -0,0 +1,122 @@
+# shared-workflows/scripts/class_stream.py
+
+"""
+Incremental splitter that turns a streamed Java completion into class files.
+
+Text is fed in arbitrary chunks as it arrives from the model. The splitter
+tracks brace depth while skipping string/char literals, text blocks and
+comments, and hands every top-level type declaration to a callback as soon as
+its closing brace arrives, so early classes can be written (and compiled or
+templated) while later ones are still being generated. The completed text is
+then cut into types by java_lexer.split_types, like a non-streamed response.
+"""
+
+from java_lexer import split_types
+
+
+class ClassStreamSplitter:
+    """
+    Feed Java source chunks with feed(); on_class(class_name, source) is called
+    for each complete top-level type. Every emitted source starts with the
+    imports seen so far in the stream. on_reset(), if given, is called by
+    reset() so the caller can undo what it did with the classes emitted so far.
+    """
+
+    def __init__(self, on_class, on_reset=None):
+        self.on_class = on_class
+        self.on_reset = on_reset
+        self._clear()
+
+    def reset(self):
+        """Forget everything fed so far, e.g. before a retried request restarts the stream."""
+        self._clear()
+        if self.on_reset is not None:
+            self.on_reset()
+
+    def _clear(self):
+        self._segment = []      # Characters since the end of the previous type
+        self._imports = []
+        self._state = "code"
+        self._depth = 0
+        self._after_slash = False
+        self._after_star = False
+        self._escape = False
+        self._quotes = 0
+        self.emitted = []
+
+    def feed(self, text):
+        for char in text:
+            self._segment.append(char)
+            self._step(char)
+
+    def close(self):
+        """Flush at the end of the stream; an unterminated trailing type is emitted with its braces closed."""
+        if self._depth > 0 and self._state == "code":
+            self.feed("\n" + "}" * self._depth)
+        self._segment = []
+
+    def _step(self, char):
+        state = self._state
+        if state == "code":
+            if self._after_slash and char in "/*":
+                self._state = "line_comment" if char == "/" else "block_comment"
+                self._after_slash = self._after_star = False
+                return
+            self._after_slash = char == "/"
+            if char == '"':
+                self._state, self._quotes = "string_open", 1
+            elif char == "'":
+                self._state, self._escape = "char", False
+            elif char == "{":
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit()
+        elif state == "line_comment":
+            if char == "\n":
+                self._state = "code"
+        elif state == "block_comment":
+            if self._after_star and char == "/":
+                self._state = "code"
+            self._after_star = char == "*"
+        elif state == "string_open":
+            # Decide between "...", "" and a """ text block
+            if char == '"' and self._quotes == 1:
+                self._quotes = 2
+            elif char == '"':
+                self._state, self._quotes, self._escape = "text_block", 0, False
+            elif self._quotes == 2:
+                self._state = "code"  # Empty string literal; this char is code again
+                self._step(char)
+            else:
+                self._state, self._escape = "string", False
+                self._step(char)
+        elif state in ("string", "char"):
+            quote = '"' if state == "string" else "'"
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == quote or char == "\n":
+                self._state = "code"  # A newline ends an unterminated literal so one typo cannot swallow the rest
+        elif state == "text_block":
+            if self._escape:
+                self._escape = False
+                self._quotes = 0
+            elif char == "\\":
+                self._escape = True
+                self._quotes = 0
+            elif char == '"':
+                self._quotes += 1
+                if self._quotes == 3:
+                    self._state = "code"
+            else:
+                self._quotes = 0
+
+    def _emit(self):
+        segment = "".join(self._segment)
+        self._segment = []
+        for class_name, source in split_types(segment, self._imports):
+            self.emitted.append(class_name)
+            self.on_class(class_name, source)
@@ -0,0 +1,139 @@
+# shared-workflows/scripts/code_edits.py
+
+"""
+Patch-based repair: ask the model for search/replace edits instead of whole files.
+
+A review prompt lists the current files and ends with EDIT_INSTRUCTIONS; the
+model answers with blocks like
+
+    File: Player.java
+    <<<<<<< SEARCH
+        return hp;
+    =======
+        return Math.max(0, hp);
+    >>>>>>> REPLACE
+
+or with NO CHANGES. The blocks are validated and applied locally: every search
+text has to occur exactly once in its file (first as is, then ignoring
+indentation and trailing spaces), an empty search text creates a new file.
+When the answer has no valid blocks or a block does not apply, request_edits
+returns None and the caller falls back to asking for complete files, so the
+output only grows with the size of the change, not the size of the solution.
+REPAIR_MODE=rewrite always asks for complete files.
+"""
+
+import os
+import re
+
+from llm_client import generate_with_retries
+from tracing import traced
+
+NO_CHANGES = "NO CHANGES"
+
+EDIT_INSTRUCTIONS = (
+    "Answer with SEARCH/REPLACE edit blocks only, do not repeat the complete files. Use this format for every change:\n\n"
+    "File: <file name>\n"
+    "<<<<<<< SEARCH\n"
+    "<lines copied exactly from the current file, enough to be unique>\n"
+    "=======\n"
+    "<the lines that replace them>\n"
+    ">>>>>>> REPLACE\n\n"
+    "To add a new file, leave the SEARCH part empty and put the complete file in the REPLACE part. "
+    f"If nothing needs to change, answer with {NO_CHANGES} only. No markdown code fences."
+)
+
+BLOCK_PATTERN = re.compile(
+    r'^File:[ \t]*`?(?P<file>[A-Za-z_$][\w$]*\.java)`?[ \t]*\n'
+    r'<{5,9} SEARCH[ \t]*\n(?P<search>.*?)^={5,9}[ \t]*\n(?P<replace>.*?)^>{5,9} REPLACE[ \t]*$',
+    re.MULTILINE | re.DOTALL
+)
+
+
+def patch_mode_enabled():
+    return os.getenv("REPAIR_MODE", "patch").strip().lower() != "rewrite"
+
+
+def render_files(files):
+    """The files of a review prompt, each under its name so edits can refer to it."""
+    return "".join(f"### {name}\n{files[name]}\n\n" for name in sorted(files))
+
+
+def parse_edits(response_content):
+    """
+    Return [(file_name, search, replace)] from a response, [] for NO CHANGES,
+    or None when the response contains neither.
+    """
+    edits = [
+        (match.group("file"), match.group("search"), match.group("replace"))
+        for match in BLOCK_PATTERN.finditer(response_content)
+    ]
+    if edits:
+        return edits
+    return [] if response_content.strip().rstrip(".").upper() == NO_CHANGES else None
+
+
+def _find_lines(content, search):
+    """(start, end) of the single line range of content equal to search up to indentation and trailing spaces."""
+    lines = content.splitlines(keepends=True)
+    wanted = [line.strip() for line in search.splitlines()]
+    while wanted and not wanted[-1]:
+        wanted.pop()
+    if not wanted:
+        return None
+    stripped = [line.strip() for line in lines]
+    found = [
+        index for index in range(len(lines) - len(wanted) + 1)
+        if stripped[index:index + len(wanted)] == wanted
+    ]
+    if len(found) != 1:
+        return None
+    start = sum(len(line) for line in lines[:found[0]])
+    return start, start + sum(len(line) for line in lines[found[0]:found[0] + len(wanted)])
+
+
+@traced("postprocess")
+def apply_edits(files, edits):
+    """Apply edits to {file_name: content}; returns the edited files, or None if an edit does not apply."""
+    files = dict(files)
+    for file_name, search, replace in edits:
+        content = files.get(file_name)
+        if content is None:
+            if search.strip():
+                print(f"Edit rejected: {file_name} does not exist.")
+                return None
+            files[file_name] = replace
+            continue
+        if not search.strip():
+            print(f"Edit rejected: empty search text for the existing file {file_name}.")
+            return None
+        if content.count(search) == 1:
+            files[file_name] = content.replace(search, replace)
+            continue
+        span = _find_lines(content, search)
+        if span is None:
+            print(f"Edit rejected: search text not found exactly once in {file_name}: {search.strip()[:50]}")
+            return None
+        if not replace.endswith("\n") and content[span[1] - 1:span[1]] == "\n":
+            replace += "\n"
+        files[file_name] = content[:span[0]] + replace + content[span[1]:]
+    return files
+
+
+def request_edits(client, prompt, files, stage="edits"):
+    """
+    Ask for edits to {file_name: content} with a prompt that shows them (see
+    render_files) and apply them. Returns the edited files, or None when the
+    response failed, had no valid edits or an edit did not apply.
+    """
+    response_content = generate_with_retries(client, f"{prompt}\n\n{EDIT_INSTRUCTIONS}", max_retries=3, stage=stage)
+    if response_content is None:
+        return None
+    edits = parse_edits(response_content)
+    if edits is None:
+        print(f"No edit blocks in the {stage} response.")
+        return None
+    edited = apply_edits(files, edits)
+    if edited is not None:
+        changed = sorted(name for name in edited if edited[name] != files.get(name))
+        print(f"Applied {len(edits)} edit(s) for {stage}: {', '.join(changed) or 'no changes'}")
+    return edited
@@ -0,0 +1,539 @@
+# shared-workflows/scripts/fake_openai_server.py
+
+"""
+Local stand-in for the OpenAI chat-completions API.
+
+Serves templated task descriptions, Java solutions, JUnit tests and review
+texts depending on which stage sent the prompt (plain or as a server-sent
+event stream when the request sets "stream", or as {"files": [...]} JSON when
+it asks for a json_schema response format), and can inject latency,
+429 rate limits, 5xx errors, truncated completions and dropped connections.
+Point the scripts at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python fake_openai_server.py --port 8089 --latency lognormal:-0.5,0.6 --rate-429 0.05
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from java_lexer import split_types
+
+TASK_DESCRIPTION = """# {title}
+
+In this task you are going to practice modelling objects in Java: {theme}
+
+### 💀 Deadline
+This work should be completed before the exercise, on **Friday 20th September**.
+
+### 📝 Preparation
+Read the course material on classes, fields and methods before you start.
+
+### ✅ Learning Goals
+* Designing Java classes
+* Adding instance fields
+* Adding a constructor method
+* Creating *getters* and *setters*
+
+### 🏛 Assignment
+
+#### Exercise 1.0 -- The `Player` class
+Create a class `Player` with a name, a position and a score.
+
+#### Exercise 1.1 -- The `Enemy` class
+Create a class `Enemy` with a name and an amount of hit points.
+
+#### Exercise 1.2 -- The `Game` class
+Create a class `Game` that moves the player and lets it attack enemies.
+"""
+
+SOLUTION_CODE = """import java.util.ArrayList;
+import java.util.List;
+
+/**
+ * A player that can move around and collect points.
+ */
+public class Player {
+    private String name;
+    private int x;
+    private int y;
+    private int score;
+
+    public Player(String name) {
+        this.name = name;
+    }
+
+    public String getName() {
+        return name;
+    }
+
+    public int getX() {
+        return x;
+    }
+
+    public int getY() {
+        return y;
+    }
+
+    public int getScore() {
+        return score;
+    }
+
+    public void move(int dx, int dy) {
+        x += dx;
+        y += dy;
+    }
+
+    public void addScore(int points) {
+        if (points < 0) {
+            throw new IllegalArgumentException("Points must be positive");
+        }
+        score += points;
+    }
+}
+
+/**
+ * An enemy with hit points.
+ */
+public class Enemy {
+    private String name;
+    private int hp;
+
+    public Enemy(String name, int hp) {
+        this.name = name;
+        this.hp = hp;
+    }
+
+    public String getName() {
+        return name;
+    }
+
+    public int getHp() {
+        return hp;
+    }
+
+    public boolean isDefeated() {
+        return hp <= 0;
+    }
+
+    public void takeDamage(int damage) {
+        hp = Math.max(0, hp - damage);
+    }
+}
+
+/**
+ * Keeps track of the player and the enemies.
+ */
+public class Game {
+    private Player player;
+    private List<Enemy> enemies = new ArrayList<>();
+
+    public Game(Player player) {
+        this.player = player;
+    }
+
+    public void addEnemy(Enemy enemy) {
+        enemies.add(enemy);
+    }
+
+    public int remainingEnemies() {
+        int count = 0;
+        for (Enemy enemy : enemies) {
+            if (!enemy.isDefeated()) {
+                count++;
+            }
+        }
+        return count;
+    }
+
+    public void attack(Enemy enemy, int damage) {
+        enemy.takeDamage(damage);
+        if (enemy.isDefeated()) {
+            player.addScore(10);
+        }
+    }
+}
+"""
+
+TEST_CODE = """import org.junit.Before;
+import org.junit.Test;
+import static org.junit.Assert.*;
+
+public class PlayerTest {
+    private Player player;
+
+    @Before
+    public void setUp() {
+        player = new Player("Hero");
+    }
+
+    @Test
+    public void testMove() {
+        player.move(2, 3);
+        assertEquals(2, player.getX());
+        assertEquals(3, player.getY());
+    }
+
+    @Test(expected = IllegalArgumentException.class)
+    public void testNegativeScore() {
+        player.addScore(-1);
+    }
+}
+
+public class EnemyTest {
+    @Test
+    public void testTakeDamage() {
+        Enemy enemy = new Enemy("Slime", 5);
+        enemy.takeDamage(10);
+        assertEquals(0, enemy.getHp());
+        assertTrue(enemy.isDefeated());
+    }
+}
+"""
+
+TEMPLATE_CODE = """/**
+ * A player that can move around and collect points.
+ */
+public class Player {
+    private String name;
+
+    public Player(String name) {
+        // TODO: Implement this method.
+    }
+
+    public String getName() {
+        // TODO: Implement logic and return the appropriate value.
+        return null;
+    }
+}
+"""
+
+FEEDBACK_TEXT = """Good work so far! A few hints:
+
+* Check how `addScore` handles negative values.
+* Remember that `takeDamage` should never make the hit points negative.
+"""
+
+COMPLIMENT_TEXT = """Great job! All tests pass. You modelled the classes cleanly, used encapsulation \
+for every field and handled the invalid inputs the task asked for."""
+
+# (pattern on the user prompt, body template) in priority order
+RESPONSE_TEMPLATES = [
+    (re.compile(r"SEARCH/REPLACE edit blocks"), "NO CHANGES\n"),
+    (re.compile(r"Create a new programming task", re.I), TASK_DESCRIPTION),
+    (re.compile(r"code template", re.I), TEMPLATE_CODE),
+    (re.compile(r"generate a set of high-quality unit tests|Java test code", re.I), TEST_CODE),
+    (re.compile(r"complete and functional Java solution|solution code", re.I), SOLUTION_CODE),
+    (re.compile(r"compliment", re.I), COMPLIMENT_TEXT),
+]
+
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution spec into a function returning seconds.
+    Supported: fixed:S, uniform:LO,HI, normal:MEAN,STD, lognormal:MU,SIGMA, exponential:MEAN.
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    try:
+        if kind == "fixed":
+            (seconds,) = values
+            return lambda rng: seconds
+        if kind == "uniform":
+            low, high = values
+            return lambda rng: rng.uniform(low, high)
+        if kind == "normal":
+            mean, std = values
+            return lambda rng: max(0.0, rng.gauss(mean, std))
+        if kind == "lognormal":
+            mu, sigma = values
+            return lambda rng: rng.lognormvariate(mu, sigma)
+        if kind == "exponential":
+            (mean,) = values
+            return lambda rng: rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) for the usage block."""
+    return max(1, len(text) // 4)
+
+
+class FakeServerConfig:
+    """Behaviour of the fake server; every rate is a probability per request."""
+
+    def __init__(self, latency="fixed:0", rate_429=0.0, rate_5xx=0.0, rate_truncate=0.0,
+                 rate_disconnect=0.0, retry_after=1, canned=None, seed=None,
+                 stream_chunk_chars=16, stream_chunk_delay=0.0):
+        self.latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_truncate = rate_truncate
+        self.rate_disconnect = rate_disconnect
+        self.retry_after = retry_after
+        self.canned = canned or []
+        self.stream_chunk_chars = max(1, stream_chunk_chars)
+        self.stream_chunk_delay = stream_chunk_delay  # Seconds between streamed chunks
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "ok": 0, "429": 0, "5xx": 0, "truncated": 0, "disconnected": 0}
+
+    def roll(self):
+        """Draw the latency and the fault (if any) for one request."""
+        with self.rng_lock:
+            delay = self.latency(self.rng)
+            draw = self.rng.random()
+        for fault, rate in (("429", self.rate_429), ("5xx", self.rate_5xx),
+                            ("disconnected", self.rate_disconnect), ("truncated", self.rate_truncate)):
+            if draw < rate:
+                return delay, fault
+            draw -= rate
+        return delay, None
+
+    def count(self, outcome):
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats[outcome] += 1
+
+    def render(self, prompt):
+        """Pick the response body for a prompt: user-supplied canned bodies first, then the templates."""
+        for pattern, body in self.canned:
+            if pattern.search(prompt):
+                return body
+        for pattern, body in RESPONSE_TEMPLATES:
+            if pattern.search(prompt):
+                theme = re.search(r"theme:\s*(.+?)\.\s", prompt)
+                theme = theme.group(1) if theme else "a small game"
+                return body.replace("{title}", "Generated Task").replace("{theme}", theme)
+        return FEEDBACK_TEXT
+
+
+def render_files_json(content):
+    """Answer a structured-output request: the rendered Java split into {"files": [{path, content}]}."""
+    files = [{"path": f"{name}.java", "content": source} for name, source in split_types(content)]
+    return json.dumps({"files": files})
+
+
+def load_canned(path):
+    """Load canned responses from a JSON list of {"match": regex, "body": text}."""
+    with open(path, "r") as file:
+        entries = json.load(file)
+    return [(re.compile(entry["match"], re.I | re.S), entry["body"]) for entry in entries]
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "gpt-4o-2024-08-06", "object": "model"}]})
+        elif self.path.rstrip("/").endswith("/stats"):
+            with self.server.config.stats_lock:
+                self._send_json(200, dict(self.server.config.stats))
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        config = self.server.config
+        delay, fault = config.roll()
+        time.sleep(delay)
+
+        if fault == "429":
+            config.count("429")
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                            headers={"Retry-After": str(config.retry_after)})
+            return
+        if fault == "5xx":
+            config.count("5xx")
+            with config.rng_lock:
+                status = config.rng.choice([500, 502, 503])
+            self._send_json(status, {"error": {"message": "The server had an error", "type": "server_error"}})
+            return
+
+        messages = request.get("messages", [])
+        prompt = "\n".join(str(message.get("content", "")) for message in messages if message.get("role") == "user")
+        content = config.render(prompt)
+        if (request.get("response_format") or {}).get("type") == "json_schema":
+            content = render_files_json(content)
+        finish_reason = "stop"
+        if fault == "truncated":
+            content = content[:max(1, len(content) // 2)]
+            finish_reason = "length"
+
+        payload = {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-2024-08-06"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": finish_reason,
+            }],
+            "usage": {
+                "prompt_tokens": estimate_tokens(prompt),
+                "completion_tokens": estimate_tokens(content),
+                "total_tokens": estimate_tokens(prompt) + estimate_tokens(content),
+            },
+        }
+
+        if request.get("stream"):
+            config.count(fault or "ok")
+            self._send_stream(payload, content, finish_reason, disconnect=fault == "disconnected",
+                              include_usage=(request.get("stream_options") or {}).get("include_usage"))
+            return
+
+        if fault == "disconnected":
+            # Promise the full body but drop the connection halfway through it
+            config.count("disconnected")
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        config.count("truncated" if fault == "truncated" else "ok")
+        self._send_json(200, payload)
+
+    def _send_stream(self, payload, content, finish_reason, disconnect=False, include_usage=False):
+        """Send the completion as server-sent events in small chunks, like the real streaming API."""
+        config = self.server.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(data):
+            body = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(body):x}\r\n".encode("ascii") + body + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta, finish=None, usage=None):
+            return json.dumps({
+                "id": payload["id"],
+                "object": "chat.completion.chunk",
+                "created": payload["created"],
+                "model": payload["model"],
+                "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish}],
+                "usage": usage,
+            })
+
+        size = config.stream_chunk_chars
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+        event(chunk({"role": "assistant", "content": ""}))
+        for number, piece in enumerate(pieces):
+            if disconnect and number >= len(pieces) // 2:
+                self.close_connection = True
+                return
+            if config.stream_chunk_delay:
+                time.sleep(config.stream_chunk_delay)
+            event(chunk({"content": piece}))
+        event(chunk({}, finish=finish_reason))
+        if include_usage:
+            event(chunk(None, usage=payload["usage"]))
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def make_server(host="127.0.0.1", port=0, config=None):
+    """Create (but do not start) a fake server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), ChatCompletionsHandler)
+    server.daemon_threads = True
+    server.config = config or FakeServerConfig()
+    return server
+
+
+def serve_in_thread(config=None, host="127.0.0.1", port=0):
+    """Start a fake server on a background thread and return (server, base_url)."""
+    server = make_server(host, port, config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}/v1"
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat-completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0",
+                        help="fixed:S | uniform:LO,HI | normal:MEAN,STD | lognormal:MU,SIGMA | exponential:MEAN")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Probability of a 500/502/503 response")
+    parser.add_argument("--rate-truncate", type=float, default=0.0,
+                        help="Probability of a completion cut short with finish_reason=length")
+    parser.add_argument("--rate-disconnect", type=float, default=0.0,
+                        help="Probability of dropping the connection mid-body")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--canned", help="JSON file with a list of {\"match\": regex, \"body\": text}")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible latency and faults")
+    parser.add_argument("--stream-chunk-chars", type=int, default=16, help="Characters per streamed chunk")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    args = parser.parse_args(argv)
+
+    try:
+        config = FakeServerConfig(
+            latency=args.latency,
+            rate_429=args.rate_429,
+            rate_5xx=args.rate_5xx,
+            rate_truncate=args.rate_truncate,
+            rate_disconnect=args.rate_disconnect,
+            retry_after=args.retry_after,
+            canned=load_canned(args.canned) if args.canned else None,
+            seed=args.seed,
+            stream_chunk_chars=args.stream_chunk_chars,
+            stream_chunk_delay=args.stream_chunk_delay,
+        )
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    server = make_server(args.host, args.port, config)
+    print(f"Fake OpenAI server listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,46 @@
+# shared-workflows/scripts/file_utils.py
+
+"""Small file helpers shared by the generation scripts."""
+
+import os
+import tempfile
+
+from tracing import traced
+
+
+@traced("io")
+def read_text(file_path):
+    """Return the content of a text file."""
+    with open(file_path, "r") as file:
+        return file.read()
+
+
+@traced("io")
+def write_text_atomic(file_path, content):
+    """
+    Write content to file_path via a temporary file and rename, so readers
+    (and a later `git add`) never see a half-written file.
+    """
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(content)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files readable by the owner only
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def remove_files(directory, file_names):
+    """Delete the files from the directory, ignoring those already gone."""
+    for file_name in file_names:
+        try:
+            os.remove(os.path.join(directory, file_name))
+        except FileNotFoundError:
+            pass
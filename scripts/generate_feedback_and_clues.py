@@ -1,19 +1,20 @@
 import os
 import sys
 import subprocess
-from openai import OpenAI
+from file_utils import read_text
+from llm_client import get_client, generate_with_retries
+from tracing import init_tracing, traced
 
 def main(api_key, head_branch, base_branch):
     if not api_key:
         print("Error: OpenAI API key is missing.")
         sys.exit(1)
 
-    client = OpenAI(api_key=api_key)
+    client = get_client(api_key)
 
     # Read the student's code
     try:
-        with open("src/template_code.java", "r") as file:
-            student_code = file.read()
+        student_code = read_text("src/template_code.java")
     except FileNotFoundError:
         print("Error: template_code.java file not found.")
         sys.exit(1)
@@ -26,7 +27,7 @@ def main(api_key, head_branch, base_branch):
         f"```java\n{student_code}\n```\n\n"
     )
     
-    feedback = generate_with_retries(client, prompt, max_retries=3)
+    feedback = generate_with_retries(client, prompt, max_retries=3, stage="feedback")
     if feedback is None:
         print("Error: Failed to generate feedback after multiple retries.")
         sys.exit(1)
@@ -34,23 +35,7 @@ def main(api_key, head_branch, base_branch):
     # Post the feedback as a PR comment
     post_comment_on_pr(feedback)
 
-def generate_with_retries(client, prompt, max_retries=3):
-    for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error generating feedback: {e}")
-            if attempt < max_retries - 1:
-                print("Retrying...")
-    return None
-
+@traced("github")
 def post_comment_on_pr(comment):
     pr_number = os.getenv('GITHUB_PR_NUMBER')
     repo = os.getenv('GITHUB_REPOSITORY')
@@ -61,12 +46,14 @@ def post_comment_on_pr(comment):
     ]
     subprocess.run(command, check=True)
 
-if len(sys.argv) != 4:
-    print("Error: Missing required command line arguments 'api_key', 'head_branch', and 'base_branch'")
-    sys.exit(1)
+if __name__ == "__main__":
+    init_tracing()
+    if len(sys.argv) != 4:
+        print("Error: Missing required command line arguments 'api_key', 'head_branch', and 'base_branch'")
+        sys.exit(1)
 
-api_key = sys.argv[1]
-head_branch = sys.argv[2]
-base_branch = sys.argv[3]
+    api_key = sys.argv[1]
+    head_branch = sys.argv[2]
+    base_branch = sys.argv[3]
 
-main(api_key, head_branch, base_branch)
+    main(api_key, head_branch, base_branch)
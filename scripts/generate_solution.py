@@ -1,29 +1,21 @@
 # shared-workflows/scripts/generate_solution.py
 
 import os
-import re
 import sys
 import subprocess
-from openai import OpenAI
-
-def main(api_key, branch_name):
-    if not api_key:
-        print("Error: OpenAI API key is missing.")
-        sys.exit(1)
-
-    client = OpenAI(api_key=api_key)
-
-    # Read the new task description
-    try:
-        with open("tasks/new_task.md", "r") as file:
-            task_description = file.read()
-    except FileNotFoundError:
-        print("Error: new_task.md file not found.")
-        sys.exit(1)
-
-
-    # Inspirational code snippet for the solution
-    inspirational_code = """
+from class_stream import ClassStreamSplitter
+from file_utils import read_text, remove_files, write_text_atomic
+from git_utils import commit_paths, push
+from java_lexer import declared_types, normalize_source, split_types
+from llm_client import get_client, generate_with_retries, stream_with_retries, streaming_enabled
+from prompts import PromptTemplate, Section, register
+from structured_output import generate_files, structured_output_enabled
+from symbol_index import import_table
+from task_bank import retrieve_example
+from tracing import init_tracing, traced
+
+# Inspirational code snippet for the solution
+INSPIRATIONAL_CODE = """
     /**
     * A class representing a rectangle with some common operations and properties.
     * Example solution for exercise 3.0
@@ -170,165 +162,187 @@ def main(api_key, branch_name):
     }
     """
 
-    # Combine task description and inspirational code into a single prompt for solution generation
-    prompt = (
-        f"Based on the following task description, generate a complete and functional Java solution that meets all the requirements. "
-        f"The solution should be well-structured, use meaningful variable names, include necessary comments for clarity, "
-        f"and be ready to pass a comprehensive set of unit tests.\n\n"
-        f"### Task Description\n\n"
-        f"{task_description}\n\n"
-        f"### Inspirational Code Snippet\n\n"
-        f"{inspirational_code}\n\n"
+SOLUTION_PROMPT = register(PromptTemplate(
+    "solution",
+    instructions=(
+        "Based on the task description at the end of this prompt, generate a complete and functional Java solution that meets all the requirements. "
+        "The solution should be well-structured, use meaningful variable names, include necessary comments for clarity, "
+        "and be ready to pass a comprehensive set of unit tests."
+    ),
+    sections=[Section("Inspirational Code Snippet", INSPIRATIONAL_CODE, optional=True)],
+    notes=(
         "IMPORTANT: The response must be plain Java code with no markdown formatting or ```java blocks. "
         "Ensure that each class is entirely self-contained and is not left incomplete. "
         "No part of the next file should be left in the current file. "
-        "Ensure that each class is saved in its own appropriately named file, and that there are no 'leftover' initializers or class definitions from subsequent files."
-        "Ensure all imports, public classes, and everything related to the class is included in the appropriate file."
-        "Write NO TEXT beyond the code itself, whatsoever. "
-    )
+        "Ensure that each class is saved in its own appropriately named file, and that there are no 'leftover' initializers or class definitions from subsequent files. "
+        "Ensure all imports, public classes, and everything related to the class is included in the appropriate file. "
+        "Write NO TEXT beyond the code itself, whatsoever."
+    ),
+    request="### Task Description\n\n{task_description}\n",
+))
 
-    # Call OpenAI API to generate the solution code
-    response_content = generate_with_retries(client, prompt, max_retries=3)
-    if response_content is None:
-        print("Error: Failed to generate solution code after multiple retries.")
+def main(api_key, branch_name):
+    if not api_key:
+        print("Error: OpenAI API key is missing.")
+        sys.exit(1)
+
+    client = get_client(api_key)
+
+    # Read the new task description
+    try:
+        task_description = read_text("tasks/new_task.md")
+    except FileNotFoundError:
+        print("Error: new_task.md file not found.")
         sys.exit(1)
 
     # Ensure the .hidden_tasks directory exists
     hidden_tasks_dir = os.path.join(".hidden_tasks")
     os.makedirs(hidden_tasks_dir, exist_ok=True)
 
-    # Write the generated code to Java files
-    write_generated_code_to_files(hidden_tasks_dir, response_content)
+    if streaming_enabled():
+        # Write each class as soon as it has been generated
+        response_content = stream_solution_to_files(client, task_description, hidden_tasks_dir)
+        if response_content is None:
+            print("Error: Failed to generate solution code after multiple retries.")
+            sys.exit(1)
+    elif structured_output_enabled():
+        # Ask for the files as JSON and write them as they are
+        files = generate_solution_files(client, task_description)
+        if files is None:
+            print("Error: Failed to generate solution code after multiple retries.")
+            sys.exit(1)
+        write_files_to_directory(hidden_tasks_dir, files)
+    else:
+        # Call OpenAI API to generate the solution code
+        response_content = generate_solution(client, task_description)
+        if response_content is None:
+            print("Error: Failed to generate solution code after multiple retries.")
+            sys.exit(1)
+
+        # Write the generated code to Java files
+        write_generated_code_to_files(hidden_tasks_dir, response_content)
 
     # Commit and push changes
     commit_and_push_changes(branch_name, hidden_tasks_dir)
 
-def write_generated_code_to_files(directory, code_content):
-    """
-    Write generated Java code to appropriate files in the specified directory.
-    Handles cases where leftover comments or initializations are present.
-    Also ensures that import statements and public class declarations are captured.
-    """
-    leftover_content = ""  # To capture leftover content before the first class
-    current_imports = ""   # To capture and carry over import statements
-    file_blocks = re.split(r'\b(class|public\s+class|abstract\s+class|final\s+class)\b', code_content)  # Split on different class declarations
+def generate_solution(client, task_description):
+    """Generate the raw Java solution for a task description, or None on failure."""
+    prompt = build_solution_prompt(task_description)
 
-    for i in range(1, len(file_blocks), 2):  # Iterate over every class block
-        class_declaration = file_blocks[i] + file_blocks[i + 1]  # Reattach split 'class' or 'public class'
-        block = leftover_content + class_declaration
+    # Call OpenAI API to generate the solution code
+    return generate_with_retries(client, prompt, max_retries=3, stage="solution code")
 
-        # Extract class name
-        class_name_match = re.search(r'class\s+([A-Za-z_]\w*)\s*{', block)  # Match 'class ClassName {'
-        if class_name_match:
-            class_name = class_name_match.group(1)  # Extract the class name
-        else:
-            print(f"Skipping block due to missing class name in block: {block[:50]}")
-            continue
+def generate_solution_files(client, task_description):
+    """Generate the solution in structured-output mode as (file_name, content) pairs, or None on failure."""
+    files = generate_files(client, build_solution_prompt(task_description), max_retries=3, stage="solution code")
+    if files is None:
+        return None
+    local_types = set().union(*(declared_types(content) for _, content in files))
+    return [(file_name, check_and_add_missing_imports(content, local_types)) for file_name, content in files]
 
-        # Clean up the block, removing content after the last closing brace
-        cleaned_block = clean_class_block(block)
+def stream_solution_to_files(client, task_description, directory):
+    """
+    Stream the solution and write every class to the directory as soon as its
+    closing brace arrives. Returns the full response, or None on failure.
+    Classes declared later in the stream are only known at the end, so files
+    whose imports change once they are known are written again.
+    """
+    written = {}  # {class name: (source, written content)}
 
-        # Ensure the necessary imports are included
-        cleaned_block = check_and_add_missing_imports(cleaned_block)
+    def write_class(class_name, source, local_types=()):
+        file_name = f"{class_name}.java"
+        content = check_and_add_missing_imports(source, local_types)
+        if class_name in written and written[class_name][1] == content:
+            return
+        try:
+            write_text_atomic(os.path.join(directory, file_name), content)
+            written[class_name] = (source, content)
+            print(f"Successfully wrote {file_name}")
+        except IOError as e:
+            print(f"Error writing file {file_name}: {e}")
 
-        # Prepend any import statements (gathered from previous blocks)
-        cleaned_block = current_imports + cleaned_block
+    def discard_written():
+        # A retry restarts the stream, so the classes of the failed attempt must not outlive it
+        remove_files(directory, [f"{class_name}.java" for class_name in written])
+        written.clear()
+
+    splitter = ClassStreamSplitter(lambda class_name, source: write_class(class_name, source, set(written)), discard_written)
+    prompt = build_solution_prompt(task_description)
+    response_content = stream_with_retries(client, prompt, splitter, max_retries=3, stage="solution code")
+    splitter.close()
+    if response_content is not None:
+        local_types = declared_types(response_content)
+        for class_name, (source, _) in list(written.items()):
+            write_class(class_name, source, local_types)
+    return response_content
+
+@traced("prompt")
+def build_solution_prompt(task_description):
+    """Build the solution generation prompt for a task description."""
+    # Add the most relevant solution file from the task bank after the shared prefix
+    example = retrieve_example("solution", task_description)
+    examples = {"Code Snippet From a Similar Task": example} if example else None
+    return SOLUTION_PROMPT.render(examples, task_description=task_description)
 
-        # Clear leftover and import content for the next file
-        leftover_content = ""
-        current_imports = ""
+def write_generated_code_to_files(directory, code_content):
+    """
+    Write generated Java code to appropriate files in the specified directory.
+    """
+    write_files_to_directory(directory, split_generated_code(code_content))
 
-        # Write cleaned code to a file
-        file_name = f"{class_name}.java"
+def write_files_to_directory(directory, files):
+    """Write (file_name, content) pairs to the directory."""
+    for file_name, file_content in files:
         file_path = os.path.join(directory, file_name)
 
         try:
             with open(file_path, "w") as java_file:
-                java_file.write(cleaned_block)
+                java_file.write(file_content)
             print(f"Successfully wrote {file_name}")
         except IOError as e:
             print(f"Error writing file {file_name}: {e}")
 
-def clean_class_block(block):
-    """Ensure the block only contains content until the last closing brace."""
-    
-    # Find the position of the last closing brace '}' in the block
-    last_closing_brace = block.rfind("}")
-    
-    if last_closing_brace != -1:
-        # Truncate the block at the last closing brace
-        block = block[:last_closing_brace + 1]
-    
-    return block
-
-def check_and_add_missing_imports(block):
+def split_generated_code(code_content):
     """
-    Check the class block for missing imports and add necessary imports based on the content.
+    Split generated Java code into (file_name, content) pairs, one per top-level type.
+    Uses the Java tokenizer, so braces or the word "class" inside strings and
+    comments, and prose around the code, do not affect the split. Import
+    statements seen before a type are carried into its file.
     """
-    required_imports = {
-        "List": "import java.util.List;",
-        "ArrayList": "import java.util.ArrayList;",
-        "Map": "import java.util.Map;",
-        "HashMap": "import java.util.HashMap;",
-        "Scanner": "import java.util.Scanner;",
-        "Set": "import java.util.Set;",
-        "HashSet": "import java.util.HashSet;",
-        "Random": "import java.util.Random;"
-    }
-
-    # Extract existing imports from the block
-    existing_imports = re.findall(r'^\s*import .*;', block, re.MULTILINE)
-
-    # Add missing imports
-    imports_to_add = []
-    for class_name, import_statement in required_imports.items():
-        if class_name in block and import_statement not in existing_imports:
-            imports_to_add.append(import_statement)
+    files = []
+    local_types = declared_types(code_content)
+    for class_name, block in split_types(code_content):
+        # Ensure the necessary imports are included, without shadowing the solution's own classes
+        files.append((f"{class_name}.java", check_and_add_missing_imports(block, local_types)))
 
-    # Prepend missing imports at the start of the block
-    if imports_to_add:
-        block = "\n".join(imports_to_add) + "\n\n" + block
+    if not files:
+        print(f"Skipping output due to missing class declarations: {code_content[:50]}")
+    return files
 
-    return block
-
-def generate_with_retries(client, prompt, max_retries=3):
-    for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error generating solution code: {e}")
-            if attempt < max_retries - 1:
-                print("Retrying...")
-    return None
+def check_and_add_missing_imports(block, local_types=()):
+    """
+    Check the class block for missing imports and add necessary imports based on the content.
+    Every identifier is looked up in the JDK symbol index, and the same single-pass
+    normalizer as the test clean-up deduplicates the imports. Names in
+    local_types are the other classes of the solution and are never imported.
+    """
+    return normalize_source(block, import_table(), local_types)
 
 def commit_and_push_changes(branch_name, directory_path):
     try:
-        subprocess.run(["git", "config", "--global", "user.email", "actions@github.com"], check=True)
-        subprocess.run(["git", "config", "--global", "user.name", "github-actions"], check=True)
-
-        subprocess.run(["git", "add", directory_path], check=True)
-        subprocess.run(["git", "commit", "-m", "Add generated solution"], check=True)
-        subprocess.run(
-            ["git", "push", "--set-upstream", "origin", branch_name],
-            check=True,
-            env=dict(os.environ, GIT_ASKPASS='echo', GIT_USERNAME='x-access-token', GIT_PASSWORD=os.getenv('GITHUB_TOKEN'))
-        )
+        commit_paths([directory_path], "Add generated solution")
+        push(branch_name, set_upstream=True)
     except subprocess.CalledProcessError as e:
         print(f"Error committing and pushing changes: {e}")
         sys.exit(1)
 
-if len(sys.argv) != 3:
-    print("Error: Missing required command line arguments 'api_key' and 'branch_name'")
-    sys.exit(1)
+if __name__ == "__main__":
+    init_tracing()
+    if len(sys.argv) != 3:
+        print("Error: Missing required command line arguments 'api_key' and 'branch_name'")
+        sys.exit(1)
 
-api_key = sys.argv[1]
-branch_name = sys.argv[2]
+    api_key = sys.argv[1]
+    branch_name = sys.argv[2]
 
-main(api_key, branch_name)
+    main(api_key, branch_name)
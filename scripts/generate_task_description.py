@@ -2,23 +2,17 @@ import os
 import sys
 import subprocess
 from datetime import datetime
-from openai import OpenAI
+from git_utils import commit_paths, create_branch, push
+from llm_client import get_client, generate_with_retries
+from minhash_index import find_similar_task, reuse_similar_enabled
+from prompts import PromptTemplate, Section, register
+from task_bank import task_files
+from tracing import init_tracing, traced
 import pytz
 from pytz import timezone
 
-def main(api_key):
-    if not api_key:
-        print("Error: OpenAI API key is missing.")
-        sys.exit(1)
-
-    client = OpenAI(api_key=api_key)
-
-    # Extract theme and language from environment variables
-    theme = os.getenv("TASK_THEME", "Create a basic Java application with the following requirements.")
-    language = os.getenv("TASK_LANGUAGE", "English")
-
-    # Combine theme into a single prompt
-    learning_goals = """
+# Concepts every generated task has to cover
+LEARNING_GOALS = """
               "* Designing Java classes\n"
               "* Adding instance fields\n"
               "* Adding a constructor method\n"
@@ -27,8 +21,9 @@ def main(api_key):
               "* Using the `main` method\n"
               "* Scope (or *variable shadowing*)\n\n"
               """
-    
-    original_structure = """
+
+# Example task whose structure and format the generated task should follow
+ORIGINAL_STRUCTURE = """
             "# Indamon, I choose you!\n\n"
               "For the second exercise of INDA, you are going to practice on modelling objects in Java. You are going to acquaint yourself with the components of a Java class.\n\n"
               "### 💀 Deadline\n"
@@ -209,23 +204,50 @@ def main(api_key):
 
               """
 
-    prompt = (f"Create a new programming task in {language} with the following theme: {theme}. "
-              f"It is paramount that the generted task description includes and integrates the concepts of {learning_goals}"
-              f"The task should follow a similar structure and format to the provided example {original_structure} , including detailed instructions, preparation steps, learning goals, and assignment description with exercises. "
-              f"Make sure to include the title, subtitle, and emojis for aesthetics. "
-              f"The description should be detailed, well-structured, and aesthetically pleasing to provide thorough instructions for the students."
-             )
+TASK_PROMPT = register(PromptTemplate(
+    "task_description",
+    instructions=(
+        "Create a new programming task in the language and with the theme given at the end of this prompt. "
+        f"It is paramount that the generted task description includes and integrates the concepts of {LEARNING_GOALS}"
+        "The task should follow a similar structure and format to the example task below, including detailed instructions, preparation steps, learning goals, and assignment description with exercises."
+    ),
+    sections=[Section("Example Task", ORIGINAL_STRUCTURE, optional=True)],
+    notes=(
+        "Make sure to include the title, subtitle, and emojis for aesthetics. "
+        "The description should be detailed, well-structured, and aesthetically pleasing to provide thorough instructions for the students."
+    ),
+    request="Write the task in {language} with the following theme: {theme}.{difficulty_note}\n",
+))
+
+def main(api_key):
+    if not api_key:
+        print("Error: OpenAI API key is missing.")
+        sys.exit(1)
+
+    client = get_client(api_key)
 
-    # Call OpenAI API to generate the task description
-    response_content = generate_with_retries(client, prompt, max_retries=3)
+    # Extract theme and language from environment variables
+    theme = os.getenv("TASK_THEME", "Create a basic Java application with the following requirements.")
+    language = os.getenv("TASK_LANGUAGE", "English")
+    difficulty = os.getenv("TASK_DIFFICULTY")
+
+    # Reuse a near-identical task from the bank, or call OpenAI API to generate the task description
+    reused = find_reusable_task(theme, language, difficulty)
+    if reused is not None:
+        response_content = task_files(reused)[os.path.join("tasks", "new_task.md")]
+    else:
+        response_content = generate_task_description(client, theme, language, difficulty)
     if response_content is None:
         print("Error: Failed to generate task description after multiple retries.")
         sys.exit(1)
 
-    # Create a new branch with a unique name
-    stockholm_tz = timezone('Europe/Stockholm')
-    branch_name = f"task-{datetime.now(stockholm_tz).strftime('%Y%m%d%H%M%S')}"
-    create_branch(branch_name)
+    # Create a new branch with a unique name; it is pushed together with the description
+    branch_name = new_branch_name()
+    try:
+        create_branch(branch_name)
+    except subprocess.CalledProcessError as e:
+        print(f"Error creating branch: {e}")
+        sys.exit(1)
 
     # Write the response content to a markdown file
     task_file_path = os.path.join("tasks", "new_task.md")
@@ -238,44 +260,37 @@ def main(api_key):
     # Output the branch name for the next job
     print(f"::set-output name=branch_name::{branch_name}")
 
-def generate_with_retries(client, prompt, max_retries=3):
-    for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error generating task description: {e}")
-            if attempt < max_retries - 1:
-                print("Retrying...")
-    return None
+def new_branch_name():
+    """Unique task branch name based on the current Stockholm time."""
+    stockholm_tz = timezone('Europe/Stockholm')
+    return f"task-{datetime.now(stockholm_tz).strftime('%Y%m%d%H%M%S')}"
 
-def create_branch(branch_name):
-    try:
-        github_token = os.getenv('GITHUB_TOKEN')
-        if not github_token:
-            print("Error: GITHUB_TOKEN environment variable is not set.")
-            sys.exit(1)
-            
-        subprocess.run(["git", "checkout", "-b", branch_name], check=True)
-        subprocess.run(
-            ["git", "push", "-u", "origin", branch_name],
-            check=True,
-            env={
-                **os.environ,
-                "GIT_ASKPASS": "echo",
-                "GIT_USERNAME": "x-access-token",
-                "GIT_PASSWORD": github_token  # Use the fetched GITHUB_TOKEN
-            }
-        )
-    except subprocess.CalledProcessError as e:
-        print(f"Error creating branch: {e}")
-        sys.exit(1)
+def find_reusable_task(theme, language, difficulty=None):
+    """
+    Look the theme up in the task bank before anything is generated. Returns the
+    name of a near-identical task when TASK_REUSE_SIMILAR allows reusing it, else None.
+    """
+    match = find_similar_task(theme, language, difficulty)
+    if match is None:
+        return None
+    similarity, task = match
+    print(f"The theme is close to the existing task '{task['name']}' ({task['theme']}, similarity {similarity:.2f}).")
+    if not reuse_similar_enabled():
+        print("Set TASK_REUSE_SIMILAR=1 to reuse it instead of generating a new task.")
+        return None
+    print(f"Reusing task '{task['name']}'.")
+    return task["name"]
+
+def generate_task_description(client, theme, language, difficulty=None):
+    """Generate the markdown task description for a theme, or None on failure."""
+    prompt = build_task_prompt(theme, language, difficulty)
+    return generate_with_retries(client, prompt, max_retries=3, stage="task description")
+
+@traced("prompt")
+def build_task_prompt(theme, language, difficulty=None):
+    """Build the task description prompt for a theme, a natural language and an optional difficulty level."""
+    difficulty_note = f" The exercises should be of {difficulty} difficulty." if difficulty else ""
+    return TASK_PROMPT.render(theme=theme, language=language, difficulty_note=difficulty_note)
 
 def commit_and_push_changes(branch_name, task_file_path):
     try:
@@ -284,29 +299,18 @@ def commit_and_push_changes(branch_name, task_file_path):
             print("Error: GITHUB_TOKEN environment variable is not set.")
             sys.exit(1)
 
-        subprocess.run(["git", "config", "--global", "user.email", "actions@github.com"], check=True)
-        subprocess.run(["git", "config", "--global", "user.name", "github-actions"], check=True)
-
-        subprocess.run(["git", "add", task_file_path], check=True)
-        subprocess.run(["git", "commit", "-m", f"Add new task description: {branch_name}"], check=True)
-        subprocess.run(
-            ["git", "push", "--set-upstream", "origin", branch_name],
-            check=True,
-            env={
-                **os.environ,
-                "GIT_ASKPASS": "echo",
-                "GIT_USERNAME": "x-access-token",
-                "GIT_PASSWORD": github_token  # Use the fetched GITHUB_TOKEN
-            }
-        )
+        commit_paths([task_file_path], f"Add new task description: {branch_name}")
+        push(branch_name, set_upstream=True)
     except subprocess.CalledProcessError as e:
         print(f"Error committing and pushing changes: {e}")
         sys.exit(1)
 
-if len(sys.argv) != 2:
-    print("Error: Missing required command line argument 'api_key'")
-    sys.exit(1)
+if __name__ == "__main__":
+    init_tracing()
+    if len(sys.argv) != 2:
+        print("Error: Missing required command line argument 'api_key'")
+        sys.exit(1)
 
-api_key = sys.argv[1]
+    api_key = sys.argv[1]
 
-main(api_key)
+    main(api_key)
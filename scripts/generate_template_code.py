@@ -1,23 +1,27 @@
 import os
 import sys
 import subprocess
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from file_utils import read_text, write_text_atomic
+from git_utils import commit_paths, fetch_branches, git, push
+from java_lexer import TYPE_KEYWORDS, tokenize
+from llm_client import get_client, generate_with_retries
+from tracing import init_tracing, traced
 
 def main(api_key, branch_name):
     if not api_key:
         print("Error: OpenAI API key is missing.")
         sys.exit(1)
 
-    client = OpenAI(api_key=api_key)
+    client = get_client(api_key)
 
     # Read the existing solution code from .hidden_tasks directory
     solution_dir = ".hidden_tasks"
     solution_files = []
     try:
-        for filename in os.listdir(solution_dir):
+        for filename in sorted(os.listdir(solution_dir)):
             if filename.endswith(".java"):
-                with open(os.path.join(solution_dir, filename), "r") as file:
-                    solution_files.append((filename, file.read()))
+                solution_files.append((filename, read_text(os.path.join(solution_dir, filename))))
     except FileNotFoundError:
         print("Error: Solution files not found in .hidden_tasks directory.")
         sys.exit(1)
@@ -26,21 +30,21 @@ def main(api_key, branch_name):
         print("Error: No Java solution files found in .hidden_tasks.")
         sys.exit(1)
 
-    # Generate a template from the solution for each file
-    for filename, solution_content in solution_files:
-        template_content = generate_template_from_solution(solution_content)
+    # Generate and review the template for each file concurrently; results keep the file order
+    with ThreadPoolExecutor(max_workers=template_workers(len(solution_files))) as executor:
+        templates = list(executor.map(
+            lambda solution_file: derive_template(client, solution_file[1]),
+            solution_files
+        ))
 
-        # Review the generated template using OpenAI API
-        reviewed_template = review_template_with_openai(client, template_content)
-
-        # Write the final reviewed template to gen_src directory
-        gen_src_dir = "gen_src"
-        os.makedirs(gen_src_dir, exist_ok=True)
+    # Write the final reviewed templates to gen_src directory
+    gen_src_dir = "gen_src"
+    os.makedirs(gen_src_dir, exist_ok=True)
+    for (filename, _), reviewed_template in zip(solution_files, templates):
         file_path = os.path.join(gen_src_dir, filename)
 
         try:
-            with open(file_path, "w") as template_file:
-                template_file.write(reviewed_template)
+            write_text_atomic(file_path, reviewed_template)
             print(f"Successfully created and reviewed template for {filename}")
         except IOError as e:
             print(f"Error writing file {filename}: {e}")
@@ -48,37 +52,259 @@ def main(api_key, branch_name):
     # Commit and push changes
     commit_and_push_changes(branch_name, gen_src_dir)
 
+def template_workers(file_count):
+    """Threads deriving templates at once: TEMPLATE_WORKERS (default 8), at most one per file."""
+    return max(1, min(int(os.getenv("TEMPLATE_WORKERS", "8")), file_count))
+
+def derive_template(client, solution_content):
+    """Strip a solution file down to a template; with TEMPLATE_REVIEW=1 the model also reviews it."""
+    template_content = generate_template_from_solution(solution_content)
+    if not template_review_enabled():
+        return template_content
+
+    # Review the generated template using OpenAI API
+    return review_template_with_openai(client, template_content)
+
+def template_review_enabled():
+    return os.getenv("TEMPLATE_REVIEW", "").strip().lower() in ("1", "true", "yes")
+
+@traced("postprocess")
 def generate_template_from_solution(solution_content):
     """
     Simplifies the solution code to create a student template by removing method bodies
-    and complex logic while keeping method signatures and class structures intact.
+    while keeping method signatures, fields, Javadoc and class structures intact.
+
+    Works on the token stream, so nested blocks, inner and anonymous classes, enum
+    constant bodies, lambdas and braces in strings or comments are handled. Each
+    method body becomes a TODO with a return statement that fits its return type.
+    Constructors keep their super(...)/this(...) call and the assignments of
+    blank final fields, and static/instance initializers are kept, so the
+    template still compiles.
     """
-    template_lines = []
-    in_method_body = False
-
-    for line in solution_content.splitlines():
-        stripped_line = line.strip()
-
-        # Detect the start of a method (i.e., a line ending with '{')
-        if stripped_line.endswith("{") and not stripped_line.startswith("class"):
-            template_lines.append(line)  # Keep the method signature
-            in_method_body = True  # Enter method body, which will be removed
-        elif in_method_body:
-            # Detect the end of a method (a single '}')
-            if stripped_line == "}":
-                template_lines.append(line)  # Keep the closing brace
-                in_method_body = False  # Exit method body
-            # Replace method body with a TODO placeholder
-            else:
-                if "return" in stripped_line:
-                    # Retain return types for completeness
-                    template_lines.append("    // TODO: Implement logic and return the appropriate value.")
+    tokens = [token for token in tokenize(solution_content) if token.kind != "whitespace"]
+    closing = _match_braces(tokens)
+    edits = []     # (start, end, replacement) in source offsets
+    contexts = []  # Open type bodies, innermost last
+    member = []    # Tokens of the member declaration being read in the innermost context
+
+    i = 0
+    while i < len(tokens):
+        text = tokens[i].text
+        context = contexts[-1] if contexts else None
+
+        if text == "{":
+            # Braces inside parentheses belong to annotation arrays or lambdas in arguments
+            kind = "other" if _open_parens(member) else _block_kind(member, context)
+            if kind == "type":
+                contexts.append(_TypeContext(_declares_enum(member) and not (context and context.enum_constants)))
+                member = []
+                i += 1
+                continue
+            end = closing.get(i)
+            if end is None:
+                break  # Unterminated block at the end of the file; leave it as it is
+            if kind == "method" and context is not None:
+                stub = _MethodStub(solution_content, tokens, member, i, end)
+                if stub.is_constructor:
+                    context.constructors.append(stub)
                 else:
-                    template_lines.append("    // TODO: Implement this method.")
+                    edits.append((tokens[i].start, tokens[end].end, stub.body()))
+            if kind != "other":
+                member = []
+            i = end + 1
+            continue
+
+        if text == "}":
+            if contexts:
+                finished = contexts.pop()
+                for stub in finished.constructors:
+                    edits.append((stub.start, stub.end, stub.body(finished.blank_finals)))
+            member = []
+        elif text == ";":
+            if context is not None:
+                context.enum_constants = False
+                context.blank_finals.update(_blank_final_names(member))
+            member = []
+        elif text == "," and context is not None and context.enum_constants:
+            member = []
         else:
-            template_lines.append(line)  # Keep the rest of the class structure intact
+            member.append(tokens[i])
+        i += 1
+
+    # A truncated file leaves contexts open; their constructors are stubbed all the same
+    for finished in contexts:
+        for stub in finished.constructors:
+            edits.append((stub.start, stub.end, stub.body(finished.blank_finals)))
 
-    return "\n".join(template_lines)
+    template = solution_content
+    for start, end, replacement in sorted(edits, reverse=True):
+        template = template[:start] + replacement + template[end:]
+    return template
+
+PRIMITIVE_DEFAULTS = {
+    "boolean": "false", "byte": "0", "short": "0", "int": "0", "long": "0",
+    "char": "0", "float": "0", "double": "0",
+}
+METHOD_MODIFIERS = frozenset([
+    "public", "protected", "private", "abstract", "static", "final", "synchronized",
+    "native", "default", "strictfp",
+])
+
+class _TypeContext:
+    """An open class, interface, enum or record body."""
+
+    def __init__(self, is_enum):
+        self.enum_constants = is_enum  # True until the ';' that ends an enum's constant list
+        self.blank_finals = set()
+        self.constructors = []
+
+class _MethodStub:
+    """A method or constructor whose body (tokens[open_index]..tokens[close_index]) is replaced."""
+
+    def __init__(self, source, tokens, member, open_index, close_index):
+        self.source = source
+        self.tokens = tokens
+        self.open_index = open_index
+        self.close_index = close_index
+        self.start = tokens[open_index].start
+        self.end = tokens[close_index].end
+
+        signature = _significant(member)
+        paren = next(index for index, token in enumerate(signature) if token.text == "(")
+        name = signature[paren - 1] if paren else signature[0]
+        return_type = _strip_type_parameters([t for t in signature[:max(paren - 1, 0)] if t.text not in METHOD_MODIFIERS])
+        self.return_type = "".join(token.text for token in return_type)
+        self.is_constructor = not return_type
+
+        line_start = source.rfind("\n", 0, name.start) + 1
+        line = source[line_start:name.start]
+        self.indent = line[:len(line) - len(line.lstrip())]
+
+    def body(self, blank_finals=()):
+        inner = self.indent + "    "
+        lines = []
+        if self.is_constructor:
+            lines.extend(inner + statement for statement in self._kept_statements(blank_finals))
+            lines.append(inner + "// TODO: Implement this method.")
+        elif self.return_type == "void":
+            lines.append(inner + "// TODO: Implement this method.")
+        else:
+            lines.append(inner + "// TODO: Implement logic and return the appropriate value.")
+            lines.append(inner + f"return {PRIMITIVE_DEFAULTS.get(self.return_type, 'null')};")
+        return "{\n" + "\n".join(lines) + "\n" + self.indent + "}"
+
+    def _kept_statements(self, blank_finals):
+        """The explicit super(...)/this(...) call and the assignments to blank final fields."""
+        kept = []
+        statement = []
+        statement_count = 0
+        nesting = 0
+        for index in range(self.open_index + 1, self.close_index):
+            token = self.tokens[index]
+            if token.kind == "comment":
+                continue
+            statement.append(token)
+            if token.kind == "punct" and token.text in "({[":
+                nesting += 1
+            elif token.kind == "punct" and token.text in ")}]":
+                nesting -= 1
+            elif token.text == ";" and nesting == 0:
+                if _is_delegation(statement, statement_count == 0) or _assigns(statement, blank_finals):
+                    kept.append(self.source[statement[0].start:token.end])
+                statement = []
+                statement_count += 1
+        return kept
+
+def _match_braces(tokens):
+    """Map the index of every '{' token to the index of its matching '}'."""
+    closing = {}
+    open_braces = []
+    for index, token in enumerate(tokens):
+        if token.text == "{":
+            open_braces.append(index)
+        elif token.text == "}" and open_braces:
+            closing[open_braces.pop()] = index
+    return closing
+
+def _open_parens(member):
+    return sum({"(": 1, ")": -1}.get(token.text, 0) for token in member if token.kind == "punct") > 0
+
+def _significant(member):
+    """Member tokens without comments and annotations (including their arguments)."""
+    result = []
+    index = 0
+    while index < len(member):
+        token = member[index]
+        if token.kind == "comment":
+            index += 1
+        elif token.text == "@" and index + 1 < len(member) and member[index + 1].text != "interface":
+            index += 2
+            while index + 1 < len(member) and member[index].text == ".":
+                index += 2
+            if index < len(member) and member[index].text == "(":
+                depth = 0
+                while index < len(member):
+                    depth += {"(": 1, ")": -1}.get(member[index].text, 0)
+                    index += 1
+                    if depth == 0:
+                        break
+        else:
+            result.append(token)
+            index += 1
+    return result
+
+def _strip_type_parameters(tokens):
+    """Drop a leading <...> type parameter list, as in `public <T> T first()`."""
+    if not tokens or tokens[0].text != "<":
+        return tokens
+    depth = 0
+    for index, token in enumerate(tokens):
+        depth += {"<": 1, ">": -1}.get(token.text, 0)
+        if depth == 0:
+            return tokens[index + 1:]
+    return []
+
+def _declares_type(signature):
+    return any(
+        token.kind == "identifier" and token.text in TYPE_KEYWORDS and (index == 0 or signature[index - 1].text != ".")
+        for index, token in enumerate(signature)
+    )
+
+def _declares_enum(member):
+    return any(token.text == "enum" for token in _significant(member))
+
+def _block_kind(member, context):
+    """Classify the block a '{' opens: type, method, initializer or other (e.g. an anonymous class in a field)."""
+    if context is not None and context.enum_constants:
+        return "type"  # Constant-specific class body
+    signature = _significant(member)
+    if any(token.text == "@" for token in member) and any(token.text == "interface" for token in member):
+        return "type"
+    if _declares_type(signature):
+        return "type"
+    texts = [token.text for token in signature]
+    if "=" in texts:
+        return "other"
+    if "(" in texts:
+        return "method"
+    return "initializer"
+
+def _blank_final_names(member):
+    """Names of the final instance fields a declaration leaves unassigned."""
+    signature = _significant(member)
+    texts = [token.text for token in signature]
+    if "final" not in texts or "static" in texts or "=" in texts or "(" in texts:
+        return []
+    return [texts[index - 1] for index, text in enumerate(texts) if text == "," and index] + texts[-1:]
+
+def _is_delegation(statement, first):
+    return first and len(statement) > 1 and statement[0].text in ("super", "this") and statement[1].text == "("
+
+def _assigns(statement, names):
+    texts = [token.text for token in statement]
+    if texts[:2] == ["this", "."]:
+        texts = texts[2:]
+    return len(texts) > 2 and texts[0] in names and texts[1] == "=" and texts[2] != "="
 
 def review_template_with_openai(client, template_content):
     """
@@ -96,60 +322,35 @@ def review_template_with_openai(client, template_content):
         "DO NOT INCLUDE ANY TEXT int the code files except for the potential comments."
     )
 
-    reviewed_template = generate_with_retries(client, prompt, max_retries=3)
+    reviewed_template = generate_with_retries(client, prompt, max_retries=3, stage="template review")
     return reviewed_template if reviewed_template else template_content
 
-def generate_with_retries(client, prompt, max_retries=3):
-    for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error generating response: {e}")
-            if attempt < max_retries - 1:
-                print("Retrying...")
-    return None
-
 def commit_and_push_changes(branch_name, directory_path):
     if not branch_name:
         print("Error: Branch name is empty.")
         sys.exit(1)
 
     try:
-        subprocess.run(["git", "config", "--global", "user.email", "actions@github.com"], check=True)
-        subprocess.run(["git", "config", "--global", "user.name", "github-actions"], check=True)
-
-        # Fetch the latest changes from the remote
-        subprocess.run(["git", "fetch", "origin"], check=True)
-        
-        # Check if there are new changes on the remote branch
-        subprocess.run(["git", "pull", "origin", branch_name], check=True)
+        # Merge what earlier jobs pushed to the task branch; fetches only that branch
+        fetch_branches(branch_name)
+        git("merge", "-q", "--no-edit", f"origin/{branch_name}")
 
         # Stage changes and commit
-        subprocess.run(["git", "add", directory_path], check=True)
-        subprocess.run(["git", "commit", "-m", "Add generated template"], check=True)
-        
+        commit_paths([directory_path], "Add generated template")
+
         # Push the changes
-        subprocess.run(
-            ["git", "push", "--set-upstream", "origin", branch_name],
-            check=True,
-            env=dict(os.environ, GIT_ASKPASS='echo', GIT_USERNAME='x-access-token', GIT_PASSWORD=os.getenv('GITHUB_TOKEN'))
-        )
+        push(branch_name, set_upstream=True)
     except subprocess.CalledProcessError as e:
         print(f"Error committing and pushing changes: {e}")
         sys.exit(1)
 
-if len(sys.argv) != 3:
-    print("Error: Missing required command line arguments 'api_key' and 'branch_name'")
-    sys.exit(1)
+if __name__ == "__main__":
+    init_tracing()
+    if len(sys.argv) != 3:
+        print("Error: Missing required command line arguments 'api_key' and 'branch_name'")
+        sys.exit(1)
 
-api_key = sys.argv[1]
-branch_name = sys.argv[2]
+    api_key = sys.argv[1]
+    branch_name = sys.argv[2]
 
-main(api_key, branch_name)
+    main(api_key, branch_name)
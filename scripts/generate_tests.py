@@ -1,42 +1,38 @@
 import os
-import re
 import sys
 import subprocess
-from openai import OpenAI
-
-def main(api_key, branch_name):
-    if not api_key:
-        print("Error: OpenAI API key is missing.")
-        sys.exit(1)
-
-    client = OpenAI(api_key=api_key)
-
-    # Ensure we are on the correct branch
-    try:
-        subprocess.run(["git", "checkout", branch_name], check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Error checking out branch {branch_name}: {e}")
-        sys.exit(1)
-
-    # Read the solution code from the .hidden_tasks directory
-    solution_files = []
-    try:
-        for filename in os.listdir(".hidden_tasks"):
-            if filename.endswith(".java"):
-                with open(os.path.join(".hidden_tasks", filename), "r") as file:
-                    solution_files.append(file.read())
-    except FileNotFoundError:
-        print("Error: Solution files not found in .hidden_tasks directory.")
-        sys.exit(1)
-
-    if not solution_files:
-        print("Error: No Java solution files found in .hidden_tasks.")
-        sys.exit(1)
-
-    solution = "\n\n".join(solution_files)
-
-    # Example tests to inspire the model (not to be directly copied)
-    example_tests = """
+from class_stream import ClassStreamSplitter
+from file_utils import read_text, remove_files, write_text_atomic
+from git_utils import commit_paths, git, push
+from java_lexer import declared_types, normalize_source, split_types
+from llm_client import get_client, generate_with_retries, stream_with_retries, streaming_enabled
+from prompts import PromptTemplate, Section, register
+from structured_output import generate_files, structured_output_enabled
+from symbol_index import import_table
+from task_bank import retrieve_example
+from tracing import init_tracing, traced
+
+# JUnit 4 imports for the names a test uses; other types are looked up in the symbol index
+ASSERT_IMPORT = "import static org.junit.Assert.*;"
+JUNIT_IMPORTS = {
+    "Before": "import org.junit.Before;",
+    "Test": "import org.junit.Test;",
+    "Assert": ASSERT_IMPORT,
+    "assertEquals": ASSERT_IMPORT,
+    "assertNotEquals": ASSERT_IMPORT,
+    "assertTrue": ASSERT_IMPORT,
+    "assertFalse": ASSERT_IMPORT,
+    "assertNull": ASSERT_IMPORT,
+    "assertNotNull": ASSERT_IMPORT,
+    "assertSame": ASSERT_IMPORT,
+    "assertNotSame": ASSERT_IMPORT,
+    "assertArrayEquals": ASSERT_IMPORT,
+    "assertThrows": ASSERT_IMPORT,
+    "fail": ASSERT_IMPORT,
+}
+
+# Example tests to inspire the model (not to be directly copied)
+EXAMPLE_TESTS = """
     package original;
     import org.junit.Before;
     import org.junit.Test;
@@ -123,80 +119,147 @@ def main(api_key, branch_name):
     }
     """
 
-    # Combine the solution into a single prompt for test generation
-    prompt = (
-        f"Given the following Java solution, generate a set of high-quality unit tests. "
-        f"Ensure the tests are thorough, robust, and cover all edge cases, including invalid inputs, boundary conditions, and performance considerations. "
-        f"Ensure the tests use the correct imports and that each class is placed in the correct file as per Java naming conventions.\n\n"
-        f"### Solution\n{solution}\n\n"
-        f"### Example Tests (for inspiration only)\n{example_tests}\n\n"
-        "IMPORTANT: The response must be plain Java code with no markdown formatting or ```java blocks. Ensure that the response is ready to be saved directly as a .java file."
-    )
-
-    response_content = generate_with_retries(client, prompt, max_retries=3)
-    if response_content is None:
-        print("Error: Failed to generate the tests after multiple retries.")
+TESTS_PROMPT = register(PromptTemplate(
+    "tests",
+    instructions=(
+        "Given the Java solution at the end of this prompt, generate a set of high-quality unit tests. "
+        "Ensure the tests are thorough, robust, and cover all edge cases, including invalid inputs, boundary conditions, and performance considerations. "
+        "Ensure the tests use the correct imports and that each class is placed in the correct file as per Java naming conventions."
+    ),
+    sections=[Section("Example Tests (for inspiration only)", EXAMPLE_TESTS, optional=True)],
+    notes=(
+        "IMPORTANT: The response must be plain Java code with no markdown formatting or ```java blocks. "
+        "Ensure that the response is ready to be saved directly as a .java file."
+    ),
+    request="### Solution\n{solution}\n",
+))
+
+def main(api_key, branch_name):
+    if not api_key:
+        print("Error: OpenAI API key is missing.")
+        sys.exit(1)
+
+    client = get_client(api_key)
+
+    # Ensure we are on the correct branch
+    try:
+        git("checkout", "-q", branch_name)
+    except subprocess.CalledProcessError as e:
+        print(f"Error checking out branch {branch_name}: {e}")
+        sys.exit(1)
+
+    # Read the solution code from the .hidden_tasks directory
+    solution_files = []
+    try:
+        for filename in os.listdir(".hidden_tasks"):
+            if filename.endswith(".java"):
+                solution_files.append(read_text(os.path.join(".hidden_tasks", filename)))
+    except FileNotFoundError:
+        print("Error: Solution files not found in .hidden_tasks directory.")
+        sys.exit(1)
+
+    if not solution_files:
+        print("Error: No Java solution files found in .hidden_tasks.")
         sys.exit(1)
 
-    # Write the generated tests to appropriate Java files in the gen_test directory
+    solution = "\n\n".join(solution_files)
+
     gen_test_dir = os.path.join("gen_test")
-    write_generated_tests_to_files(gen_test_dir, response_content)
+
+    if streaming_enabled():
+        # Write each test class as soon as it has been generated
+        response_content = stream_tests_to_files(client, solution, gen_test_dir)
+        if response_content is None:
+            print("Error: Failed to generate the tests after multiple retries.")
+            sys.exit(1)
+    elif structured_output_enabled():
+        # Ask for the test files as JSON and write them as they are
+        files = generate_test_files(client, solution)
+        if files is None:
+            print("Error: Failed to generate the tests after multiple retries.")
+            sys.exit(1)
+        write_files_to_directory(gen_test_dir, files)
+    else:
+        response_content = generate_tests(client, solution)
+        if response_content is None:
+            print("Error: Failed to generate the tests after multiple retries.")
+            sys.exit(1)
+
+        # Write the generated tests to appropriate Java files in the gen_test directory
+        write_generated_tests_to_files(gen_test_dir, response_content, declared_types(solution))
 
     # Commit and push changes
     commit_and_push_changes(branch_name, gen_test_dir)
 
-def generate_with_retries(client, prompt, max_retries=3):
-    for attempt in range(max_retries):
+def generate_tests(client, solution):
+    """Generate the raw JUnit tests for a Java solution, or None on failure."""
+    prompt = build_tests_prompt(solution)
+    return generate_with_retries(client, prompt, max_retries=3, stage="the tests")
+
+def generate_test_files(client, solution):
+    """Generate the tests in structured-output mode as (file_name, content) pairs, or None on failure."""
+    files = generate_files(client, build_tests_prompt(solution), max_retries=3, stage="the tests")
+    if files is None:
+        return None
+    local_types = declared_types(solution).union(*(declared_types(content) for _, content in files))
+    return [(file_name, build_test_file(content, local_types)) for file_name, content in files]
+
+def stream_tests_to_files(client, solution, directory):
+    """
+    Stream the tests and write every test class to the directory as soon as its
+    closing brace arrives. Returns the full response, or None on failure.
+    Like stream_solution_to_files, files are written again when a class
+    declared later in the stream changes their imports.
+    """
+    solution_types = declared_types(solution)
+    written = {}  # {class name: (source, written content)}
+
+    def write_class(class_name, source, local_types):
+        file_name = f"{class_name}.java"
+        content = build_test_file(source, local_types)
+        if class_name in written and written[class_name][1] == content:
+            return
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-2024-08-06",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error generating the tests: {e}")
-            if attempt < max_retries - 1:
-                print("Retrying...")
-    return None
-
-def write_generated_tests_to_files(directory, code_content):
+            write_text_atomic(os.path.join(directory, file_name), content)
+            written[class_name] = (source, content)
+            print(f"Successfully wrote {file_name}")
+        except IOError as e:
+            print(f"Error writing file {file_name}: {e}")
+
+    def discard_written():
+        # A retry restarts the stream, so the classes of the failed attempt must not outlive it
+        remove_files(directory, [f"{class_name}.java" for class_name in written])
+        written.clear()
+
+    splitter = ClassStreamSplitter(lambda class_name, source: write_class(class_name, source, solution_types | set(written)), discard_written)
+    response_content = stream_with_retries(client, build_tests_prompt(solution), splitter, max_retries=3, stage="the tests")
+    splitter.close()
+    if response_content is not None:
+        local_types = solution_types | declared_types(response_content)
+        for class_name, (source, _) in list(written.items()):
+            write_class(class_name, source, local_types)
+    return response_content
+
+@traced("prompt")
+def build_tests_prompt(solution):
+    """Build the test generation prompt for a Java solution."""
+    # Add the most relevant test file from the task bank after the shared prefix
+    example = retrieve_example("tests", solution)
+    examples = {"Tests From a Similar Task (for inspiration only)": example} if example else None
+    return TESTS_PROMPT.render(examples, solution=solution)
+
+def write_generated_tests_to_files(directory, code_content, local_types=()):
     """
     Write generated Java tests to separate files based on class names.
-    Handles cases where leftover comments or initializations are present.
-    Also ensures that import statements and public class declarations are captured.
     """
-    leftover_content = ""  # To capture leftover content before the first class
-    file_blocks = re.split(r'\b(class|public\s+class|abstract\s+class|final\s+class)\b', code_content)  # Split on different class declarations
-
-    for i in range(1, len(file_blocks), 2):  # Iterate over every class block
-        class_declaration = file_blocks[i] + file_blocks[i + 1]  # Reattach split 'class' or 'public class'
-        block = leftover_content + class_declaration
-
-        # Extract class name
-        class_name_match = re.search(r'class\s+([A-Za-z_]\w*)\s*{', block)  # Match 'class ClassName {'
-        if class_name_match:
-            class_name = class_name_match.group(1)  # Extract the class name
-        else:
-            print(f"Skipping block due to missing class name in block: {block[:50]}")
-            continue
-
-        # Construct the file content
-        package_declaration = "package test;\n\n"
-        imports = (
-            "import org.junit.Before;\n"
-            "import org.junit.Test;\n"
-            "import static org.junit.Assert.*;\n\n"
-        )
-        file_content = package_declaration + imports + "class " + block
-
-        file_name = f"{class_name}Test.java"
-        file_path = os.path.join(directory, file_name)
+    write_files_to_directory(directory, split_generated_tests(code_content, local_types))
+
+def write_files_to_directory(directory, files):
+    """Write (file_name, content) pairs to the directory, creating it if needed."""
+    os.makedirs(directory, exist_ok=True)
 
-        # Ensure the directory exists
-        os.makedirs(directory, exist_ok=True)
+    for file_name, file_content in files:
+        file_path = os.path.join(directory, file_name)
 
         try:
             with open(file_path, "w") as java_file:
@@ -205,27 +268,40 @@ def write_generated_tests_to_files(directory, code_content):
         except IOError as e:
             print(f"Error writing file {file_name}: {e}")
 
+def split_generated_tests(code_content, local_types=()):
+    """
+    Split generated Java tests into (file_name, content) pairs, one per top-level
+    type, named after the test class itself. local_types are the classes of the
+    solution under test, which are never shadowed by JDK imports.
+    """
+    files = []
+    local_types = set(local_types) | declared_types(code_content)
+    for class_name, block in split_types(code_content):
+        files.append((f"{class_name}.java", build_test_file(block, local_types)))
+
+    if not files:
+        print(f"Skipping output due to missing class declarations: {code_content[:50]}")
+    return files
+
+def build_test_file(block, local_types=()):
+    """Put a test class in the test package and add the JUnit and JDK imports it lacks, except for local_types."""
+    return normalize_source("package test;\n\n" + block, import_table(JUNIT_IMPORTS), local_types)
+
 def commit_and_push_changes(branch_name, directory):
     try:
-        subprocess.run(["git", "config", "--global", "user.email", "actions@github.com"], check=True)
-        subprocess.run(["git", "config", "--global", "user.name", "github-actions"], check=True)
-
-        subprocess.run(["git", "add", directory], check=True)
-        subprocess.run(["git", "commit", "-m", "Add generated tests"], check=True)
-        subprocess.run(
-            ["git", "push", "--set-upstream", "origin", branch_name],
-            check=True,
-            env=dict(os.environ, GIT_ASKPASS='echo', GIT_USERNAME='x-access-token', GIT_PASSWORD=os.getenv('GITHUB_TOKEN'))
-        )
+        commit_paths([directory], "Add generated tests")
+        push(branch_name, set_upstream=True)
     except subprocess.CalledProcessError as e:
         print(f"Error committing and pushing changes: {e}")
         sys.exit(1)
 
-if len(sys.argv) != 3:
-    print("Error: Missing required command line arguments 'api_key' and 'branch_name'")
-    sys.exit(1)
+if __name__ == "__main__":
+    init_tracing()
+    if len(sys.argv) != 3:
+        print("Error: Missing required command line arguments 'api_key' and 'branch_name'")
+        sys.exit(1)
 
-api_key = sys.argv[1]
-branch_name = sys.argv[2]
+    api_key = sys.argv[1]
+    branch_name = sys.argv[2]
 
-main(api_key, branch_name)
+    main(api_key, branch_name)
@@ -0,0 +1,133 @@
+# shared-workflows/scripts/git_utils.py
+
+"""
+Git operations shared by the scripts, with few git processes and remote round trips.
+
+- The commit identity is passed in GIT_AUTHOR_*/GIT_COMMITTER_* environment
+  variables (values already set in the environment win) instead of running
+  `git config --global` before every commit.
+- commit_paths() stages exactly the paths a script wrote, never the whole tree.
+- diff_stat() builds the `git diff --stat` summary of a commit message from
+  the contents before and after writing, without running git.
+- fetch_branches() fetches only the named branches, in one round trip.
+- push() publishes any number of branches in one `git push`, so a script
+  commits everything it produced first and then pushes once.
+- commit_files_to_branch() commits files onto a new branch with plumbing
+  commands and a private index, for commits made concurrently.
+"""
+
+import difflib
+import os
+import subprocess
+
+GIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "github-actions",
+    "GIT_AUTHOR_EMAIL": "actions@github.com",
+    "GIT_COMMITTER_NAME": "github-actions",
+    "GIT_COMMITTER_EMAIL": "actions@github.com",
+}
+STAT_WIDTH = 40
+
+
+def git_env(**extra):
+    return {**GIT_IDENTITY, **os.environ, **extra}
+
+
+def remote_env():
+    return git_env(GIT_ASKPASS="echo", GIT_USERNAME="x-access-token", GIT_PASSWORD=os.getenv("GITHUB_TOKEN") or "")
+
+
+def git(*args, input=None, env=None, capture=False):
+    """Run a git command (raising CalledProcessError on failure); returns its output when capture is set."""
+    result = subprocess.run(
+        ["git"] + list(args), input=input, env=env or git_env(), check=True, text=True,
+        stdout=subprocess.PIPE if capture else None
+    )
+    return result.stdout if capture else None
+
+
+def create_branch(branch_name):
+    """Create the branch from HEAD and check it out; nothing is pushed until push()."""
+    git("checkout", "-q", "-b", branch_name)
+
+
+def commit_paths(paths, message):
+    """Stage exactly these paths (files or directories the caller wrote) and commit them."""
+    git("add", "--", *paths)
+    git("commit", "-q", "-m", message)
+
+
+def push(*branch_names, set_upstream=False):
+    """Push the branches (the current one by default) to origin in a single push."""
+    args = ["push", "-q"] + (["--set-upstream"] if set_upstream else []) + ["origin"]
+    git(*(args + list(branch_names or ["HEAD"])), env=remote_env())
+
+
+def fetch_branches(*branch_names):
+    """Update origin/<name> for just these branches, in one fetch."""
+    git("fetch", "-q", "origin", *[f"+refs/heads/{name}:refs/remotes/origin/{name}" for name in branch_names],
+        env=remote_env())
+
+
+def _count_changes(old, new):
+    insertions = deletions = 0
+    for line in difflib.unified_diff((old or "").splitlines(), (new or "").splitlines(), lineterm="", n=0):
+        if line.startswith("+") and not line.startswith("+++"):
+            insertions += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            deletions += 1
+    return insertions, deletions
+
+
+def diff_stat(changes):
+    """
+    Summary in the format of `git diff --stat` for [(path, old content or None, new content)],
+    or "" when nothing changed.
+    """
+    counts = [(path, *_count_changes(old, new)) for path, old, new in sorted(changes, key=lambda change: change[0])]
+    counts = [count for count in counts if count[1] or count[2]]
+    if not counts:
+        return ""
+    name_width = max(len(path) for path, _, _ in counts)
+    largest = max(insertions + deletions for _, insertions, deletions in counts)
+    number_width = len(str(largest))
+    scale = min(1.0, STAT_WIDTH / largest)
+
+    lines = []
+    for path, insertions, deletions in counts:
+        plus = int(round(insertions * scale)) or (1 if insertions else 0)
+        minus = int(round(deletions * scale)) or (1 if deletions else 0)
+        lines.append(f" {path:<{name_width}} | {insertions + deletions:>{number_width}} {'+' * plus}{'-' * minus}")
+    total_insertions = sum(insertions for _, insertions, _ in counts)
+    total_deletions = sum(deletions for _, _, deletions in counts)
+    summary = f" {len(counts)} file{'s' if len(counts) != 1 else ''} changed"
+    if total_insertions:
+        summary += f", {total_insertions} insertion{'s' if total_insertions != 1 else ''}(+)"
+    if total_deletions:
+        summary += f", {total_deletions} deletion{'s' if total_deletions != 1 else ''}(-)"
+    return "\n".join(lines + [summary])
+
+
+def commit_files_to_branch(branch_name, root, paths, message):
+    """
+    Commit the files below root onto a new branch based on HEAD without touching
+    the working tree or the shared index, so several tasks can be committed concurrently.
+    """
+    index_file = os.path.join(root, ".git-index")
+    env = git_env(GIT_INDEX_FILE=index_file)
+    try:
+        git("read-tree", "HEAD", env=env)
+        blobs = git(
+            "hash-object", "-w", "--stdin-paths",
+            input="\n".join(os.path.join(root, path) for path in paths) + "\n", env=env, capture=True
+        ).split()
+        index_info = "".join(
+            f"100644 {blob}\t{path.replace(os.sep, '/')}\n" for blob, path in zip(blobs, paths)
+        )
+        git("update-index", "--index-info", input=index_info, env=env)
+        tree = git("write-tree", env=env, capture=True).strip()
+        commit = git("commit-tree", tree, "-p", "HEAD", "-m", message, env=env, capture=True).strip()
+        git("update-ref", f"refs/heads/{branch_name}", commit)
+    finally:
+        if os.path.exists(index_file):
+            os.remove(index_file)
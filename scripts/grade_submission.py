@@ -1,6 +1,8 @@
 import os
 import sys
-import openai
+from file_utils import read_text
+from llm_client import get_client, generate_with_retries
+from tracing import init_tracing, span
 import requests
 
 def main(api_key, pull_request_number):
@@ -8,20 +10,18 @@ def main(api_key, pull_request_number):
         print("Error: OpenAI API key is missing.")
         sys.exit(1)
 
-    openai.api_key = api_key
+    client = get_client(api_key)
 
     # Read the student's code from the task template location
     try:
-        with open("src/template_code.java", "r") as file:
-            student_code = file.read()
+        student_code = read_text("src/template_code.java")
     except FileNotFoundError:
         print("Error: template_code.java file not found.")
         sys.exit(1)
 
     # Read the solution code
     try:
-        with open("src/.hidden_tasks/new_task_solution.java", "r") as file:
-            solution_code = file.read()
+        solution_code = read_text("src/.hidden_tasks/new_task_solution.java")
     except FileNotFoundError:
         print("Error: new_task_solution.java file not found.")
         sys.exit(1)
@@ -34,15 +34,9 @@ def main(api_key, pull_request_number):
               f"### Solution Code\n```java\n{solution_code}\n```\n")
 
     # Call OpenAI API to evaluate the student's code
-    try:
-        response = openai.Completion.create(
-            model="gpt-4o-2024-08-06",
-            prompt=prompt,
-            max_tokens=500
-        )
-        feedback = response.choices[0].text.strip()
-    except Exception as e:
-        print(f"Error generating feedback: {e}")
+    feedback = generate_with_retries(client, prompt, max_retries=3, stage="feedback", max_tokens=500)
+    if feedback is None:
+        print("Error: Failed to generate feedback after multiple retries.")
         sys.exit(1)
 
     # Post the feedback as a comment on the pull request
@@ -52,20 +46,25 @@ def main(api_key, pull_request_number):
         "Authorization": f"token {github_token}",
         "Accept": "application/vnd.github.v3+json"
     }
-    comment_url = f"https://api.github.com/repos/{repo_name}/issues/{pull_request_number}/comments"
+    # GitHub Actions sets GITHUB_API_URL (e.g. for GitHub Enterprise); local benchmarks point it at a stub
+    api_url = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+    comment_url = f"{api_url}/repos/{repo_name}/issues/{pull_request_number}/comments"
     comment_body = {
         "body": feedback
     }
-    response = requests.post(comment_url, json=comment_body, headers=headers)
+    with span("post comment", "github"):
+        response = requests.post(comment_url, json=comment_body, headers=headers)
     if response.status_code != 201:
         print(f"Error posting comment: {response.status_code} {response.text}")
         sys.exit(1)
 
-if len(sys.argv) != 3:
-    print("Error: Missing required command line arguments 'api_key' and 'pull_request_number'")
-    sys.exit(1)
+if __name__ == "__main__":
+    init_tracing()
+    if len(sys.argv) != 3:
+        print("Error: Missing required command line arguments 'api_key' and 'pull_request_number'")
+        sys.exit(1)
 
-api_key = sys.argv[1]
-pull_request_number = sys.argv[2]
+    api_key = sys.argv[1]
+    pull_request_number = sys.argv[2]
 
-main(api_key, pull_request_number)
+    main(api_key, pull_request_number)
@@ -0,0 +1,163 @@
+# shared-workflows/scripts/java_compiler.py
+
+"""
+Local javac checks for generated Java files.
+
+compile_sources() groups the files into sets that reference each other (from
+the identifiers java_lexer finds in them), compiles every group with its own
+javac process in parallel and returns the compiler errors per file. Files that
+compile do not appear in the result, and None means javac is not available
+(JAVAC overrides the executable).
+
+Usage:
+    python java_compiler.py <file.java> [<file.java> ...]   # Print the errors of a set of files
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from java_lexer import tokenize
+from tracing import traced
+
+# Fast JVM start-up matters more than peak speed for a single small compilation
+JAVAC_FLAGS = ["-encoding", "UTF-8", "-nowarn", "-proc:none", "-J-XX:TieredStopAtLevel=1", "-J-XX:+UseSerialGC"]
+JAVAC_TIMEOUT = 120
+DIAGNOSTIC_PATTERN = re.compile(r'^(?P<path>.+?\.java):(?P<line>\d+): (?P<kind>error|warning): ', re.MULTILINE)
+SUMMARY_PATTERN = re.compile(r'^\d+ (?:errors?|warnings?)\s*$', re.MULTILINE)
+
+
+def javac_path():
+    return shutil.which(os.getenv("JAVAC", "javac"))
+
+
+def compile_workers():
+    return int(os.getenv("JAVAC_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def references(files):
+    """Return {file_name: names of the other files it mentions} for {file_name: source} of Foo.java files."""
+    names = {file_name[:-len(".java")]: file_name for file_name in files}
+    result = {}
+    for file_name, source in files.items():
+        identifiers = {token.text for token in tokenize(source) if token.kind == "identifier"}
+        result[file_name] = {names[name] for name in identifiers & set(names) if names[name] != file_name}
+    return result
+
+
+def independent_groups(files):
+    """Split the files into groups with no references between them, each sorted by name."""
+    neighbours = {file_name: set() for file_name in files}
+    for file_name, referenced in references(files).items():
+        for other in referenced:
+            neighbours[file_name].add(other)
+            neighbours[other].add(file_name)
+
+    groups = []
+    seen = set()
+    for file_name in sorted(files):
+        if file_name in seen:
+            continue
+        group, pending = [], [file_name]
+        seen.add(file_name)
+        while pending:
+            current = pending.pop()
+            group.append(current)
+            for other in neighbours[current] - seen:
+                seen.add(other)
+                pending.append(other)
+        groups.append(sorted(group))
+    return groups
+
+
+def parse_diagnostics(output):
+    """Return {file_name: [error text]} from javac output; warnings are dropped."""
+    output = SUMMARY_PATTERN.sub("", output)
+    matches = list(DIAGNOSTIC_PATTERN.finditer(output))
+    diagnostics = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        if match.group("kind") != "error":
+            continue
+        end = following.start() if following else len(output)
+        text = output[match.end():end].rstrip()
+        file_name = os.path.basename(match.group("path"))
+        diagnostics.setdefault(file_name, []).append(f"line {match.group('line')}: {text}")
+    return diagnostics
+
+
+def _compile_group(javac, files, group):
+    with tempfile.TemporaryDirectory(prefix="javac-") as directory:
+        source_dir = os.path.join(directory, "src")
+        os.makedirs(source_dir)
+        for file_name in group:
+            with open(os.path.join(source_dir, file_name), "w", encoding="utf-8") as file:
+                file.write(files[file_name])
+        try:
+            result = subprocess.run(
+                [javac] + JAVAC_FLAGS + ["-d", os.path.join(directory, "classes")]
+                + [os.path.join(source_dir, file_name) for file_name in group],
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=JAVAC_TIMEOUT
+            )
+        except subprocess.TimeoutExpired:
+            print(f"Warning: javac timed out on {', '.join(group)}; skipping the compile check.")
+            return {}
+    if result.returncode == 0:
+        return {}
+    diagnostics = parse_diagnostics(result.stdout)
+    if not diagnostics:
+        # javac failed without a diagnostic we can attribute (e.g. a bad flag); blame the whole group
+        diagnostics = {file_name: [result.stdout.strip()] for file_name in group}
+    return diagnostics
+
+
+@traced("compile")
+def compile_sources(files):
+    """
+    Compile {file_name: source} and return {file_name: [error text]} for the
+    files with errors, or None when javac is not available.
+    """
+    javac = javac_path()
+    if javac is None:
+        return None
+    if not files:
+        return {}
+    groups = independent_groups(files)
+    diagnostics = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(compile_workers(), len(groups)))) as executor:
+        for group_diagnostics in executor.map(lambda group: _compile_group(javac, files, group), groups):
+            diagnostics.update(group_diagnostics)
+    return diagnostics
+
+
+def main(paths):
+    if not paths:
+        print("Usage: python java_compiler.py <file.java> [<file.java> ...]")
+        sys.exit(1)
+
+    files = {}
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                files[os.path.basename(path)] = file.read()
+        except OSError as e:
+            print(f"Error reading {path}: {e}")
+            sys.exit(1)
+
+    diagnostics = compile_sources(files)
+    if diagnostics is None:
+        print("Error: javac not found; install a JDK or set JAVAC.")
+        sys.exit(1)
+    for file_name in sorted(diagnostics):
+        for error in diagnostics[file_name]:
+            print(f"{file_name}: {error}")
+    print(f"{len(files) - len(diagnostics)}/{len(files)} files compile")
+    if diagnostics:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,335 @@
+# shared-workflows/scripts/java_lexer.py
+
+"""
+Single-pass Java tokenizer used to post-process model output.
+
+tokenize() splits source into tokens with one master regular expression, so
+string and char literals, text blocks and comments are recognised before any
+brace or keyword is looked at. split_types() walks that token stream once and
+returns every top-level class, interface, enum or record together with the
+import statements seen before it. Both are linear in the size of the input,
+also for the prose and markdown fences models like to wrap code in.
+"""
+
+import re
+from collections import namedtuple
+
+from tracing import traced
+
+Token = namedtuple("Token", "kind text start end")
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<whitespace>\s+)
+  | (?P<comment>//[^\n]*|/\*[\s\S]*?(?:\*/|\Z))
+  | (?P<text_block>"""(?:[^"\\]|\\[\s\S]|"(?!""))*(?:"""|\Z))
+  | (?P<string>"(?:[^"\\\n]|\\.)*")
+  | (?P<char>'(?:[^'\\\n]|\\.){1,6}')
+  | (?P<identifier>[A-Za-z_$][\w$]*)
+  | (?P<number>\d[\w.]*)
+  | (?P<punct>[\s\S])
+''', re.VERBOSE)
+
+TYPE_KEYWORDS = frozenset(["class", "interface", "enum", "record"])
+MODIFIERS = frozenset(["public", "protected", "private", "abstract", "static", "final", "sealed", "strictfp"])
+# Tokens that may appear between a type name and its body: generics, extends/implements, record components
+DECLARATION_PUNCT = frozenset("<>,.&?[]()-@")
+
+
+def tokenize(source):
+    """
+    Yield Token(kind, text, start, end) for the whole source; kinds are whitespace,
+    comment, text_block, string, char, identifier, number and punct.
+    An unterminated string or char literal degrades to a single punct token, so
+    an apostrophe in surrounding prose cannot swallow the code after it.
+    """
+    for match in TOKEN_PATTERN.finditer(source):
+        yield Token(match.lastgroup, match.group(), match.start(), match.end())
+
+
+@traced("postprocess")
+def split_types(source, imports=None):
+    """
+    Split Java source into (type_name, type_source) pairs for each top-level type.
+
+    Each type_source starts with the import statements seen so far, followed by
+    the comments, annotations and modifiers directly above the declaration and
+    the declaration itself. Package declarations and prose are dropped, and a
+    type cut off at the end of the source gets its missing braces closed. Pass
+    a list as `imports` to seed it and collect the imports found, e.g. when a
+    stream is split in several pieces.
+    """
+    if imports is None:
+        imports = []
+    types = []
+
+    depth = 0
+    owner = None           # (start, name) of the type whose body is open; None for a stray block
+    header_start = None    # Start of the run of comments, annotations and modifiers seen last
+    keyword_start = None   # Start of a declaration whose type keyword has been read
+    pending = None         # (start, name) of a declaration waiting for its opening brace
+    pending_parens = 0
+    annotation = None      # "name", "after_name" or the paren depth of annotation arguments
+    statement = None       # [keyword, start, last part] of an import or package statement
+    previous = None
+
+    for token in tokenize(source):
+        kind, text = token.kind, token.text
+        if kind == "whitespace":
+            continue
+
+        if depth:
+            if text == "{":
+                depth += 1
+            elif text == "}":
+                depth -= 1
+                if depth == 0 and owner is not None:
+                    types.append((owner[1], _with_imports(imports, source[owner[0]:token.end])))
+                    owner = None
+            continue
+
+        after_dot, previous = previous == ".", text
+
+        if statement is not None:
+            if _continue_statement(statement, kind, text):
+                continue
+            if text == ";" and statement[2] == "name":
+                if statement[0] == "import":
+                    import_statement = " ".join(source[statement[1]:token.end].split())
+                    if import_statement not in imports:
+                        imports.append(import_statement)
+                statement = None
+                continue
+            statement = None  # Prose that merely starts with "import"; look at this token afresh
+
+        if annotation is not None:
+            if annotation == "name":
+                annotation = "after_name" if kind == "identifier" else None
+                if text != "interface":
+                    continue
+                annotation = None  # @interface declares an annotation type
+            elif annotation == "after_name":
+                if text in (".", "("):
+                    annotation = "name" if text == "." else 1
+                    continue
+                annotation = None
+            else:
+                annotation += {"(": 1, ")": -1}.get(text, 0)
+                if annotation == 0:
+                    annotation = None
+                continue
+
+        is_keyword = kind == "identifier" and text in TYPE_KEYWORDS and not after_dot
+        if kind == "comment" or text == "@" or (kind == "identifier" and text in MODIFIERS):
+            if header_start is None:
+                header_start = token.start
+            if text == "@":
+                annotation = "name"
+        elif not is_keyword:
+            header_start = None
+
+        if keyword_start is not None:
+            start, keyword_start = keyword_start, None
+            if kind == "identifier":
+                pending, pending_parens = (start, text), 0
+                continue
+
+        if is_keyword:
+            keyword_start = token.start if header_start is None else header_start
+            header_start = pending = None
+            continue
+
+        if pending is not None:
+            if text == "{" and not pending_parens:
+                owner, pending, depth = pending, None, 1
+                continue
+            if text == "(":
+                pending_parens += 1
+                continue
+            if text == ")" and pending_parens:
+                pending_parens -= 1
+                continue
+            if pending_parens or kind in ("identifier", "comment") or text in DECLARATION_PUNCT:
+                continue
+            pending = None
+
+        if kind == "identifier" and text in ("import", "package"):
+            statement = [text, token.start, "keyword"]
+        elif text == "{":
+            depth = 1  # A block outside any type, e.g. a stray method; skipped as a whole
+
+    if depth and owner is not None:
+        types.append((owner[1], _with_imports(imports, source[owner[0]:].rstrip() + "\n" + "}" * depth)))
+    return types
+
+
+def declared_types(source):
+    """Names of the classes, interfaces, enums and records declared anywhere in the source."""
+    names = set()
+    after_type_keyword = False
+    for token in tokenize(source):
+        if token.kind == "identifier":
+            if after_type_keyword:
+                names.add(token.text)
+            after_type_keyword = token.text in TYPE_KEYWORDS and source[token.start - 1:token.start] != "."
+        elif token.kind != "whitespace" and token.kind != "comment":
+            after_type_keyword = False
+    return names
+
+
+@traced("postprocess")
+def normalize_source(source, required_imports=None, local_types=()):
+    """
+    Clean up one Java file of model output in a single token pass.
+
+    Removes markdown fences and "Name.java:" labels, moves the package
+    declaration and the import statements to the top (imports deduplicated and
+    sorted), adds the import for every name in `required_imports`
+    ({simple name: import statement}) that the code uses as an identifier, and
+    closes braces left open at the end. Strings and comments are never touched
+    and do not count as uses or braces. Types declared in this file or named in
+    `local_types` (the other files of the same output) are never imported, so a
+    generated Rectangle is not shadowed by java.awt.Rectangle.
+    """
+    required_imports = required_imports or {}
+    out = []            # Kept tokens (and tokens of a tentative statement, see below)
+    imports = set()
+    package = None
+    statement = None    # [keyword, start, last part, index in out] while an import/package statement is read
+    used = set()
+    declared = set()
+    depth = 0
+    drop_newline = False
+    after_type_keyword = False
+
+    for token in tokenize(source):
+        kind, text = token.kind, token.text
+
+        if drop_newline and kind == "whitespace":
+            drop_newline = False
+            text = text[text.find("\n") + 1:] if "\n" in text else text
+            if text:
+                out.append(token._replace(text=text))
+            continue
+        drop_newline = False
+
+        if statement is not None:
+            if kind == "whitespace" or _continue_statement(statement, kind, text):
+                out.append(token)
+                continue
+            if text == ";" and statement[2] == "name":
+                full_statement = " ".join(source[statement[1]:token.end].split())
+                if statement[0] == "import":
+                    imports.add(full_statement)
+                elif package is None:
+                    package = full_statement
+                del out[statement[3]:]
+                statement = None
+                drop_newline = True
+                continue
+            for pending in out[statement[3]:]:
+                if pending.kind == "identifier":
+                    used.add(pending.text)
+            statement = None  # Not a statement after all; keep its tokens as they are
+
+        if kind == "punct":
+            if text == "`":
+                continue  # Markdown fence; a language tag glued to it is dropped below
+            if text == ":" and _is_file_label(out, token):
+                del out[-3:]
+                continue
+            if text == "{":
+                depth += 1
+            elif text == "}":
+                if depth == 0:
+                    continue  # Unbalanced closing brace, e.g. after a truncated fence
+                depth -= 1
+        elif kind == "identifier":
+            if source[token.start - 1:token.start] == "`":
+                continue
+            if depth == 0 and text in ("import", "package"):
+                statement = [text, token.start, "keyword", len(out)]
+            elif after_type_keyword:
+                declared.add(text)
+            else:
+                used.add(text)
+            after_type_keyword = text in TYPE_KEYWORDS and source[token.start - 1:token.start] != "."
+        elif kind != "whitespace" and kind != "comment":
+            after_type_keyword = False
+        out.append(token)
+
+    if statement is not None:
+        for pending in out[statement[3]:]:
+            if pending.kind == "identifier":
+                used.add(pending.text)
+
+    imports.update(_missing_imports(used - declared - set(local_types), imports, required_imports))
+
+    body = "".join(token.text for token in out).strip()
+    if depth:
+        body += "\n" + "}" * depth
+    header = ""
+    if package:
+        header += package + "\n\n"
+    if imports:
+        header += "\n".join(sorted(imports)) + "\n\n"
+    return header + body + "\n"
+
+
+def _missing_imports(names, imports, required_imports):
+    """Imports required for the used names, skipping names an existing import already provides."""
+    imported_names = set()
+    wildcard_packages = set()
+    for statement in imports:
+        qualified_name = statement[:-1].split()[-1]
+        package, _, name = qualified_name.rpartition(".")
+        if name == "*":
+            wildcard_packages.add(package)
+        else:
+            imported_names.add(name)
+
+    missing = set()
+    for name in names:
+        if name in imported_names:
+            continue
+        statement = required_imports.get(name)
+        if statement is None or statement in imports:
+            continue
+        qualified_name = statement[:-1].split()[-1]
+        if not statement.startswith("import static") and qualified_name.rpartition(".")[0] in wildcard_packages:
+            continue
+        missing.add(statement)
+    return missing
+
+
+def _is_file_label(out, colon):
+    """True when the last kept tokens and the colon spell a "Name.java:" label."""
+    if len(out) < 3:
+        return False
+    name, dot, extension = out[-3:]
+    return (
+        name.kind == "identifier" and dot.text == "." and extension.text == "java"
+        and name.end == dot.start and dot.end == extension.start and extension.end == colon.start
+    )
+
+
+def _continue_statement(statement, kind, text):
+    """Advance an import/package statement by one token; False when the token does not fit its syntax."""
+    last = statement[2]
+    if kind == "comment":
+        return True
+    if kind == "identifier" and last in ("keyword", ".", "static"):
+        statement[2] = "static" if text == "static" and last == "keyword" else "name"
+        return True
+    if text == "." and last == "name":
+        statement[2] = "."
+        return True
+    if text == "*" and last == ".":
+        statement[2] = "name"
+        return True
+    return False
+
+
+def _with_imports(imports, type_source):
+    if not imports:
+        return type_source + "\n"
+    return "\n".join(imports) + "\n\n" + type_source + "\n"
@@ -0,0 +1,192 @@
+# shared-workflows/scripts/llm_cache.py
+
+"""
+Content-addressed on-disk cache for chat completions.
+
+Responses are keyed by a SHA-256 of (model, messages, params) and stored as one
+JSON file per key. The cache is bounded by LLM_CACHE_MAX_BYTES and evicts the
+least recently used entries first (reads bump the file's mtime). Set
+LLM_NO_CACHE=1 to bypass it entirely.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def cache_enabled():
+    """Return False when the cache has been switched off with LLM_NO_CACHE."""
+    return os.getenv("LLM_NO_CACHE", "").lower() not in ("1", "true", "yes")
+
+
+def default_cache_dir():
+    """Cache location, kept outside the working tree so `git add` never picks it up."""
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.getenv("LLM_CACHE_DIR") or os.path.join(cache_home, "task3", "llm")
+
+
+def cache_key(model, messages, params, endpoint=""):
+    """
+    Hash the request so identical prompts map to the same cache entry.
+    The endpoint is part of the key so responses from a local stand-in server
+    never leak into runs against the real API.
+    """
+    payload = json.dumps(
+        {"endpoint": endpoint, "model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of completion texts stored under a directory."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None  # Computed lazily on the first write
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """Return the cached content for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path, None)  # Mark as recently used
+        except OSError:
+            pass
+        return entry.get("content")
+
+    def put(self, key, content):
+        """Store content under key and evict old entries if the cache is over budget."""
+        path = self._path(key)
+        data = json.dumps({"content": content, "created": time.time()}, ensure_ascii=False)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            # An overwritten entry no longer counts towards the size
+            replaced_size = os.stat(path).st_size
+        except OSError:
+            replaced_size = 0
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: could not write cache entry {key}: {e}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data.encode("utf-8")) - replaced_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is back under 90% of its budget."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one.
+    The first caller runs the function; later callers wait for and share its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None}
+                self._calls[key] = call
+        if not leader:
+            call["done"].wait()
+            return call["result"]
+        try:
+            call["result"] = fn()
+            return call["result"]
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+    async def ado(self, key, coro_fn):
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        future = self._async_calls.get(flight_key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = loop.create_future()
+        self._async_calls[flight_key] = future
+        try:
+            result = await coro_fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._async_calls[flight_key]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+single_flight = SingleFlight()
+
+
+def get_cache():
+    """Return the process-wide cache, or None if caching is disabled."""
+    global _cache
+    if not cache_enabled():
+        return None
+    with _cache_lock:
+        if _cache is None:
+            max_bytes = int(os.getenv("LLM_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+            _cache = ResponseCache(default_cache_dir(), max_bytes)
+    return _cache
@@ -0,0 +1,141 @@
+# shared-workflows/scripts/llm_cassette.py
+
+"""
+Record/replay cassettes for LLM calls.
+
+With LLM_CASSETTE=<path> every request/response pair that goes through
+llm_client is either recorded to or replayed from a gzip-compressed JSON-lines
+file. LLM_CASSETTE_MODE selects "record" or "replay"; when it is unset the
+cassette is replayed if the file exists and recorded otherwise. Several
+processes can record into the same cassette, each appending its own gzip
+member, so a whole multi-job pipeline run ends up in one file.
+
+Usage:
+    python llm_cassette.py summary <cassette>
+"""
+
+import atexit
+import collections
+import gzip
+import json
+import os
+import sys
+import threading
+
+
+class Cassette:
+    """A set of recorded completions, keyed by the request hash."""
+
+    def __init__(self, path, mode):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._pending = []
+        self._replay = {}
+        if mode == "replay":
+            self._replay = collections.defaultdict(collections.deque)
+            for entry in load_entries(path):
+                self._replay[entry["key"]].append(entry["response"])
+        else:
+            atexit.register(self.flush)
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def replay(self, key):
+        """
+        Return the next recorded response for key, or None if nothing was recorded.
+        Repeated identical requests get the recordings in their original order;
+        once those run out the last one is served again.
+        """
+        with self._lock:
+            responses = self._replay.get(key)
+            if not responses:
+                return None
+            if len(responses) > 1:
+                return responses.popleft()
+            return responses[0]
+
+    def record(self, key, stage, model, messages, params, response):
+        with self._lock:
+            self._pending.append({
+                "key": key,
+                "stage": stage,
+                "model": model,
+                "messages": messages,
+                "params": params,
+                "response": response,
+            })
+
+    def flush(self):
+        """Append the recorded entries to the cassette as one gzip member."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with gzip.open(self.path, "at", encoding="utf-8") as file:
+            for entry in pending:
+                file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+
+def load_entries(path):
+    """Read every entry of a cassette in recording order."""
+    entries = []
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+def iter_responses(path, stage=None):
+    """Yield the recorded response texts, optionally only those of one stage."""
+    for entry in load_entries(path):
+        if stage is None or entry["stage"] == stage:
+            yield entry["response"]
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    """Return the cassette configured through LLM_CASSETTE, or None."""
+    global _cassette
+    path = os.getenv("LLM_CASSETTE")
+    if not path:
+        return None
+    with _cassette_lock:
+        if _cassette is None or _cassette.path != path:
+            mode = os.getenv("LLM_CASSETTE_MODE") or ("replay" if os.path.exists(path) else "record")
+            _cassette = Cassette(path, mode)
+    return _cassette
+
+
+def print_summary(path):
+    counts = collections.Counter()
+    sizes = collections.Counter()
+    for entry in load_entries(path):
+        counts[entry["stage"]] += 1
+        sizes[entry["stage"]] += len(entry["response"])
+    print(f"{'stage':<24} {'calls':>6} {'response chars':>15}")
+    for stage, count in counts.most_common():
+        print(f"{stage:<24} {count:>6} {sizes[stage]:>15}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "summary":
+        print("Usage: python llm_cassette.py summary <cassette>", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        print_summary(sys.argv[2])
+    except (OSError, ValueError) as e:
+        print(f"Error reading cassette: {e}", file=sys.stderr)
+        sys.exit(1)
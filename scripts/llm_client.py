@@ -0,0 +1,374 @@
+# shared-workflows/scripts/llm_client.py
+
+"""
+Shared OpenAI client layer for the generation and grading scripts.
+
+Every script goes through this module instead of building its own client and
+retry loop. Clients are cached per (api_key, base_url) and backed by a single
+connection-pooled HTTP session, so stages that run in the same process reuse
+open TLS connections instead of paying the handshake again. Responses go
+through the on-disk cache in llm_cache unless LLM_NO_CACHE=1 is set, and can
+be recorded to or replayed from a cassette (see llm_cassette). Requests respect
+the RPM/TPM budgets in rate_limiter and back off exponentially between retries.
+Every call, served or sent, is recorded by telemetry.
+"""
+
+import asyncio
+import contextlib
+import os
+import threading
+import time
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from llm_cache import cache_key, get_cache, single_flight
+from llm_cassette import get_cassette
+from rate_limiter import estimate_tokens, get_limiter, is_rate_limit_error, retry_delay
+from telemetry import start_call
+
+DEFAULT_MODEL = "gpt-4o-2024-08-06"
+SYSTEM_PROMPT = "You are a helpful assistant."
+
+# Connection pool shared by every request made through a cached client.
+POOL_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=120.0)
+REQUEST_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+_clients = {}
+_async_clients = {}
+_clients_lock = threading.Lock()
+
+# Optional process-wide cap on in-flight requests (LLM_MAX_CONCURRENCY or set_max_concurrency)
+_concurrency = None
+
+
+def set_max_concurrency(limit):
+    """Cap the number of requests in flight across all threads; None or 0 removes the cap."""
+    global _concurrency
+    _concurrency = threading.BoundedSemaphore(limit) if limit else None
+
+
+set_max_concurrency(int(os.getenv("LLM_MAX_CONCURRENCY", "0")))
+
+
+def get_client(api_key, base_url=None):
+    """
+    Return the process-wide synchronous client for the given API key.
+    The base URL defaults to the OPENAI_BASE_URL environment variable.
+    """
+    base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,  # Retries are handled by generate_with_retries
+                http_client=httpx.Client(limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT),
+            )
+            _clients[key] = client
+    return client
+
+
+def get_async_client(api_key, base_url=None):
+    """
+    Return the asynchronous client for the given API key and the running event loop.
+    Async connection pools are bound to a loop, so one client is kept per loop.
+    """
+    base_url = base_url or os.getenv("OPENAI_BASE_URL") or None
+    key = (api_key, base_url, id(asyncio.get_running_loop()))
+    with _clients_lock:
+        client = _async_clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=0,
+                http_client=httpx.AsyncClient(limits=POOL_LIMITS, timeout=REQUEST_TIMEOUT),
+            )
+            _async_clients[key] = client
+    return client
+
+
+def build_messages(prompt, system_prompt=SYSTEM_PROMPT):
+    """Build the chat message list used by every stage."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def generate_with_retries(client, prompt, max_retries=3, stage="response", model=DEFAULT_MODEL, use_cache=True,
+                          refresh_cache=False, **params):
+    """
+    Send a single-prompt chat completion and return the stripped response text.
+    Returns None if every attempt failed. Extra keyword arguments are passed
+    through to chat.completions.create (e.g. max_tokens, temperature).
+    Identical requests are served from the response cache, and concurrent
+    identical requests are sent only once. With refresh_cache the cached
+    response is ignored and replaced by the new one, e.g. when it was unusable.
+    """
+    messages = build_messages(prompt)
+    cassette = get_cassette()
+    if cassette is not None:
+        request_key = cache_key(model, messages, params)
+        if cassette.replaying:
+            return _replay(cassette, request_key, stage, model)
+
+    content = _cached_completion(client, messages, max_retries, stage, model, use_cache, params, refresh_cache)
+    if cassette is not None and content is not None:
+        cassette.record(request_key, stage, model, messages, params, content)
+    return content
+
+
+async def agenerate_with_retries(client, prompt, max_retries=3, stage="response", model=DEFAULT_MODEL, use_cache=True, **params):
+    """Asynchronous counterpart of generate_with_retries for an AsyncOpenAI client."""
+    messages = build_messages(prompt)
+    cassette = get_cassette()
+    if cassette is not None:
+        request_key = cache_key(model, messages, params)
+        if cassette.replaying:
+            return _replay(cassette, request_key, stage, model)
+
+    content = await _acached_completion(client, messages, max_retries, stage, model, use_cache, params)
+    if cassette is not None and content is not None:
+        cassette.record(request_key, stage, model, messages, params, content)
+    return content
+
+
+def streaming_enabled():
+    """Return True when the scripts should stream completions (LLM_STREAM=1)."""
+    return os.getenv("LLM_STREAM", "").lower() in ("1", "true", "yes")
+
+
+def stream_with_retries(client, prompt, consumer, max_retries=3, stage="response", model=DEFAULT_MODEL, use_cache=True, **params):
+    """
+    Like generate_with_retries, but streams the completion and passes every text
+    delta to consumer.feed() as it arrives. consumer.reset() is called before a
+    retry restarts the stream. Cached and replayed responses are fed in one piece.
+    Returns the stripped full text, or None if every attempt failed.
+    """
+    messages = build_messages(prompt)
+    cassette = get_cassette()
+    if cassette is not None:
+        request_key = cache_key(model, messages, params)
+        if cassette.replaying:
+            content = _replay(cassette, request_key, stage, model)
+            if content is not None:
+                consumer.feed(content)
+            return content
+
+    cache = get_cache() if use_cache else None
+    if cache is not None:
+        key = cache_key(model, messages, params, str(client.base_url))
+        call = start_call(stage, model, source="cache")
+        content = cache.get(key)
+        if content is not None:
+            print(f"Using cached {stage}.")
+            call.finish()
+            consumer.feed(content)
+            return content
+
+    content = _stream_with_retries(client, messages, consumer, max_retries, stage, model, params)
+    if content is not None:
+        if cache is not None:
+            cache.put(key, content)
+        if cassette is not None:
+            cassette.record(request_key, stage, model, messages, params, content)
+    return content
+
+
+def _replay(cassette, request_key, stage, model):
+    call = start_call(stage, model, source="cassette")
+    content = cassette.replay(request_key)
+    if content is None:
+        print(f"Error generating {stage}: no recorded response in cassette {cassette.path}")
+        call.finish(error="no recorded response")
+    else:
+        call.finish()
+    return content
+
+
+def _cached_completion(client, messages, max_retries, stage, model, use_cache, params, refresh=False):
+    cache = get_cache() if use_cache else None
+    if cache is None:
+        return _complete_with_retries(client, messages, max_retries, stage, model, params)
+
+    key = cache_key(model, messages, params, str(client.base_url))
+    if refresh:
+        content = _complete_with_retries(client, messages, max_retries, stage, model, params)
+        if content is not None:
+            cache.put(key, content)
+        return content
+
+    def cached_call():
+        call = start_call(stage, model, source="cache")
+        content = cache.get(key)
+        if content is not None:
+            print(f"Using cached {stage}.")
+            call.finish()
+            return content
+        content = _complete_with_retries(client, messages, max_retries, stage, model, params)
+        if content is not None:
+            cache.put(key, content)
+        return content
+
+    return single_flight.do(key, cached_call)
+
+
+async def _acached_completion(client, messages, max_retries, stage, model, use_cache, params):
+    cache = get_cache() if use_cache else None
+    if cache is None:
+        return await _acomplete_with_retries(client, messages, max_retries, stage, model, params)
+
+    key = cache_key(model, messages, params, str(client.base_url))
+
+    async def cached_call():
+        call = start_call(stage, model, source="cache")
+        content = cache.get(key)
+        if content is not None:
+            print(f"Using cached {stage}.")
+            call.finish()
+            return content
+        content = await _acomplete_with_retries(client, messages, max_retries, stage, model, params)
+        if content is not None:
+            cache.put(key, content)
+        return content
+
+    return await single_flight.ado(key, cached_call)
+
+
+def _complete_with_retries(client, messages, max_retries, stage, model, params):
+    limiter = get_limiter()
+    estimate = estimate_tokens(messages, params.get("max_tokens"))
+    call = start_call(stage, model)
+    error = None
+    for attempt in range(max_retries):
+        try:
+            if limiter is not None:
+                limiter.acquire(estimate)
+            response = _send(client, model, messages, params)
+            if limiter is not None and response.usage is not None:
+                limiter.settle(estimate, response.usage.total_tokens)
+            content = response.choices[0].message.content.strip()
+            call.finish(attempt + 1, response.usage, response.choices[0].finish_reason)
+            return content
+        except Exception as e:
+            error = e
+            print(f"Error generating {stage}: {e}")
+            if attempt < max_retries - 1:
+                delay = _backoff(limiter, attempt, e)
+                print(f"Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+    call.finish(max_retries, error=error)
+    return None
+
+
+async def _acomplete_with_retries(client, messages, max_retries, stage, model, params):
+    limiter = get_limiter()
+    estimate = estimate_tokens(messages, params.get("max_tokens"))
+    call = start_call(stage, model)
+    error = None
+    for attempt in range(max_retries):
+        try:
+            if limiter is not None:
+                await limiter.aacquire(estimate)
+            response = await _asend(client, model, messages, params)
+            if limiter is not None and response.usage is not None:
+                limiter.settle(estimate, response.usage.total_tokens)
+            content = response.choices[0].message.content.strip()
+            call.finish(attempt + 1, response.usage, response.choices[0].finish_reason)
+            return content
+        except Exception as e:
+            error = e
+            print(f"Error generating {stage}: {e}")
+            if attempt < max_retries - 1:
+                delay = _backoff(limiter, attempt, e)
+                print(f"Retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+    call.finish(max_retries, error=error)
+    return None
+
+
+def _stream_with_retries(client, messages, consumer, max_retries, stage, model, params):
+    limiter = get_limiter()
+    estimate = estimate_tokens(messages, params.get("max_tokens"))
+    call = start_call(stage, model)
+    error = None
+    for attempt in range(max_retries):
+        # Time to first token is measured on the attempt that succeeds, the latency over all of them
+        call.first_token = None
+        try:
+            if attempt > 0:
+                consumer.reset()
+            if limiter is not None:
+                limiter.acquire(estimate)
+            parts = []
+            usage = None
+            finish_reason = None
+            with _request_slot():
+                stream = client.chat.completions.create(
+                    model=model, messages=messages, stream=True,
+                    stream_options={"include_usage": True}, **params
+                )
+                for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        usage = chunk.usage
+                    if chunk.choices and chunk.choices[0].finish_reason:
+                        finish_reason = chunk.choices[0].finish_reason
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        delta = chunk.choices[0].delta.content
+                        call.first_token_received()
+                        parts.append(delta)
+                        consumer.feed(delta)
+            if limiter is not None and usage is not None:
+                limiter.settle(estimate, usage.total_tokens)
+            call.finish(attempt + 1, usage, finish_reason)
+            return "".join(parts).strip()
+        except Exception as e:
+            error = e
+            print(f"Error generating {stage}: {e}")
+            if attempt < max_retries - 1:
+                delay = _backoff(limiter, attempt, e)
+                print(f"Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+    call.finish(max_retries, error=error)
+    return None
+
+
+def _backoff(limiter, attempt, error):
+    """Pick the retry delay; a 429 also pauses every other caller sharing the limiter."""
+    delay = retry_delay(attempt, error)
+    if limiter is not None and is_rate_limit_error(error):
+        limiter.pause(delay)
+    return delay
+
+
+@contextlib.contextmanager
+def _request_slot():
+    """Hold one slot of the in-flight request cap, if there is one."""
+    semaphore = _concurrency
+    if semaphore is None:
+        yield
+        return
+    with semaphore:
+        yield
+
+
+def _send(client, model, messages, params):
+    with _request_slot():
+        return client.chat.completions.create(model=model, messages=messages, **params)
+
+
+async def _asend(client, model, messages, params):
+    semaphore = _concurrency
+    if semaphore is None:
+        return await client.chat.completions.create(model=model, messages=messages, **params)
+    # The cap is shared with worker threads, so poll instead of blocking the event loop
+    while not semaphore.acquire(blocking=False):
+        await asyncio.sleep(0.01)
+    try:
+        return await client.chat.completions.create(model=model, messages=messages, **params)
+    finally:
+        semaphore.release()
@@ -0,0 +1,331 @@
+# shared-workflows/scripts/minhash_index.py
+
+"""
+MinHash/LSH index of the task bank for finding near-duplicate tasks.
+
+Every task in the bank (see task_bank.py) gets two MinHash signatures:
+
+    theme     the words of its theme (from task.json, written by batch_generate.py,
+              or else the title of tasks/new_task.md)
+    content   three-word shingles of the description and the solution files
+
+Theme signatures are classic MinHash (NUM_HASHES hash functions over a few
+words). Content signatures use one-permutation hashing, since descriptions
+have thousands of shingles: every shingle is hashed once and kept in one of
+NUM_HASHES bins, empty bins borrow from their right neighbour. Signatures
+are cut into BANDS bands of ROWS values; tasks sharing a band are the
+candidates, and the fraction of equal signature values estimates their
+Jaccard similarity.
+
+The index is written as minhash.json (task metadata) plus one binary file per
+signature kind holding, for every band, the band keys sorted with their task
+numbers, followed by the signatures. The files are memory-mapped and the bands
+searched with bisect, so nothing is loaded up front and a lookup costs
+BANDS binary searches plus one comparison per candidate, well under a
+millisecond for tens of thousands of tasks.
+
+Usage:
+    python minhash_index.py build                # Rebuild the index of TASK_BANK_DIR
+    python minhash_index.py theme <text>         # Show the tasks with a similar theme
+    python minhash_index.py check <task_dir>     # Show the bank tasks similar to a generated task
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+
+from file_utils import write_text_atomic
+from task_bank import KINDS as SOURCE_DIRS, bank_dir, terms
+from tracing import traced
+
+META_FILE = "minhash.json"
+SIGNATURE_KINDS = ("theme", "content")
+NUM_HASHES = 60
+BANDS = 20
+ROWS = NUM_HASHES // BANDS
+SHINGLE_SIZE = 3
+# Minimum estimated Jaccard similarity of a match, overridable with TASK_SIMILARITY_THRESHOLD
+DEFAULT_THRESHOLD = 0.5
+
+_MASK = 0xFFFFFFFF
+_DENSIFY_OFFSET = 0x9E3779B1
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures have to be comparable across processes and index builds
+_random = random.Random(3)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(_PRIME)) for _ in range(NUM_HASHES)]
+TITLE_PATTERN = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+
+
+def similarity_threshold():
+    value = os.getenv("TASK_SIMILARITY_THRESHOLD")
+    return float(value) if value else DEFAULT_THRESHOLD
+
+
+def reuse_similar_enabled():
+    return os.getenv("TASK_REUSE_SIMILAR", "").strip().lower() in ("1", "true", "yes")
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def theme_shingles(text):
+    return set(terms(text))
+
+
+def content_shingles(text):
+    words = terms(text)
+    if len(words) < SHINGLE_SIZE:
+        return set(words)
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def signature(shingles):
+    """MinHash signature of a small set of strings, or None for an empty set."""
+    hashes = [_hash64(shingle.encode("utf-8")) for shingle in shingles]
+    if not hashes:
+        return None
+    return [min((a * value + b) % _PRIME for value in hashes) & _MASK for a, b in _PERMUTATIONS]
+
+
+def one_permutation_signature(shingles):
+    """One-permutation MinHash signature of a large set of strings, or None for an empty set."""
+    bins = [None] * NUM_HASHES
+    for shingle in shingles:
+        value = _hash64(shingle.encode("utf-8"))
+        position, value = value % NUM_HASHES, (value // NUM_HASHES) & _MASK
+        if bins[position] is None or value < bins[position]:
+            bins[position] = value
+    if all(value is None for value in bins):
+        return None
+
+    result = list(bins)
+    for position in range(NUM_HASHES):
+        if bins[position] is None:
+            distance = 1
+            while bins[(position + distance) % NUM_HASHES] is None:
+                distance += 1
+            result[position] = (bins[(position + distance) % NUM_HASHES] + distance * _DENSIFY_OFFSET) & _MASK
+    return result
+
+
+def band_keys(signature_values):
+    return [
+        _hash64(struct.pack(f"<{ROWS + 1}I", band, *signature_values[band * ROWS:(band + 1) * ROWS]))
+        for band in range(BANDS)
+    ]
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        return file.read()
+
+
+def read_task(task_dir):
+    """Return (metadata, theme text, content text) of a task directory, or None without a description."""
+    description_path = os.path.join(task_dir, "tasks", "new_task.md")
+    if not os.path.isfile(description_path):
+        return None
+    description = _read(description_path)
+    metadata = {}
+    metadata_path = os.path.join(task_dir, "task.json")
+    if os.path.isfile(metadata_path):
+        try:
+            with open(metadata_path, "r") as file:
+                metadata = json.load(file)
+        except ValueError:
+            print(f"Ignoring invalid {metadata_path}")
+
+    title = TITLE_PATTERN.search(description)
+    theme = metadata.get("theme") or (title.group(1) if title else description.strip().split("\n", 1)[0])
+    sources = [description]
+    source_dir = os.path.join(task_dir, SOURCE_DIRS["solution"])
+    if os.path.isdir(source_dir):
+        sources.extend(
+            _read(os.path.join(source_dir, name)) for name in sorted(os.listdir(source_dir)) if name.endswith(".java")
+        )
+    metadata = {
+        "name": os.path.basename(os.path.normpath(task_dir)),
+        "theme": theme,
+        "language": metadata.get("language"),
+        "difficulty": metadata.get("difficulty"),
+    }
+    return metadata, theme, "\n".join(sources)
+
+
+def _write_signatures(path, signatures):
+    """Write the sorted band keys, their task numbers and the signatures of one kind."""
+    keys = [band_keys(values) for values in signatures]
+    with open(path + ".tmp", "wb") as file:
+        bands = [sorted((task_keys[band], task) for task, task_keys in enumerate(keys)) for band in range(BANDS)]
+        for entries in bands:
+            file.write(array("Q", [key for key, _ in entries]).tobytes())
+        for entries in bands:
+            file.write(array("I", [task for _, task in entries]).tobytes())
+        file.write(array("I", [value for values in signatures for value in values]).tobytes())
+    os.replace(path + ".tmp", path)
+
+
+def build_index(directory=None):
+    """Compute the signatures of every task in the bank and write the index; returns the task count."""
+    directory = directory or bank_dir()
+    tasks = []
+    signatures = {kind: [] for kind in SIGNATURE_KINDS}
+    for name in sorted(os.listdir(directory)):
+        task = read_task(os.path.join(directory, name))
+        if task is None:
+            continue
+        metadata, theme, content = task
+        theme_signature = signature(theme_shingles(theme))
+        content_signature = one_permutation_signature(content_shingles(content))
+        if theme_signature is None or content_signature is None:
+            print(f"Skipping {name}: no words to index")
+            continue
+        tasks.append(metadata)
+        signatures["theme"].append(theme_signature)
+        signatures["content"].append(content_signature)
+
+    for kind in SIGNATURE_KINDS:
+        _write_signatures(os.path.join(directory, f"minhash_{kind}.bin"), signatures[kind])
+    meta = {"hashes": NUM_HASHES, "bands": BANDS, "byteorder": sys.byteorder, "tasks": tasks}
+    write_text_atomic(os.path.join(directory, META_FILE), json.dumps(meta, ensure_ascii=False))
+    return len(tasks)
+
+
+class MinHashIndex:
+    """A built index; the signature files are mapped on first use."""
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.tasks = meta["tasks"]
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def _view(self, kind):
+        with self._lock:
+            if kind not in self._views:
+                count = len(self.tasks)
+                with open(os.path.join(self.directory, f"minhash_{kind}.bin"), "rb") as file:
+                    data = memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+                ids_start = BANDS * count * 8
+                signatures_start = ids_start + BANDS * count * 4
+                self._views[kind] = (
+                    [data[band * count * 8:(band + 1) * count * 8].cast("Q") for band in range(BANDS)],
+                    [data[ids_start + band * count * 4:ids_start + (band + 1) * count * 4].cast("I") for band in range(BANDS)],
+                    data[signatures_start:].cast("I"),
+                )
+            return self._views[kind]
+
+    def query(self, kind, shingles, threshold):
+        """Return [(similarity, task metadata)] of the tasks at or above threshold, most similar first."""
+        query_signature = (signature if kind == "theme" else one_permutation_signature)(shingles)
+        if query_signature is None or not self.tasks:
+            return []
+        keys, ids, signatures = self._view(kind)
+        count = len(self.tasks)
+
+        candidates = set()
+        for band, key in enumerate(band_keys(query_signature)):
+            position = bisect_left(keys[band], key)
+            while position < count and keys[band][position] == key:
+                candidates.add(ids[band][position])
+                position += 1
+
+        matches = []
+        for task in candidates:
+            stored = signatures[task * NUM_HASHES:(task + 1) * NUM_HASHES]
+            similarity = sum(a == b for a, b in zip(query_signature, stored)) / NUM_HASHES
+            if similarity >= threshold:
+                matches.append((similarity, self.tasks[task]))
+        matches.sort(key=lambda match: (-match[0], match[1]["name"]))
+        return matches
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index():
+    """Return the index of TASK_BANK_DIR, or None if it has not been built (or was built for other parameters)."""
+    directory = bank_dir()
+    with _indexes_lock:
+        if directory not in _indexes:
+            index = None
+            try:
+                with open(os.path.join(directory, META_FILE), "r") as file:
+                    meta = json.load(file)
+                if (meta["hashes"], meta["bands"], meta["byteorder"]) == (NUM_HASHES, BANDS, sys.byteorder):
+                    index = MinHashIndex(directory, meta)
+                else:
+                    print(f"Ignoring {META_FILE}: built with other parameters, rebuild the index.")
+            except (OSError, ValueError, KeyError):
+                pass
+            _indexes[directory] = index
+        return _indexes[directory]
+
+
+def _same(recorded, requested):
+    return not recorded or not requested or recorded.strip().lower() == requested.strip().lower()
+
+
+@traced("retrieval")
+def find_similar_task(theme, language=None, difficulty=None):
+    """
+    Return (similarity, task metadata) of the bank task whose theme is closest
+    to `theme`, or None. Tasks recorded with another language or difficulty are
+    never returned.
+    """
+    index = get_index()
+    if index is None:
+        return None
+    for similarity, task in index.query("theme", theme_shingles(theme), similarity_threshold()):
+        if _same(task["language"], language) and _same(task["difficulty"], difficulty):
+            return similarity, task
+    return None
+
+
+def main(argv):
+    if not argv or argv[0] not in ("build", "theme", "check"):
+        print("Usage: python minhash_index.py build | theme <text> | check <task_dir>")
+        sys.exit(1)
+
+    command = argv[0]
+    if command == "build":
+        if not os.path.isdir(bank_dir()):
+            print(f"Error: Task bank directory '{bank_dir()}' not found.")
+            sys.exit(1)
+        print(f"Indexed {build_index()} tasks in {bank_dir()}")
+        return
+
+    if len(argv) < 2:
+        print(f"Usage: python minhash_index.py {command} {'<text>' if command == 'theme' else '<task_dir>'}")
+        sys.exit(1)
+    index = get_index()
+    if index is None:
+        print(f"Error: No MinHash index in '{bank_dir()}'; run 'python minhash_index.py build' first.")
+        sys.exit(1)
+
+    if command == "theme":
+        matches = index.query("theme", theme_shingles(" ".join(argv[1:])), similarity_threshold())
+    else:
+        task = read_task(argv[1])
+        if task is None:
+            print(f"Error: No tasks/new_task.md in '{argv[1]}'.")
+            sys.exit(1)
+        matches = index.query("content", content_shingles(task[2]), similarity_threshold())
+    for similarity, task in matches:
+        print(f"{similarity:.2f}\t{task['name']}\t{task['theme']}")
+    if not matches:
+        print("No similar tasks.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,271 @@
+# shared-workflows/scripts/pipeline.py
+
+"""
+In-process task generation pipeline.
+
+Runs the whole generation chain in one process as a dependency DAG instead of
+one GitHub Actions job per stage:
+
+    description -> solution -> tests           -> test_review
+                            -> solution_review -> template
+
+Independent stages (the solution review and the tests, then the test review
+and the template) run in parallel, artifacts are passed in memory, and git is
+written once at the end: one branch, one commit, one push. The solution review
+only calls the model for classes javac rejects (see java_compiler.py).
+
+Usage:
+    python pipeline.py <api_key>
+
+The theme, difficulty and language come from TASK_THEME, TASK_DIFFICULTY and
+TASK_LANGUAGE, like generate_task_description.py. Before anything is generated
+the theme is looked up in the task bank, and a close match is offered for reuse
+(TASK_REUSE_SIMILAR=1 takes it). Like the standalone scripts, the test review
+and template stages work on at most ADVERSARIAL_CONCURRENCY and
+TEMPLATE_WORKERS files at a time.
+"""
+
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from adversarial_solution import review_solution
+from adversarial_tests import adversarial_review, review_workers
+from file_utils import write_text_atomic
+from generate_solution import generate_solution, generate_solution_files, split_generated_code
+from generate_task_description import find_reusable_task, generate_task_description, new_branch_name
+from generate_template_code import derive_template, template_workers
+from generate_tests import generate_test_files, generate_tests, split_generated_tests
+from git_utils import commit_paths, create_branch, push
+from java_lexer import declared_types
+from llm_client import get_client
+from structured_output import structured_output_enabled
+from task_bank import task_files
+from telemetry import pipeline_stage, propagate, run_scope
+from tracing import init_tracing, span
+
+TASK_FILE = os.path.join("tasks", "new_task.md")
+SOLUTION_DIR = ".hidden_tasks"
+TEST_DIR = "gen_test"
+TEMPLATE_DIR = "gen_src"
+
+
+class PipelineError(Exception):
+    """Raised when a stage fails or the stage graph cannot be scheduled."""
+
+
+class Stage:
+    """A named unit of work that runs once all of its dependencies have finished."""
+
+    def __init__(self, name, deps, run):
+        self.name = name
+        self.deps = tuple(deps)
+        self.run = run  # Called with {dependency name: dependency result}
+
+
+def run_dag(stages, max_workers=4):
+    """
+    Run stages in dependency order, starting each one as soon as its inputs are ready.
+    Returns (results, timings) keyed by stage name. Raises PipelineError on the first failure.
+    """
+    pending = {stage.name: stage for stage in stages}
+    unknown = {dep for stage in stages for dep in stage.deps} - set(pending)
+    if unknown:
+        raise PipelineError(f"Unknown stage dependencies: {sorted(unknown)}")
+
+    results = {}
+    timings = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage.deps):
+                    del pending[name]
+                    inputs = {dep: results[dep] for dep in stage.deps}
+                    running[executor.submit(propagate(_timed), name, stage.run, inputs)] = name
+                    print(f"[pipeline] started {name}")
+
+            if not running:
+                raise PipelineError(f"Dependency cycle between stages: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name], timings[name] = future.result()
+                except Exception as e:
+                    for other in running:
+                        other.cancel()
+                    raise PipelineError(f"Stage '{name}' failed: {e}") from e
+                print(f"[pipeline] finished {name} in {timings[name]:.1f}s")
+
+    return results, timings
+
+
+def _timed(name, fn, inputs):
+    start = time.perf_counter()
+    with pipeline_stage(name), span(f"stage {name}", "pipeline"):
+        result = fn(inputs)
+    return result, time.perf_counter() - start
+
+
+def _require(value, what):
+    if not value:
+        raise PipelineError(f"Failed to generate {what} after multiple retries.")
+    return value
+
+
+def _join_sources(files):
+    """Concatenate Java sources in file name order, as the per-stage scripts do."""
+    return "\n\n".join(files[name] for name in sorted(files))
+
+
+def build_stages(client, theme, language, difficulty=None):
+    """Describe the generation chain as stages; each file artifact is a {file_name: content} dict."""
+    structured = structured_output_enabled()
+
+    def description(inputs):
+        return _require(generate_task_description(client, theme, language, difficulty), "task description")
+
+    def solution(inputs):
+        if structured:
+            return dict(_require(generate_solution_files(client, inputs["description"]), "solution code"))
+        raw = _require(generate_solution(client, inputs["description"]), "solution code")
+        return dict(_require(split_generated_code(raw), "solution classes"))
+
+    def tests(inputs):
+        if structured:
+            return dict(_require(generate_test_files(client, _join_sources(inputs["solution"])), "the tests"))
+        raw = _require(generate_tests(client, _join_sources(inputs["solution"])), "the tests")
+        solution_types = set().union(*(declared_types(source) for source in inputs["solution"].values()))
+        return dict(_require(split_generated_tests(raw, solution_types), "test classes"))
+
+    def solution_review(inputs):
+        return _require(review_solution(client, inputs["description"], inputs["solution"], structured), "improved solution")
+
+    def test_review(inputs):
+        files = dict(inputs["tests"])
+        names = sorted(files)
+        local_types = set().union(*(declared_types(source) for source in list(files.values()) + list(inputs["solution"].values())))
+        with ThreadPoolExecutor(max_workers=review_workers(len(names))) as executor:
+            reviewed = executor.map(propagate(lambda name: adversarial_review(client, files[name], name, local_types)), names)
+            for name, content in zip(names, list(reviewed)):
+                if content is None:
+                    print(f"Error: Failed to generate improved test code for {name} after multiple retries.")
+                    continue
+                files[name] = content
+        return files
+
+    def template(inputs):
+        solution_files = inputs["solution_review"]
+        names = sorted(solution_files)
+        with ThreadPoolExecutor(max_workers=template_workers(len(names))) as executor:
+            templates = list(executor.map(propagate(lambda name: derive_template(client, solution_files[name])), names))
+        return dict(zip(names, templates))
+
+    return [
+        Stage("description", [], description),
+        Stage("solution", ["description"], solution),
+        Stage("tests", ["solution"], tests),
+        Stage("solution_review", ["description", "solution"], solution_review),
+        Stage("test_review", ["tests", "solution"], test_review),
+        Stage("template", ["solution_review"], template),
+    ]
+
+
+def run_pipeline(client, theme, language, difficulty=None, max_workers=4):
+    """
+    Run the whole generation chain in memory.
+    Returns ({repository path: content}, {stage name: seconds}).
+    A complete bank task with a near-identical theme is returned instead when
+    TASK_REUSE_SIMILAR is set (see minhash_index.py). The model calls of the run
+    are summarised per stage by telemetry.
+    """
+    reused = find_reusable_task(theme, language, difficulty)
+    if reused is not None:
+        files = task_files(reused)
+        if {os.path.dirname(path) for path in files} >= {os.path.dirname(TASK_FILE), SOLUTION_DIR, TEST_DIR, TEMPLATE_DIR}:
+            return files, {}
+        print(f"Task '{reused}' in the bank is incomplete; generating a new task.")
+
+    with run_scope(theme) as run:
+        results, timings = run_dag(build_stages(client, theme, language, difficulty), max_workers=max_workers)
+    run.finish(timings)
+
+    files = {TASK_FILE: results["description"]}
+    for directory, stage in ((SOLUTION_DIR, "solution_review"), (TEST_DIR, "test_review"), (TEMPLATE_DIR, "template")):
+        for file_name, content in results[stage].items():
+            files[os.path.join(directory, file_name)] = content
+    return files, timings
+
+
+def write_files(root, files):
+    """Write the generated artifacts below root and return their paths."""
+    paths = []
+    for path in sorted(files):
+        write_text_atomic(os.path.join(root, path), files[path])
+        paths.append(path)
+    return paths
+
+
+def commit_and_push_changes(branch_name, paths):
+    """Create the task branch and publish every generated file in a single commit and push."""
+    github_token = os.getenv('GITHUB_TOKEN')
+    if not github_token:
+        print("Error: GITHUB_TOKEN environment variable is not set.")
+        sys.exit(1)
+
+    try:
+        create_branch(branch_name)
+        commit_paths(paths, f"Add generated task: {branch_name}")
+        push(branch_name, set_upstream=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error committing and pushing changes: {e}")
+        sys.exit(1)
+
+
+def main(api_key):
+    if not api_key:
+        print("Error: OpenAI API key is missing.")
+        sys.exit(1)
+
+    client = get_client(api_key)
+
+    theme = os.getenv("TASK_THEME", "Create a basic Java application with the following requirements.")
+    language = os.getenv("TASK_LANGUAGE", "English")
+    difficulty = os.getenv("TASK_DIFFICULTY")
+    max_workers = int(os.getenv("PIPELINE_WORKERS", "4"))
+
+    start = time.perf_counter()
+    try:
+        files, timings = run_pipeline(client, theme, language, difficulty, max_workers=max_workers)
+    except PipelineError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    branch_name = new_branch_name()
+    paths = write_files(".", files)
+    commit_and_push_changes(branch_name, paths)
+
+    for stage, seconds in sorted(timings.items(), key=lambda item: -item[1]):
+        print(f"[pipeline] {stage:<16} {seconds:6.1f}s")
+    print(f"[pipeline] total            {time.perf_counter() - start:6.1f}s")
+
+    # Output the branch name for the next job
+    github_output = os.getenv("GITHUB_OUTPUT")
+    if github_output:
+        with open(github_output, "a") as file:
+            file.write(f"branch_name={branch_name}\n")
+
+
+if __name__ == "__main__":
+    init_tracing()
+    if len(sys.argv) != 2:
+        print("Error: Missing required command line argument 'api_key'")
+        sys.exit(1)
+
+    api_key = sys.argv[1]
+
+    main(api_key)
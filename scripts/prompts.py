@@ -0,0 +1,154 @@
+# shared-workflows/scripts/prompts.py
+
+"""
+Registry of the generation prompts.
+
+A PromptTemplate keeps everything that does not change between requests (the
+instructions, the example sections and the closing notes) in a fixed prefix
+and appends the per-request parts (an example retrieved for the request, then
+the task description, solution, theme, ...) at the very end.
+Requests of the same stage therefore share a byte-identical prefix, which the
+provider's prompt cache can reuse instead of processing it again.
+
+Every template records a token estimate of its static prefix and has a
+prompt budget (PROMPT_BUDGETS, overridable with PROMPT_BUDGET_<NAME>). A
+rendered prompt over budget first has its sections compacted, then loses its
+optional sections, last one first, until it fits.
+
+Usage:
+    python prompts.py    # List the registered templates with their sizes and budgets
+"""
+
+import os
+import re
+
+from rate_limiter import estimate_text_tokens
+
+# Prompt budgets in estimated tokens, keyed by template name
+PROMPT_BUDGETS = {
+    "task_description": 8000,
+    "solution": 8000,
+    "tests": 12000,
+}
+DEFAULT_BUDGET = 12000
+
+
+class Section:
+    """A static block of the prompt, e.g. an example; optional sections may be dropped to meet the budget."""
+
+    def __init__(self, title, text, optional=False):
+        self.title = title
+        self.text = text
+        self.optional = optional
+
+    def render(self, compact=False):
+        text = compact_text(self.text) if compact else self.text
+        return f"### {self.title}\n{text}\n\n" if self.title else f"{text}\n\n"
+
+
+class PromptTemplate:
+    """
+    A prompt made of a static part (instructions, sections, closing notes) and
+    a request format string filled in per call, which always comes last.
+    """
+
+    def __init__(self, name, instructions, sections=(), notes="", request=""):
+        self.name = name
+        self.instructions = instructions
+        self.sections = list(sections)
+        self.notes = notes
+        self.request = request
+        self.static_tokens = estimate_text_tokens(self.static_prefix())
+
+    def budget(self):
+        value = os.getenv(f"PROMPT_BUDGET_{self.name.upper()}")
+        return int(value) if value else PROMPT_BUDGETS.get(self.name, DEFAULT_BUDGET)
+
+    def static_prefix(self, compact=False, dropped=()):
+        parts = [self.instructions + "\n\n"]
+        parts.extend(section.render(compact) for section in self.sections if section.title not in dropped)
+        if self.notes:
+            parts.append(self.notes + "\n\n")
+        return "".join(parts)
+
+    def render(self, examples=None, **values):
+        """
+        Fill in the request and fit the prompt into the template's budget.
+        `examples` maps titles to text retrieved for this request, e.g. a
+        similar task from the bank. They go after the static prefix, right
+        before the request, so the prefix stays byte-identical across requests,
+        and are the first sections dropped when the prompt is over budget.
+        """
+        request = self.request.format(**values)
+        retrieved = [Section(title, text, optional=True) for title, text in (examples or {}).items()]
+        budget = self.budget()
+        prompt = self._assemble(False, (), retrieved, request)
+        if estimate_text_tokens(prompt) <= budget:
+            return prompt
+
+        compact = True
+        dropped = []
+        prompt = self._assemble(compact, dropped, retrieved, request)
+        for section in reversed(self.sections + retrieved):
+            if estimate_text_tokens(prompt) <= budget:
+                break
+            if section.optional:
+                dropped.append(section)
+                prompt = self._assemble(compact, dropped, retrieved, request)
+        tokens = estimate_text_tokens(prompt)
+        note = f", dropped {', '.join(section.title for section in dropped)}" if dropped else ""
+        print(f"Prompt '{self.name}' compacted to ~{tokens} tokens (budget {budget}{note}).")
+        if tokens > budget:
+            print(f"Warning: prompt '{self.name}' is still over its budget of {budget} tokens.")
+        return prompt
+
+    def _assemble(self, compact, dropped, retrieved, request):
+        prefix = self.static_prefix(compact, [section.title for section in dropped if section in self.sections])
+        examples = "".join(section.render(compact) for section in retrieved if section not in dropped)
+        return prefix + examples + request
+
+
+def compact_text(text):
+    """Remove indentation shared by all lines, trailing spaces and repeated blank lines."""
+    lines = [line.rstrip() for line in text.strip("\n").splitlines()]
+    indents = [len(line) - len(line.lstrip()) for line in lines if line]
+    indent = min(indents) if indents else 0
+    text = "\n".join(line[indent:] for line in lines)
+    return re.sub(r'\n{3,}', "\n\n", text)
+
+
+_registry = {}
+
+
+def register(template):
+    """Add a template to the registry and return it."""
+    _registry[template.name] = template
+    return template
+
+
+def get_template(name):
+    return _registry[name]
+
+
+def registered_templates():
+    return [_registry[name] for name in sorted(_registry)]
+
+
+def main():
+    # Importing the stage scripts registers their templates, in the prompts
+    # module they import rather than in this one when it runs as __main__
+    import generate_solution  # noqa: F401
+    import generate_task_description  # noqa: F401
+    import generate_tests  # noqa: F401
+    from prompts import registered_templates
+
+    print(f"{'template':<18} {'static tokens':>13} {'budget':>7}  sections")
+    for template in registered_templates():
+        sections = ", ".join(
+            section.title + (" (optional)" if section.optional else "") for section in template.sections
+        )
+        print(f"{template.name:<18} {template.static_tokens:>13} {template.budget():>7}  {sections}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# shared-workflows/scripts/rate_limiter.py
+
+"""
+Process-wide requests-per-minute / tokens-per-minute limiter for LLM calls.
+
+Two token buckets (one counting requests, one counting estimated prompt plus
+completion tokens) are refilled continuously. Callers are served strictly in
+arrival order, so a large request cannot be starved by a stream of small ones.
+After a call the token bucket is corrected with the usage the API reported.
+Configure with LLM_RPM and LLM_TPM; the limiter is off when neither is set.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+
+# Completion size assumed when the caller does not pass max_tokens
+DEFAULT_COMPLETION_TOKENS = 1500
+# Longest delay between retries, also for a server-provided Retry-After
+MAX_RETRY_DELAY = 60.0
+
+
+def estimate_text_tokens(text):
+    """Estimate the tokens of a text at roughly four characters per token."""
+    return len(text) // 4
+
+
+def estimate_tokens(messages, max_tokens=None):
+    """
+    Estimate prompt plus completion tokens for a chat request.
+    Uses roughly four characters per token and a small per-message overhead.
+    """
+    prompt_tokens = sum(estimate_text_tokens(str(message.get("content", ""))) + 4 for message in messages) + 3
+    completion_tokens = max_tokens or int(os.getenv("LLM_COMPLETION_TOKENS", DEFAULT_COMPLETION_TOKENS))
+    return prompt_tokens + completion_tokens
+
+
+class TokenBucket:
+    """A bucket holding up to `per_minute` units, refilled at per_minute / 60 units per second."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` units are available (0 if they are available now)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """FIFO-fair limiter over an optional RPM bucket and an optional TPM bucket."""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.buckets = {}
+        if rpm:
+            self.buckets["requests"] = TokenBucket(rpm)
+        if tpm:
+            self.buckets["tokens"] = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+        self._paused_until = 0.0
+
+    def _wait_time(self, tokens):
+        now = time.monotonic()
+        wait = max(0.0, self._paused_until - now)
+        for name, bucket in self.buckets.items():
+            bucket.refill(now)
+            wait = max(wait, bucket.wait_time(1 if name == "requests" else tokens))
+        return wait
+
+    def _take(self, tokens):
+        for name, bucket in self.buckets.items():
+            bucket.take(1 if name == "requests" else tokens)
+        self._advance()
+
+    def _advance(self):
+        """Move on to the next ticket, skipping those whose callers gave up while queued."""
+        self._serving += 1
+        while self._serving in self._abandoned:
+            self._abandoned.remove(self._serving)
+            self._serving += 1
+        self._cond.notify_all()
+
+    def _abandon(self, ticket):
+        """Give up a ticket that was never served, e.g. because its caller was cancelled."""
+        with self._cond:
+            if ticket == self._serving:
+                self._advance()
+            elif ticket > self._serving:
+                self._abandoned.add(ticket)
+
+    def acquire(self, tokens):
+        """Block until this caller's turn comes and the budgets allow a request of `tokens` tokens."""
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            try:
+                while True:
+                    if ticket == self._serving:
+                        wait = self._wait_time(tokens)
+                        if wait <= 0:
+                            self._take(tokens)
+                            ticket = None
+                            return
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                if ticket is not None:
+                    self._abandon(ticket)
+
+    async def aacquire(self, tokens):
+        """Asynchronous acquire; shares the queue with threaded callers without blocking the loop."""
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+        try:
+            while True:
+                with self._cond:
+                    if ticket == self._serving:
+                        wait = self._wait_time(tokens)
+                        if wait <= 0:
+                            self._take(tokens)
+                            ticket = None
+                            return
+                    else:
+                        wait = 0.01
+                await asyncio.sleep(wait)
+        finally:
+            # A caller cancelled while queued must not hold up everyone behind it
+            if ticket is not None:
+                self._abandon(ticket)
+
+    def settle(self, estimated, actual):
+        """Correct the token bucket once the real usage of a request is known."""
+        bucket = self.buckets.get("tokens")
+        if bucket is None or actual is None:
+            return
+        with self._cond:
+            bucket.level = min(bucket.capacity, bucket.level + estimated - actual)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold every caller back, e.g. after the provider answered with a 429."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def is_rate_limit_error(error):
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_delay(attempt, error=None):
+    """
+    Delay before the next attempt: the server's Retry-After if it sent one,
+    otherwise exponential backoff with full jitter (LLM_RETRY_BASE_DELAY);
+    either way at most MAX_RETRY_DELAY seconds.
+    """
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(MAX_RETRY_DELAY, max(0.0, float(retry_after)))
+        except ValueError:
+            pass
+    base = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+    return random.uniform(0, min(MAX_RETRY_DELAY, base * (2 ** attempt)))
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Return the process-wide limiter configured by LLM_RPM / LLM_TPM, or None."""
+    global _limiter
+    rpm = int(os.getenv("LLM_RPM", "0"))
+    tpm = int(os.getenv("LLM_TPM", "0"))
+    if not rpm and not tpm:
+        return None
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(rpm, tpm)
+    return _limiter
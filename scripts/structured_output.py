@@ -0,0 +1,105 @@
+# shared-workflows/scripts/structured_output.py
+
+"""
+Structured-output mode: ask the model for {"files": [{"path", "content"}]} JSON
+through a strict json_schema response format instead of free text.
+
+The response is parsed in one json.loads and every file is written as it is,
+so the regex splitting and repair of free-text answers is not needed. Enable
+it with LLM_STRUCTURED_OUTPUT=1; a response that does not parse or names an
+invalid file is requested again (bypassing the cache) before giving up.
+"""
+
+import json
+import os
+import re
+
+from llm_client import generate_with_retries
+from tracing import traced
+
+FILES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "files": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string", "description": "Java file name, e.g. Player.java"},
+                    "content": {"type": "string", "description": "Complete source code of the file"},
+                },
+                "required": ["path", "content"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["files"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "java_files", "strict": True, "schema": FILES_SCHEMA},
+}
+
+PROMPT_SUFFIX = (
+    "\n\nReturn the result as JSON with a `files` array. Each item has a `path` "
+    "(the Java file name, e.g. Player.java, one top-level class per file) and a "
+    "`content` (the complete source code of that file, without markdown)."
+)
+
+FILE_NAME_PATTERN = re.compile(r'[A-Za-z_$][\w$]*\.java')
+
+
+def structured_output_enabled():
+    return os.getenv("LLM_STRUCTURED_OUTPUT", "").strip().lower() in ("1", "true", "yes")
+
+
+@traced("postprocess")
+def parse_files(response_content):
+    """
+    Parse a structured response into [(file_name, content)] pairs.
+    Returns None when it is not valid JSON, contains no files, or names a file
+    that is not a plain Java file name (no directories).
+    """
+    try:
+        payload = json.loads(response_content)
+    except (TypeError, ValueError) as e:
+        print(f"Error parsing structured response: {e}")
+        return None
+
+    files = payload.get("files") if isinstance(payload, dict) else None
+    if not isinstance(files, list) or not files:
+        print("Error parsing structured response: no files in the response.")
+        return None
+
+    result = []
+    for entry in files:
+        path = entry.get("path") if isinstance(entry, dict) else None
+        content = entry.get("content") if isinstance(entry, dict) else None
+        if not isinstance(path, str) or not FILE_NAME_PATTERN.fullmatch(path) or not isinstance(content, str):
+            print(f"Error parsing structured response: invalid file entry {str(entry)[:50]}")
+            return None
+        result.append((path, content.strip() + "\n"))
+    return result
+
+
+def generate_files(client, prompt, max_retries=3, stage="response", **params):
+    """
+    Generate [(file_name, content)] pairs for a prompt in structured-output mode,
+    or None if no valid response was produced.
+    """
+    for attempt in range(max_retries):
+        # A cached response that failed to parse would fail again, so retries replace it with a new one
+        response_content = generate_with_retries(
+            client, prompt + PROMPT_SUFFIX, max_retries=max_retries, stage=stage,
+            refresh_cache=attempt > 0, response_format=RESPONSE_FORMAT, **params
+        )
+        if response_content is None:
+            return None
+        files = parse_files(response_content)
+        if files is not None:
+            return files
+        if attempt < max_retries - 1:
+            print(f"Requesting {stage} again...")
+    return None
@@ -0,0 +1,220 @@
+# shared-workflows/scripts/symbol_index.py
+
+"""
+Prebuilt index from simple Java type names to fully qualified JDK/JUnit types.
+
+The index is a sorted text file with one "SimpleName<TAB>fully.qualified.Name"
+line per name (java_symbols.tsv next to this script). It is memory-mapped on
+first use and searched with a binary search over byte offsets, so nothing is
+parsed up front and a lookup costs O(log size) no matter how many types are
+indexed. When a simple name exists in several packages, the build keeps the
+one from the most commonly used package (see PREFERRED_PACKAGES).
+
+Rebuild it from a JDK and JUnit jars with:
+    python symbol_index.py build [--jmods $JAVA_HOME/jmods] [--jar junit.jar ...] [--list names.txt] [-o java_symbols.tsv]
+Look names up with:
+    python symbol_index.py lookup List Test Random
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+import zipfile
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "java_symbols.tsv")
+
+# Earlier packages win when several types share a simple name (java.util.List over java.awt.List)
+PREFERRED_PACKAGES = [
+    "java.lang", "java.util", "java.util.function", "java.util.stream", "java.io", "java.nio.file",
+    "java.time", "java.math", "java.text", "java.util.concurrent", "java.util.concurrent.atomic",
+    "java.util.regex", "org.junit", "org.junit.jupiter.api",
+]
+# Packages never offered as imports, even when a jar contains them. GUI types
+# (java.awt.Rectangle, Point, Color, ...) share their names with the classes
+# students are asked to write and would shadow them.
+EXCLUDED_PREFIXES = ("sun.", "com.sun.", "jdk.", "java.lang.invoke.", "org.junit.internal.", "java.awt.", "javax.swing.")
+
+
+class SymbolIndex:
+    """Read-only view of an index file; the file is opened and mapped lazily on the first lookup."""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._map = None
+        self._lock = threading.Lock()
+
+    def _data(self):
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    with open(self.path, "rb") as file:
+                        if os.fstat(file.fileno()).st_size == 0:
+                            self._map = b""
+                        else:
+                            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def lookup(self, name):
+        """Return the fully qualified name indexed for a simple name, or None."""
+        data = self._data()
+        key = name.encode("utf-8") + b"\t"
+        low, high = 0, len(data)
+        # Invariant: every line starting before `low` sorts before key, every line starting at or after `high` does not
+        while low < high:
+            middle = (low + high) // 2
+            line_start = data.rfind(b"\n", 0, middle) + 1
+            line_end = data.find(b"\n", line_start)
+            if line_end == -1:
+                line_end = len(data)
+            line = data[line_start:line_end]
+            if line.startswith(key):
+                return line[len(key):].decode("utf-8")
+            if line < key:
+                low = line_end + 1
+            else:
+                high = line_start
+        return None
+
+    def import_for(self, name):
+        """Return the import statement a simple name needs, or None (unknown, or in java.lang)."""
+        qualified_name = self.lookup(name)
+        if qualified_name is None or qualified_name.rsplit(".", 1)[0] == "java.lang":
+            return None
+        return f"import {qualified_name};"
+
+
+class ImportTable:
+    """
+    Maps simple names to import statements for java_lexer.normalize_source:
+    explicit entries (e.g. static imports for assert methods) first, then the symbol index.
+    """
+
+    def __init__(self, explicit=None, index=None):
+        self.explicit = dict(explicit or {})
+        self.index = index
+
+    def get(self, name):
+        statement = self.explicit.get(name)
+        if statement is None and self.index is not None and name[:1].isupper():
+            statement = self.index.import_for(name)
+        return statement
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the process-wide index over java_symbols.tsv (JAVA_SYMBOL_INDEX overrides the path)."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = SymbolIndex(os.getenv("JAVA_SYMBOL_INDEX", DEFAULT_INDEX_PATH))
+    return _default_index
+
+
+def import_table(explicit=None):
+    """An ImportTable over the default index."""
+    return ImportTable(explicit, get_index())
+
+
+def public_class_names(archive_path, prefix=""):
+    """Yield the fully qualified names of the public top-level classes in a jar or jmod file."""
+    with zipfile.ZipFile(archive_path) as archive:
+        for entry in archive.namelist():
+            if not entry.startswith(prefix) or not entry.endswith(".class"):
+                continue
+            path = entry[len(prefix):-len(".class")]
+            if "$" in path or path.endswith(("module-info", "package-info")):
+                continue
+            if _is_public(archive.read(entry)):
+                yield path.replace("/", ".")
+
+
+def _is_public(class_file):
+    """Read the access flags behind the constant pool of a class file."""
+    CONSTANT_SIZES = {3: 4, 4: 4, 5: 8, 6: 8, 7: 2, 8: 2, 9: 4, 10: 4, 11: 4, 12: 4, 15: 3, 16: 2, 17: 4, 18: 4, 19: 2, 20: 2}
+    count = struct.unpack_from(">H", class_file, 8)[0]
+    offset = 10
+    index = 1
+    while index < count:
+        tag = class_file[offset]
+        if tag == 1:
+            offset += 3 + struct.unpack_from(">H", class_file, offset + 1)[0]
+        else:
+            offset += 1 + CONSTANT_SIZES[tag]
+        index += 2 if tag in (5, 6) else 1
+    return bool(struct.unpack_from(">H", class_file, offset)[0] & 0x0001)
+
+
+def _rank(qualified_name):
+    package = qualified_name.rsplit(".", 1)[0]
+    preference = PREFERRED_PACKAGES.index(package) if package in PREFERRED_PACKAGES else len(PREFERRED_PACKAGES)
+    return preference, qualified_name.count("."), qualified_name
+
+
+def build_index(qualified_names, output_path):
+    """Write the index for the given fully qualified names and return the number of entries."""
+    best = {}
+    for qualified_name in qualified_names:
+        if qualified_name.startswith(EXCLUDED_PREFIXES):
+            continue
+        simple_name = qualified_name.rsplit(".", 1)[-1]
+        if simple_name not in best or _rank(qualified_name) < _rank(best[simple_name]):
+            best[simple_name] = qualified_name
+    lines = sorted(f"{name}\t{qualified_name}\n".encode("utf-8") for name, qualified_name in best.items())
+    with open(output_path, "wb") as file:
+        file.writelines(lines)
+    return len(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Build or query the Java symbol index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Build the index from a JDK, jars and name lists")
+    build.add_argument("--jmods", help="A JDK jmods directory, e.g. $JAVA_HOME/jmods")
+    build.add_argument("--jar", action="append", default=[], help="A jar whose public classes are indexed")
+    build.add_argument("--list", action="append", default=[], help="A file with one fully qualified name per line")
+    build.add_argument("-o", "--output", default=DEFAULT_INDEX_PATH)
+
+    lookup = subparsers.add_parser("lookup", help="Print the fully qualified name of simple names")
+    lookup.add_argument("names", nargs="+")
+    lookup.add_argument("--index", default=DEFAULT_INDEX_PATH)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "lookup":
+        index = SymbolIndex(args.index)
+        for name in args.names:
+            print(f"{name}\t{index.lookup(name) or '-'}")
+        return
+
+    names = []
+    try:
+        if args.jmods:
+            for file_name in sorted(os.listdir(args.jmods)):
+                if file_name.startswith("java.") and file_name.endswith(".jmod"):
+                    names.extend(public_class_names(os.path.join(args.jmods, file_name), prefix="classes/"))
+        for jar in args.jar:
+            names.extend(public_class_names(jar))
+        for list_path in args.list:
+            with open(list_path) as file:
+                names.extend(line.strip() for line in file if line.strip() and not line.startswith("#"))
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Error reading class names: {e}")
+        sys.exit(1)
+
+    if not names:
+        print("Error: No class names given; pass --jmods, --jar or --list.")
+        sys.exit(1)
+
+    count = build_index(names, args.output)
+    print(f"Wrote {count} names to {args.output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
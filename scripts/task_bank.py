@@ -0,0 +1,250 @@
+# shared-workflows/scripts/task_bank.py
+
+"""
+Local bank of accepted tasks and BM25 retrieval of few-shot examples from it.
+
+The bank is a directory (TASK_BANK_DIR, default task_bank) with one
+subdirectory per accepted task in the layout the pipeline writes:
+
+    <task>/tasks/new_task.md
+    <task>/.hidden_tasks/*.java     solution files
+    <task>/gen_test/*.java          test files
+    <task>/gen_src/*.java           templates
+    <task>/task.json                theme, language and difficulty (optional)
+
+`build` indexes every solution and test file as a document made of its own
+terms plus the terms of its task description (identifiers are split on
+camelCase). The stages then retrieve the single most relevant small file of
+the right kind: the solution stage queries with the task description, the
+test stage with the solution. Without an index the prompts keep their
+built-in examples. `add` and `build` also rebuild the MinHash index of
+near-duplicate tasks (see minhash_index.py).
+
+Usage:
+    python task_bank.py add <task_dir> [<task_dir> ...]   # Copy generated tasks into the bank and reindex
+    python task_bank.py build                              # Rebuild the index
+    python task_bank.py query <solution|tests> <text>      # Show the best match for a query
+"""
+
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import threading
+from collections import Counter
+
+from file_utils import write_text_atomic
+from tracing import traced
+
+INDEX_FILE = "index.json"
+KINDS = {"solution": ".hidden_tasks", "tests": "gen_test"}
+TASK_DIRS = ("tasks", ".hidden_tasks", "gen_test", "gen_src")
+# Examples longer than this are never retrieved; the point is a short, relevant prompt
+MAX_EXAMPLE_CHARS = 4000
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with you your
+public private protected static final void class return new import package int double boolean string
+if else while null true false get set
+""".split())
+
+WORD_PATTERN = re.compile(r'[A-Za-z][a-z]+|[A-Z]+(?![a-z])|\d+')
+
+
+def bank_dir():
+    return os.getenv("TASK_BANK_DIR", "task_bank")
+
+
+def terms(text):
+    """Lower-case terms of a text; camelCase and snake_case identifiers are split into words."""
+    return [
+        word for word in (match.group().lower() for match in WORD_PATTERN.finditer(text))
+        if len(word) > 1 and word not in STOPWORDS
+    ]
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as file:
+        return file.read()
+
+
+def build_index(directory=None):
+    """Index every solution and test file in the bank and write index.json; returns the document count."""
+    directory = directory or bank_dir()
+    documents = []
+    for task in sorted(os.listdir(directory)):
+        task_dir = os.path.join(directory, task)
+        description_path = os.path.join(task_dir, "tasks", "new_task.md")
+        if not os.path.isfile(description_path):
+            continue
+        description_terms = Counter(terms(_read(description_path)))
+        for kind, subdirectory in KINDS.items():
+            source_dir = os.path.join(task_dir, subdirectory)
+            if not os.path.isdir(source_dir):
+                continue
+            for file_name in sorted(os.listdir(source_dir)):
+                if not file_name.endswith(".java"):
+                    continue
+                path = os.path.join(task, subdirectory, file_name)
+                content = _read(os.path.join(directory, path))
+                document_terms = description_terms + Counter(terms(content))
+                documents.append({
+                    "kind": kind,
+                    "path": path,
+                    "chars": len(content),
+                    "length": sum(document_terms.values()),
+                    "terms": dict(document_terms),
+                })
+
+    index = {"documents": documents, "kinds": {}}
+    for kind in KINDS:
+        kind_documents = [document for document in documents if document["kind"] == kind]
+        document_frequency = Counter(term for document in kind_documents for term in document["terms"])
+        index["kinds"][kind] = {
+            "count": len(kind_documents),
+            "average_length": sum(d["length"] for d in kind_documents) / len(kind_documents) if kind_documents else 0,
+            "document_frequency": dict(document_frequency),
+        }
+    write_text_atomic(os.path.join(directory, INDEX_FILE), json.dumps(index))
+    return len(documents)
+
+
+class TaskBank:
+    """A loaded bank index that scores its documents for a query with BM25."""
+
+    def __init__(self, directory, index):
+        self.directory = directory
+        self.index = index
+
+    def search(self, kind, query, max_chars=MAX_EXAMPLE_CHARS):
+        """Return (score, path) of the best document of a kind no longer than max_chars, or None."""
+        stats = self.index["kinds"].get(kind)
+        if not stats or not stats["count"]:
+            return None
+        query_terms = set(terms(query))
+        count = stats["count"]
+        average_length = stats["average_length"] or 1
+        idf = {
+            term: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in ((term, stats["document_frequency"].get(term, 0)) for term in query_terms)
+            if frequency
+        }
+
+        best = None
+        for document in self.index["documents"]:
+            if document["kind"] != kind or document["chars"] > max_chars:
+                continue
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * document["length"] / average_length)
+            score = 0.0
+            for term, weight in idf.items():
+                frequency = document["terms"].get(term)
+                if frequency:
+                    score += weight * frequency * (BM25_K1 + 1) / (frequency + length_norm)
+            if score > 0 and (best is None or score > best[0]):
+                best = (score, document["path"])
+        return best
+
+    def example(self, kind, query, max_chars=MAX_EXAMPLE_CHARS):
+        """Return the content of the best matching example, or None."""
+        match = self.search(kind, query, max_chars)
+        if match is None:
+            return None
+        try:
+            return _read(os.path.join(self.directory, match[1]))
+        except OSError:
+            return None
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_bank():
+    """Return the bank for TASK_BANK_DIR, loading its index once, or None if it has not been built."""
+    directory = bank_dir()
+    with _banks_lock:
+        if directory not in _banks:
+            try:
+                with open(os.path.join(directory, INDEX_FILE), "r") as file:
+                    _banks[directory] = TaskBank(directory, json.load(file))
+            except (OSError, ValueError):
+                _banks[directory] = None
+        return _banks[directory]
+
+
+@traced("retrieval")
+def retrieve_example(kind, query):
+    """The most relevant small solution or test file for a query, or None without a bank or a match."""
+    bank = get_bank()
+    return bank.example(kind, query) if bank is not None else None
+
+
+def task_files(name, directory=None):
+    """Return {repository path: content} of the description, solution, tests and templates of a bank task."""
+    task_dir = os.path.join(directory or bank_dir(), name)
+    files = {}
+    for subdirectory in TASK_DIRS:
+        source_dir = os.path.join(task_dir, subdirectory)
+        if not os.path.isdir(source_dir):
+            continue
+        for file_name in sorted(os.listdir(source_dir)):
+            if file_name.endswith((".md", ".java")):
+                files[os.path.join(subdirectory, file_name)] = _read(os.path.join(source_dir, file_name))
+    return files
+
+
+def add_tasks(task_dirs, directory=None):
+    """Copy generated task directories into the bank (replacing tasks of the same name)."""
+    directory = directory or bank_dir()
+    os.makedirs(directory, exist_ok=True)
+    for task_dir in task_dirs:
+        if not os.path.isfile(os.path.join(task_dir, "tasks", "new_task.md")):
+            print(f"Skipping {task_dir}: no tasks/new_task.md")
+            continue
+        target = os.path.join(directory, os.path.basename(os.path.normpath(task_dir)))
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        os.makedirs(target)
+        for subdirectory in TASK_DIRS:
+            source = os.path.join(task_dir, subdirectory)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(target, subdirectory))
+        if os.path.isfile(os.path.join(task_dir, "task.json")):
+            shutil.copy(os.path.join(task_dir, "task.json"), target)
+        print(f"Added {task_dir}")
+
+
+def main(argv):
+    if not argv or argv[0] not in ("add", "build", "query"):
+        print("Usage: python task_bank.py add <task_dir>... | build | query <solution|tests> <text>")
+        sys.exit(1)
+
+    command = argv[0]
+    if command == "add":
+        add_tasks(argv[1:])
+    if command in ("add", "build"):
+        if not os.path.isdir(bank_dir()):
+            print(f"Error: Task bank directory '{bank_dir()}' not found.")
+            sys.exit(1)
+        print(f"Indexed {build_index()} files in {bank_dir()}")
+        import minhash_index
+        print(f"Indexed {minhash_index.build_index()} tasks for near-duplicate lookup")
+        return
+
+    if len(argv) < 3 or argv[1] not in KINDS:
+        print("Usage: python task_bank.py query <solution|tests> <text>")
+        sys.exit(1)
+    bank = get_bank()
+    if bank is None:
+        print(f"Error: No index in '{bank_dir()}'; run 'python task_bank.py build' first.")
+        sys.exit(1)
+    match = bank.search(argv[1], " ".join(argv[2:]))
+    print(f"{match[0]:.2f}\t{match[1]}" if match else "No match.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
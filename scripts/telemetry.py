@@ -0,0 +1,245 @@
+# shared-workflows/scripts/telemetry.py
+
+"""
+Per-call telemetry for the LLM requests made through llm_client.
+
+Every chat completion, whether sent, served from the response cache or
+replayed from a cassette, produces one record:
+
+    stage, model, source (api, cache, cassette), ok, latency_s, ttft_s
+    (streaming only), attempts, finish_reason, prompt_tokens,
+    cached_prompt_tokens, completion_tokens, cost_usd, run, pipeline_stage
+
+With LLM_TELEMETRY_DIR set, the records are appended to llm_calls.jsonl and
+the totals so far are kept in llm.prom, a Prometheus textfile (for the node
+exporter's textfile collector). Pipeline runs are wrapped in run_scope(): the
+calls made inside a run are summarised per pipeline stage together with the
+stage's wall time, printed at the end and appended to runs.jsonl, so it is
+visible which stage dominates wall time and cost.
+
+Run and stage labels live in context variables; code that hands work to
+other threads wraps the function with propagate() so its calls keep them.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from file_utils import write_text_atomic
+from tracing import add_event
+
+CALLS_FILE = "llm_calls.jsonl"
+RUNS_FILE = "runs.jsonl"
+PROMETHEUS_FILE = "llm.prom"
+
+# USD per million tokens: (prompt, cached prompt, completion)
+PRICES = {
+    "gpt-4o-2024-08-06": (2.50, 1.25, 10.00),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+_run = contextvars.ContextVar("telemetry_run", default=None)
+_pipeline_stage = contextvars.ContextVar("telemetry_pipeline_stage", default=None)
+_lock = threading.Lock()
+# Process totals for the Prometheus textfile, keyed by (stage, model, source, status)
+_totals = defaultdict(lambda: defaultdict(float))
+_stage_seconds = {}
+
+
+def telemetry_dir():
+    return os.getenv("LLM_TELEMETRY_DIR") or None
+
+
+def cost(model, prompt_tokens, cached_prompt_tokens, completion_tokens):
+    """Estimated USD cost of a call, or None for a model without a price."""
+    prices = PRICES.get(model)
+    if prices is None:
+        return None
+    uncached = max(0, prompt_tokens - cached_prompt_tokens)
+    return (uncached * prices[0] + cached_prompt_tokens * prices[1] + completion_tokens * prices[2]) / 1e6
+
+
+class Call:
+    """Times one completion from the first attempt to the final answer; finish() records it."""
+
+    def __init__(self, stage, model, source="api"):
+        self.stage = stage
+        self.model = model
+        self.source = source
+        self.start = time.perf_counter()
+        self.first_token = None
+
+    def first_token_received(self):
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+
+    def finish(self, attempts=1, usage=None, finish_reason=None, error=None):
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_prompt_tokens = getattr(details, "cached_tokens", None) or 0
+        end = time.perf_counter()
+        add_event(f"llm {self.stage}", "llm", self.start, end, {
+            "source": self.source, "attempts": attempts, "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens, "error": str(error)[:200] if error is not None else None,
+        })
+        run = _run.get()
+        record({
+            "time": round(time.time(), 3),
+            "run": run.run_id if run is not None else None,
+            "pipeline_stage": _pipeline_stage.get(),
+            "stage": self.stage,
+            "model": self.model,
+            "source": self.source,
+            "ok": error is None,
+            "latency_s": round(end - self.start, 4),
+            "ttft_s": round(self.first_token - self.start, 4) if self.first_token is not None else None,
+            "attempts": attempts,
+            "finish_reason": finish_reason,
+            "prompt_tokens": prompt_tokens,
+            "cached_prompt_tokens": cached_prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cost_usd": cost(self.model, prompt_tokens, cached_prompt_tokens, completion_tokens) if self.source == "api" else 0.0,
+            "error": str(error)[:200] if error is not None else None,
+        })
+
+
+def start_call(stage, model, source="api"):
+    return Call(stage, model, source)
+
+
+def record(entry):
+    """Add a call record to the current run, the process totals and, if enabled, the telemetry files."""
+    run = _run.get()
+    if run is not None:
+        run.add(entry)
+    with _lock:
+        totals = _totals[(entry["stage"], entry["model"], entry["source"], "ok" if entry["ok"] else "failed")]
+        totals["calls"] += 1
+        totals["attempts"] += entry["attempts"]
+        totals["seconds"] += entry["latency_s"]
+        totals["prompt_tokens"] += entry["prompt_tokens"]
+        totals["cached_prompt_tokens"] += entry["cached_prompt_tokens"]
+        totals["completion_tokens"] += entry["completion_tokens"]
+        totals["cost_usd"] += entry["cost_usd"] or 0.0
+        directory = telemetry_dir()
+        if directory is None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, CALLS_FILE), "a") as file:
+            file.write(json.dumps(entry) + "\n")
+        _write_prometheus(directory)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_prometheus(directory):
+    metrics = [
+        ("llm_calls_total", "counter", "LLM calls by stage, model, source and status.", "calls"),
+        ("llm_attempts_total", "counter", "Request attempts including retries.", "attempts"),
+        ("llm_call_duration_seconds_total", "counter", "Time spent in LLM calls, retries included.", "seconds"),
+        ("llm_prompt_tokens_total", "counter", "Prompt tokens sent.", "prompt_tokens"),
+        ("llm_cached_prompt_tokens_total", "counter", "Prompt tokens served from the provider's prompt cache.", "cached_prompt_tokens"),
+        ("llm_completion_tokens_total", "counter", "Completion tokens received.", "completion_tokens"),
+        ("llm_cost_usd_total", "counter", "Estimated cost in USD.", "cost_usd"),
+    ]
+    lines = []
+    for name, kind, description, field in metrics:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (stage, model, source, status), totals in sorted(_totals.items()):
+            labels = f'stage="{_label(stage)}",model="{_label(model)}",source="{source}",status="{status}"'
+            lines.append(f"{name}{{{labels}}} {totals[field]:g}")
+    if _stage_seconds:
+        lines.append("# HELP pipeline_stage_duration_seconds Wall time of each stage in the last pipeline run.")
+        lines.append("# TYPE pipeline_stage_duration_seconds gauge")
+        for stage, seconds in sorted(_stage_seconds.items()):
+            lines.append(f'pipeline_stage_duration_seconds{{stage="{_label(stage)}"}} {seconds:g}')
+    write_text_atomic(os.path.join(directory, PROMETHEUS_FILE), "\n".join(lines) + "\n")
+
+
+class Run:
+    """The calls of one pipeline run."""
+
+    def __init__(self, name):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add(self, entry):
+        with self._lock:
+            self.calls.append(entry)
+
+    def summary(self, timings):
+        """{pipeline stage: totals} with the wall time of each stage and the calls made in it."""
+        stages = {}
+        for stage in list(timings) + sorted({call["pipeline_stage"] or "-" for call in self.calls} - set(timings)):
+            stages[stage] = {"wall_s": round(timings.get(stage, 0.0), 3), "calls": 0, "attempts": 0, "cache_hits": 0,
+                             "llm_s": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        for call in self.calls:
+            totals = stages[call["pipeline_stage"] or "-"]
+            totals["calls"] += 1
+            totals["attempts"] += call["attempts"]
+            totals["cache_hits"] += call["source"] != "api"
+            totals["llm_s"] = round(totals["llm_s"] + call["latency_s"], 3)
+            totals["prompt_tokens"] += call["prompt_tokens"]
+            totals["completion_tokens"] += call["completion_tokens"]
+            totals["cost_usd"] = round(totals["cost_usd"] + (call["cost_usd"] or 0.0), 6)
+        return stages
+
+    def finish(self, timings):
+        """Print the run summary and append it to runs.jsonl."""
+        stages = self.summary(timings)
+        print(f"[telemetry] {'stage':<16} {'wall s':>7} {'llm s':>7} {'calls':>5} {'tries':>5} {'cached':>6} "
+              f"{'prompt':>7} {'output':>7} {'cost $':>8}")
+        for stage, totals in sorted(stages.items(), key=lambda item: -item[1]["wall_s"]):
+            print(f"[telemetry] {stage:<16} {totals['wall_s']:>7.1f} {totals['llm_s']:>7.1f} {totals['calls']:>5} "
+                  f"{totals['attempts']:>5} {totals['cache_hits']:>6} {totals['prompt_tokens']:>7} "
+                  f"{totals['completion_tokens']:>7} {totals['cost_usd']:>8.4f}")
+        with _lock:
+            _stage_seconds.clear()
+            _stage_seconds.update(timings)
+            directory = telemetry_dir()
+            if directory is None:
+                return
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, RUNS_FILE), "a") as file:
+                file.write(json.dumps({"run": self.run_id, "name": self.name, "time": round(time.time(), 3),
+                                       "stages": stages}, ensure_ascii=False) + "\n")
+            _write_prometheus(directory)
+
+
+@contextlib.contextmanager
+def run_scope(name):
+    """Collect the calls made in this context (and in functions wrapped with propagate) into a Run."""
+    run = Run(name)
+    token = _run.set(run)
+    try:
+        yield run
+    finally:
+        _run.reset(token)
+
+
+@contextlib.contextmanager
+def pipeline_stage(name):
+    """Label the calls made in this context with a pipeline stage."""
+    token = _pipeline_stage.set(name)
+    try:
+        yield
+    finally:
+        _pipeline_stage.reset(token)
+
+
+def propagate(fn):
+    """Wrap fn so it runs with the caller's run and stage labels in whichever thread calls it."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
@@ -0,0 +1,7 @@
+# shared-workflows/scripts/tests/conftest.py
+
+import os
+import sys
+
+# The scripts import their sibling modules by plain name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
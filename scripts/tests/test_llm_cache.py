@@ -0,0 +1,12 @@
+from llm_cache import ResponseCache
+
+
+def test_overwriting_an_entry_keeps_the_size_accurate(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put("ab" * 32, "first")
+    first_size = cache._size
+    cache.put("ab" * 32, "second")
+    cache.put("ab" * 32, "third")
+    assert cache._size == sum(size for _, size, _ in cache._entries())
+    assert cache._size < 2 * first_size
+    assert cache.get("ab" * 32) == "third"
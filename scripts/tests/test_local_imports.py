@@ -0,0 +1,92 @@
+# shared-workflows/scripts/tests/test_local_imports.py
+
+"""A solution's own classes must never be shadowed by JDK imports of the same simple name."""
+
+import pytest
+
+from java_lexer import declared_types, normalize_source
+from symbol_index import get_index, import_table
+
+SOLUTION = """Here are the classes:
+
+```java
+import java.util.List;
+
+public class Rectangle {
+    private Point corner = new Point();
+    private Stack history = new Stack();
+    private List<Integer> sides;
+
+    public int area() { return 0; }
+}
+
+class Point {
+    int x;
+    int y;
+}
+
+class Stack {
+    private final List<Rectangle> items = new ArrayList<>();
+}
+
+public class RectangleExample {
+    public static void main(String[] args) {
+        Rectangle rectangle = new Rectangle();
+        Stack stack = new Stack();
+        Point point = new Point();
+        Map<String, Rectangle> byName = new HashMap<>();
+        System.out.println(rectangle.area());
+    }
+}
+```
+"""
+
+TESTS = """public class RectangleTest {
+    @Test
+    public void testArea() {
+        Rectangle rectangle = new Rectangle();
+        Stack stack = new Stack();
+        assertEquals(0, rectangle.area());
+    }
+}
+"""
+
+
+def imports_of(source):
+    return [line for line in source.splitlines() if line.startswith("import ")]
+
+
+def test_declared_types_finds_every_type():
+    assert declared_types(SOLUTION) == {"Rectangle", "Point", "Stack", "RectangleExample"}
+
+
+def test_local_types_are_not_imported():
+    source = normalize_source(SOLUTION.split("public class RectangleExample")[0], import_table(), declared_types(SOLUTION))
+    assert imports_of(source) == ["import java.util.ArrayList;", "import java.util.List;"]
+
+
+def test_other_jdk_names_are_still_imported():
+    example = "public class RectangleExample" + SOLUTION.split("public class RectangleExample")[1]
+    source = normalize_source(example, import_table(), {"Rectangle", "Point", "Stack"})
+    assert imports_of(source) == ["import java.util.HashMap;", "import java.util.Map;"]
+
+
+def test_gui_types_are_not_indexed():
+    for name in ("Rectangle", "Point", "Color"):
+        assert get_index().lookup(name) is None
+
+
+def test_split_solution_keeps_own_classes():
+    generate_solution = pytest.importorskip("generate_solution")
+    files = dict(generate_solution.split_generated_code(SOLUTION))
+    assert set(files) == {"Rectangle.java", "Point.java", "Stack.java", "RectangleExample.java"}
+    assert imports_of(files["RectangleExample.java"]) == ["import java.util.HashMap;", "import java.util.List;", "import java.util.Map;"]
+    assert imports_of(files["Stack.java"]) == ["import java.util.ArrayList;", "import java.util.List;"]
+
+
+def test_split_tests_keep_solution_classes():
+    generate_tests = pytest.importorskip("generate_tests")
+    files = dict(generate_tests.split_generated_tests(TESTS, declared_types(SOLUTION)))
+    imports = imports_of(files["RectangleTest.java"])
+    assert "import java.util.Stack;" not in imports
+    assert "import org.junit.Test;" in imports
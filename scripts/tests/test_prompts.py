@@ -0,0 +1,30 @@
+# shared-workflows/scripts/tests/test_prompts.py
+
+"""Retrieved examples must not break the byte-identical prefix shared by requests of a stage."""
+
+from prompts import PromptTemplate, Section
+
+TEMPLATE = PromptTemplate(
+    "test_template",
+    instructions="Write the code.",
+    sections=[Section("Example", "class Example {}\n" * 20, optional=True)],
+    notes="IMPORTANT: plain Java only.",
+    request="### Task\n{task}\n",
+)
+
+
+def test_retrieved_example_follows_the_static_prefix():
+    prefix = TEMPLATE.static_prefix()
+    first = TEMPLATE.render({"Similar Task": "class First {}"}, task="one")
+    second = TEMPLATE.render({"Similar Task": "class Second {}"}, task="two")
+    assert first.startswith(prefix) and second.startswith(prefix)
+    assert first[len(prefix):] == "### Similar Task\nclass First {}\n\n### Task\none\n"
+
+
+def test_retrieved_example_is_dropped_first(monkeypatch):
+    retrieved = "class Retrieved {}\n" * 40
+    full = TEMPLATE.render({"Similar Task": retrieved}, task="one")
+    monkeypatch.setenv("PROMPT_BUDGET_TEST_TEMPLATE", str(len(full) // 4 - 50))
+    prompt = TEMPLATE.render({"Similar Task": retrieved}, task="one")
+    assert "Retrieved" not in prompt
+    assert "### Example" in prompt
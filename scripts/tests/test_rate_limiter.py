@@ -0,0 +1,33 @@
+import asyncio
+
+from rate_limiter import MAX_RETRY_DELAY, RateLimiter, retry_delay
+
+
+class RateLimitedResponse:
+    headers = {"retry-after": "3600"}
+
+
+class RateLimitError(Exception):
+    response = RateLimitedResponse()
+
+
+def test_cancelled_waiters_do_not_block_the_queue():
+    async def run():
+        limiter = RateLimiter(rpm=60)
+        limiter.buckets["requests"].level = 0
+        first = asyncio.ensure_future(limiter.aacquire(1))
+        second = asyncio.ensure_future(limiter.aacquire(1))
+        third = asyncio.ensure_future(limiter.aacquire(1))
+        await asyncio.sleep(0.05)
+        second.cancel()
+        first.cancel()
+        await asyncio.wait_for(third, 3)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert limiter._serving == 3
+    assert not limiter._abandoned
+
+
+def test_retry_after_is_capped():
+    assert retry_delay(0, RateLimitError()) == MAX_RETRY_DELAY
@@ -0,0 +1,60 @@
+# shared-workflows/scripts/tests/test_stream_retry.py
+
+"""Classes written by a failed streaming attempt must not survive the retry."""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+generate_solution = pytest.importorskip("generate_solution")
+generate_tests = pytest.importorskip("generate_tests")
+
+GHOST = "public class Ghost {\n    int haunt() { return 1; }\n}\n"
+PLAYER = "public class Player {\n    int score() { return 2; }\n}\n"
+PLAYER_TEST = "public class PlayerTest {\n    void testScore() {}\n}\n"
+
+
+def chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=None)],
+                           usage=None)
+
+
+class FlakyStreamClient:
+    """Streams `first` and then fails on the first request; streams `retry` on the next one."""
+
+    base_url = "http://fake/v1"
+
+    def __init__(self, first, retry):
+        self.attempts = [first, retry]
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        text = self.attempts.pop(0)
+        failing = bool(self.attempts)
+
+        def stream():
+            for start in range(0, len(text), 16):
+                yield chunk(text[start:start + 16])
+            if failing:
+                raise ConnectionError("stream interrupted")
+        return stream()
+
+
+@pytest.fixture(autouse=True)
+def no_cache_no_delay(monkeypatch):
+    monkeypatch.setenv("LLM_NO_CACHE", "1")
+    monkeypatch.setenv("LLM_RETRY_BASE_DELAY", "0")
+    monkeypatch.delenv("LLM_CASSETTE", raising=False)
+
+
+def test_solution_retry_removes_classes_of_failed_attempt(tmp_path):
+    client = FlakyStreamClient(GHOST + "\npublic class Pla", PLAYER)
+    assert generate_solution.stream_solution_to_files(client, "A game.", str(tmp_path)) is not None
+    assert sorted(os.listdir(tmp_path)) == ["Player.java"]
+
+
+def test_tests_retry_removes_classes_of_failed_attempt(tmp_path):
+    client = FlakyStreamClient("public class GhostTest {\n}\n\npublic class Pl", PLAYER_TEST)
+    assert generate_tests.stream_tests_to_files(client, PLAYER, str(tmp_path)) is not None
+    assert sorted(os.listdir(tmp_path)) == ["PlayerTest.java"]
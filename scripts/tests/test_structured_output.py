@@ -0,0 +1,52 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+structured_output = pytest.importorskip("structured_output")
+
+
+def response(path):
+    return json.dumps({"files": [{"path": path, "content": "public class Foo {}"}]})
+
+
+def test_plain_java_file_name_is_accepted():
+    assert structured_output.parse_files(response("Foo.java")) == [("Foo.java", "public class Foo {}\n")]
+
+
+@pytest.mark.parametrize("path", ["Foo.java\n", "dir/Foo.java", "Foo.java.txt"])
+def test_other_paths_are_rejected(path):
+    assert structured_output.parse_files(response(path)) is None
+
+
+class SequenceClient:
+    """Answers chat completions with the given texts in turn."""
+
+    base_url = "http://fake/v1"
+
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        message = SimpleNamespace(content=self.texts.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")],
+                               usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5, total_tokens=15))
+
+
+def test_retry_replaces_an_unparseable_cached_response(tmp_path, monkeypatch):
+    import llm_cache
+
+    monkeypatch.delenv("LLM_NO_CACHE", raising=False)
+    monkeypatch.delenv("LLM_CASSETTE", raising=False)
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.ResponseCache(str(tmp_path)))
+
+    first_run = SequenceClient("not json", response("Foo.java"))
+    assert structured_output.generate_files(first_run, "Write Foo.") == [("Foo.java", "public class Foo {}\n")]
+    assert first_run.calls == 2
+
+    second_run = SequenceClient()
+    assert structured_output.generate_files(second_run, "Write Foo.") == [("Foo.java", "public class Foo {}\n")]
+    assert second_run.calls == 0
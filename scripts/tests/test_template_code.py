@@ -0,0 +1,106 @@
+# shared-workflows/scripts/tests/test_template_code.py
+
+"""The token-based stripper must leave a template that still compiles and keeps the structure."""
+
+import pytest
+
+generate_template_code = pytest.importorskip("generate_template_code")
+generate_template_from_solution = generate_template_code.generate_template_from_solution
+
+TODO_RETURN = "// TODO: Implement logic and return the appropriate value."
+
+ENUM = """public enum Op {
+    ADD("+") {
+        @Override
+        public int apply(int a, int b) { return a + b; }
+    },
+    NEG("-") {
+        public int apply(int a, int b) { return a - b; }
+    };
+
+    private final String symbol;
+
+    Op(String symbol) { this.symbol = symbol; }
+
+    public abstract int apply(int a, int b);
+}
+"""
+
+SHAPE = """public class Shape extends Base {
+    private final String name;
+    private final int sides;
+    private int area;
+    static { REGISTRY.add("shape"); }
+
+    public Shape(String name, int sides) {
+        super(name);
+        this.name = name;
+        this.sides = sides;
+        area = compute();
+    }
+
+    public Shape() {
+        this("square", 4);
+        log("default shape");
+    }
+}
+"""
+
+NESTED = """public class Game {
+    public void start() {
+        Runnable task = new Runnable() {
+            public void run() { System.out.println("} not a brace"); }
+        };
+        task.run();
+    }
+
+    static class Score {
+        int value() { return 42; }
+    }
+}
+"""
+
+
+def test_enum_constant_bodies_are_stubbed():
+    template = generate_template_from_solution(ENUM)
+    assert "a + b" not in template and "a - b" not in template
+    assert template.count(TODO_RETURN) == 2
+    assert 'ADD("+") {' in template and 'NEG("-") {' in template
+    assert "public abstract int apply(int a, int b);" in template
+
+
+def test_constructors_keep_delegation_and_blank_final_assignments():
+    template = generate_template_from_solution(SHAPE)
+    assert "super(name);" in template
+    assert "this.name = name;" in template and "this.sides = sides;" in template
+    assert 'this("square", 4);' in template
+    assert "area = compute();" not in template and "log(" not in template
+    assert 'static { REGISTRY.add("shape"); }' in template
+
+
+def test_inner_and_anonymous_classes():
+    template = generate_template_from_solution(NESTED)
+    assert "new Runnable()" not in template and "not a brace" not in template
+    assert "static class Score {" in template
+    assert "return 42;" not in template
+    assert template.rstrip().endswith("}\n}")
+
+
+@pytest.mark.parametrize("return_type, value", [
+    ("boolean", "false"),
+    ("int", "0"),
+    ("long", "0"),
+    ("double", "0"),
+    ("char", "0"),
+    ("String", "null"),
+    ("List<String>", "null"),
+    ("int[]", "null"),
+])
+def test_stub_returns_fit_the_return_type(return_type, value):
+    template = generate_template_from_solution(f"class A {{\n    {return_type} get() {{ return compute(); }}\n}}\n")
+    assert f"{TODO_RETURN}\n        return {value};" in template
+
+
+def test_void_methods_have_no_return():
+    template = generate_template_from_solution("class A {\n    void run() { go(); }\n}\n")
+    assert "return" not in template and "go();" not in template
@@ -0,0 +1,214 @@
+# shared-workflows/scripts/tracing.py
+
+"""
+Span tracing and profiling for the scripts.
+
+Spans cover the phases of a script: file reads and writes, prompt building,
+model calls (recorded by telemetry), post-processing of the model output, git
+and other subprocesses, and posting comments. They are written in the Chrome
+trace event format when the process exits, which chrome://tracing, Perfetto
+(ui.perfetto.dev) and speedscope open directly. Timestamps are wall-clock
+microseconds, so traces of several processes line up.
+
+Every script calls init_tracing() first in its __main__ block, which takes its
+own flags out of sys.argv before the script parses it:
+
+    --trace[=FILE]    write a trace (default trace-<script>-<pid>.json; TRACE_FILE also enables it)
+    --profile[=FILE]  profile every thread with cProfile, save the stats
+                      (default profile-<script>-<pid>.pstats) and print the top functions
+
+While tracing, every subprocess.run call is recorded as a span named after
+the command (e.g. "git push"), without changes to the callers.
+"""
+
+import atexit
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import pstats
+import subprocess
+import sys
+import threading
+import time
+
+_events = []
+_events_lock = threading.Lock()
+_thread_names = {}
+_trace_file = None
+_origin = (time.time(), time.perf_counter())
+
+
+def tracing_enabled():
+    return _trace_file is not None
+
+
+def _timestamp(perf_counter):
+    return (_origin[0] + perf_counter - _origin[1]) * 1e6
+
+
+def add_event(name, category, start, end, args=None):
+    """Record a span timed with time.perf_counter() by the caller."""
+    if _trace_file is None:
+        return
+    thread = threading.current_thread()
+    event = {
+        "name": name, "cat": category, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+        "ts": round(_timestamp(start), 1), "dur": round((end - start) * 1e6, 1),
+    }
+    if args:
+        event["args"] = args
+    with _events_lock:
+        _events.append(event)
+        _thread_names[thread.ident] = thread.name
+
+
+@contextlib.contextmanager
+def span(name, category="app", **args):
+    """Record the time spent in the with block as a span."""
+    if _trace_file is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_event(name, category, start, time.perf_counter(), args)
+
+
+def traced(category, name=None):
+    """Decorator recording every call of a function as a span."""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _trace_file is None:
+                return fn(*args, **kwargs)
+            with span(span_name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _command_name(command):
+    if isinstance(command, str):
+        command = command.split()
+    command = [os.path.basename(str(part)) for part in command[:3]]
+    if command and command[0] in ("git", "gh"):
+        return " ".join(part for part in command[:3] if not part.startswith("-"))
+    return command[0] if command else "subprocess"
+
+
+def _trace_subprocesses():
+    run = subprocess.run
+
+    @functools.wraps(run)
+    def traced_run(*args, **kwargs):
+        command = args[0] if args else kwargs.get("args", [])
+        name = _command_name(command)
+        with span(name, "git" if name.startswith("git") else "subprocess"):
+            return run(*args, **kwargs)
+
+    subprocess.run = traced_run
+
+
+def write_trace():
+    """Write the recorded spans as a Chrome trace file."""
+    with _events_lock:
+        metadata = [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": thread_name}}
+            for tid, thread_name in _thread_names.items()
+        ]
+        events = metadata + list(_events)
+    directory = os.path.dirname(_trace_file)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(_trace_file, "w") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+    print(f"Trace with {len(events) - len(metadata)} spans written to {_trace_file}", file=sys.stderr)
+
+
+class _ThreadProfiler:
+    """
+    cProfile for the main thread and every thread started after it, merged at exit.
+
+    Up to Python 3.11 a profiler only sees the thread that enabled it, so every
+    new thread gets its own. From 3.12 on cProfile is built on sys.monitoring,
+    which allows a single profiler per process and sees every thread, so one
+    profiler enabled in the main thread covers the workers too.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self.lock = threading.Lock()
+        self.per_thread = sys.version_info < (3, 12)
+
+    def start(self):
+        if self.per_thread:
+            threading.setprofile(self._start_thread)
+        self._new_profile().enable()
+
+    def _new_profile(self):
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        return profile
+
+    def _start_thread(self, frame, event, arg):
+        # Called once in each new thread; enabling the profiler replaces this hook for the thread
+        sys.setprofile(None)
+        try:
+            self._new_profile().enable()
+        except ValueError as e:
+            # Another profiler is active; the thread runs unprofiled rather than dying
+            print(f"Warning: not profiling {threading.current_thread().name}: {e}", file=sys.stderr)
+
+    def stop(self, path):
+        if self.per_thread:
+            threading.setprofile(None)
+        stats = None
+        with self.lock:
+            for profile in self.profiles:
+                profile.disable()
+                profile.create_stats()
+                if not profile.stats:
+                    continue
+                if stats is None:
+                    stats = pstats.Stats(profile, stream=sys.stderr)
+                else:
+                    stats.add(profile)
+        if stats is None:
+            return
+        stats.dump_stats(path)
+        print(f"Profile of {len(self.profiles)} thread(s) written to {path}; top functions by cumulative time:", file=sys.stderr)
+        stats.sort_stats("cumulative").print_stats(25)
+
+
+def _take_flag(argv, flag):
+    """Remove --flag or --flag=value from argv; returns None if absent, else the value ("" without one)."""
+    for index, argument in enumerate(argv):
+        if argument == flag or argument.startswith(flag + "="):
+            del argv[index]
+            return argument.partition("=")[2]
+    return None
+
+
+def init_tracing(argv=None):
+    """Handle --trace and --profile (removing them from argv, sys.argv by default) and TRACE_FILE."""
+    global _trace_file
+    argv = sys.argv if argv is None else argv
+    script = os.path.splitext(os.path.basename(argv[0]))[0] if argv else "script"
+    default_name = f"{script}-{os.getpid()}"
+
+    trace = _take_flag(argv, "--trace")
+    profile = _take_flag(argv, "--profile")
+    if trace is not None or os.getenv("TRACE_FILE"):
+        _trace_file = trace or os.getenv("TRACE_FILE") or f"trace-{default_name}.json"
+        _trace_subprocesses()
+        atexit.register(write_trace)
+    if profile is not None:
+        profiler = _ThreadProfiler()
+        profiler.start()
+        atexit.register(profiler.stop, profile or f"profile-{default_name}.pstats")